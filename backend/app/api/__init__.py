@@ -3,6 +3,7 @@ from fastapi import APIRouter
 from .auth import router as auth_router
 from .config import router as config_router
 from .docs import router as docs_router
+from .export import router as export_router
 from .sharelinks import router as sharelinks_router
 from .sitemap import router as sitemap_router
 from .uploads import router as uploads_router
@@ -16,3 +17,4 @@ router.include_router(sharelinks_router)
 router.include_router(config_router)
 router.include_router(sitemap_router)
 router.include_router(uploads_router)
+router.include_router(export_router)
@@ -8,12 +8,14 @@ from ..auth.passwords import check_password
 from ..models.user import User
 from ..schemas.auth import LoginRequest, LoginResponse
 from ..schemas.user import UserResponse
+from ..utils.replica import read_only
 
 logger = getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login")
+@read_only
 async def login(
     request: Request,
     response: Response,
@@ -56,6 +58,7 @@ async def get_current_user(
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@read_only
 async def logout(request: Request, response: Response) -> None:
     """
     Log out the current user.
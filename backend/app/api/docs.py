@@ -1,15 +1,18 @@
+import asyncio
 import datetime
+import hashlib
 from logging import getLogger
 from typing import Annotated, Literal
 
-from fastapi import APIRouter, Body, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 from fastapi.responses import PlainTextResponse
 from tortoise.exceptions import DoesNotExist
 from tortoise.transactions import in_transaction
 
 from ..auth.dependencies import LoggedInUser, OptionalUser
-from ..models.doc import Doc
+from ..models.doc import Doc, render_markdown
 from ..models.revision import Revision
+from ..models.sharelink import ShareableLink
 from ..models.upload import Upload
 from ..schemas.doc import (
     DocCreate,
@@ -17,29 +20,40 @@ from ..schemas.doc import (
     DocMetadata,
     DocResponse,
     DocSearchResponse,
+    DocSuggestion,
     DocTreeNode,
     DocUpdate,
 )
-from ..schemas.revision import RevisionResponse
+from ..schemas.revision import (
+    RevisionDiffHunk,
+    RevisionDiffResponse,
+    RevisionResponse,
+)
 from ..schemas.role import Role
+from ..search import MAX_SEARCH_RESULTS
 from ..settings import settings
+from ..utils.cache import TTLCache
+from ..utils.diffs import diff_texts
+from ..utils.images import image_variants
 from ..utils.indexing import (
     delete_document_from_index,
     index_document,
+    index_documents,
     search_documents,
+    suggest_documents,
 )
+from ..utils.replica import read_only, read_replica
 from .pagination import PaginatedResponse, PaginationParams
 
 logger = getLogger(__name__)
 router = APIRouter(prefix="/docs", tags=["docs"])
 
-
-async def _reindex_subtree(doc: Doc) -> None:  # pragma: no cover
-    """Recursively re-index a document and all its descendants."""
-    await index_document(doc)
-    await doc.fetch_related("children")
-    for child in doc.children:
-        await _reindex_subtree(child)
+# (old text hash, new text hash, mode, context) -> diff hunks
+# Keyed by content rather than revision ID since the latest revision
+# can still change when edits are coalesced.
+_diff_cache: TTLCache[tuple[bytes, bytes, str, int], list[RevisionDiffHunk]] = TTLCache(
+    settings.revision_diff_cache_ttl, maxsize=1000, name="revision_diff"
+)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -87,7 +101,7 @@ async def create_doc(
         updated_by_id=current_user.id,
     )
     await doc.save()
-    if not settings.disable_search:  # pragma: no cover
+    if not settings.disable_search:
         await index_document(doc)
     logger.info(f"Document '{doc.title}' created by user {current_user.username}.")
     return DocResponse(
@@ -106,7 +120,7 @@ async def create_doc(
     )
 
 
-@router.get("/outline")
+@router.get("/outline", dependencies=[Depends(read_replica)])
 async def get_doc_outline(
     current_user: OptionalUser,
     depth: int = 100,
@@ -151,7 +165,29 @@ async def get_doc_outline(
     )
 
 
-@router.get("/{doc_id}")
+@router.get("/autocomplete")
+async def autocomplete_docs(
+    current_user: OptionalUser,
+    query: str,
+    limit: Annotated[int, Query(ge=1, le=20)] = 10,
+) -> list[DocSuggestion]:
+    """
+    Get documents whose titles match a query being typed.
+    This is lighter than a search, since the text is not cropped or highlighted.
+    """
+    if settings.disable_search:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search functionality is disabled",
+        )
+
+    query = query.strip()
+    if len(query) < 2:
+        return []
+    return await suggest_documents(query, public_only=current_user is None, limit=limit)
+
+
+@router.get("/{doc_id}", dependencies=[Depends(read_replica)])
 async def get_doc(
     current_user: OptionalUser,
     doc_id: int | Literal["by_path"],
@@ -287,21 +323,30 @@ async def get_doc_revisions(
 
     revisions = doc.revisions.all().prefetch_related("created_by")
     total = await revisions.count()
-    revisions = pagination.apply(revisions)
+    page = await pagination.apply(revisions)
+    markdowns = await Revision.get_markdowns(page)
+    images = await image_variants("\n".join(markdowns.values()))
+    # Rendering a page of large revisions would block the event loop
+    htmls = await asyncio.to_thread(
+        lambda: {
+            id: render_markdown(markdown, images)[0]
+            for id, markdown in markdowns.items()
+        }
+    )
     return PaginatedResponse[RevisionResponse](
         items=[
             RevisionResponse(
                 id=revision.id,
                 doc_id=revision.doc_id,
-                markdown=revision.markdown,
-                html=revision.html,
+                markdown=markdowns[revision.id],
+                html=htmls[revision.id],
                 created_by_id=revision.created_by_id,
                 created_by_username=revision.created_by.username
                 if revision.created_by
                 else None,
                 created_at=revision.created_at,
             )
-            async for revision in revisions
+            for revision in page
         ],
         page=pagination.page,
         size=pagination.size,
@@ -309,6 +354,58 @@ async def get_doc_revisions(
     )
 
 
+@router.get("/{doc_id}/revisions/{revision_id}/diff")
+async def get_doc_revision_diff(
+    current_user: LoggedInUser,
+    doc_id: int,
+    revision_id: int,
+    to: int | None = None,
+    mode: Literal["line", "word"] = "line",
+    context: Annotated[int, Query(ge=0, le=100)] = 3,
+) -> RevisionDiffResponse:
+    """
+    Get the changes between a revision of a document and another revision,
+    or the current content if no other revision is given.
+    Only the changed hunks are returned.
+    """
+    try:
+        doc = await Doc.get(id=doc_id)
+    except DoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+        )
+
+    if current_user.role != Role.ADMIN and current_user.role != Role.USER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to view document revisions",
+        )
+
+    revision_ids = [revision_id] if to is None else [revision_id, to]
+    revisions = await Revision.filter(id__in=revision_ids, doc_id=doc_id)
+    if len(revisions) != len(set(revision_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found"
+        )
+    markdowns = await Revision.get_markdowns(revisions)
+    old = markdowns[revision_id]
+    new = doc.markdown if to is None else markdowns[to]
+
+    cache_key = (
+        hashlib.sha256(old.encode()).digest(),
+        hashlib.sha256(new.encode()).digest(),
+        mode,
+        context,
+    )
+    hunks = _diff_cache.get(cache_key)
+    if hunks is None:
+        hunks = await asyncio.to_thread(diff_texts, old, new, mode, context)
+        _diff_cache.set(cache_key, hunks)
+    return RevisionDiffResponse(
+        from_revision_id=revision_id, to_revision_id=to, mode=mode, hunks=hunks
+    )
+
+
 @router.put("/{doc_id}")
 async def update_doc(
     current_user: LoggedInUser,
@@ -364,7 +461,11 @@ async def update_doc(
                 )
         if doc.parent_id != old_parent_id:
             needs_urlpath_update = True
+    # Descendants are re-indexed if their URL paths or breadcrumbs change
+    needs_subtree_reindex = False
     if doc_update.title is not None:
+        if doc_update.title != doc.title:
+            needs_subtree_reindex = True
         doc.title = doc_update.title
     if doc_update.slug is not None:
         Doc.validate_slug(doc_update.slug)
@@ -387,7 +488,7 @@ async def update_doc(
         doc.public = doc_update.public
     doc.updated_by_id = current_user.id
     await doc.update_content()
-    async with in_transaction():
+    async with in_transaction("default"):
         await doc.save()
         # Update urlpath if slug or parent changed (don't index yet - do it after transaction)
         if needs_urlpath_update:
@@ -396,20 +497,14 @@ async def update_doc(
         if doc_update.public is not None:
             await Upload.filter(doc_id=doc.id).update(public=doc.public)
         if create_revision:
-            await Revision.create(
-                doc=doc,
-                markdown=doc.markdown,
-                html=doc.html,
-                created_by_id=current_user.id,
-            )
+            await Revision.record(doc.id, doc.markdown, current_user.id)
     # Index after transaction commits
-    if not settings.disable_search:  # pragma: no cover
+    if not settings.disable_search:
         await index_document(doc)
-        # Re-index children if their urlpaths changed
-        if needs_urlpath_update:
-            await doc.fetch_related("children")
-            for child in doc.children:
-                await _reindex_subtree(child)
+        if needs_urlpath_update or needs_subtree_reindex:
+            descendant_ids = await doc.descendant_ids()
+            if descendant_ids:
+                await index_documents(Doc.filter(id__in=descendant_ids))
     logger.info(f"Document '{doc.title}' updated by user {current_user.username}.")
     return DocResponse(
         id=doc.id,
@@ -506,17 +601,13 @@ async def restore_doc_revision(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Revision not found"
         )
 
-    doc.markdown = revision.markdown
+    doc.markdown = await revision.get_markdown()
     doc.updated_by_id = current_user.id
     await doc.update_content()
-    await doc.save()
-    await Revision.create(
-        doc=doc,
-        markdown=doc.markdown,
-        html=doc.html,
-        created_by_id=current_user.id,
-    )
-    if not settings.disable_search:  # pragma: no cover
+    async with in_transaction("default"):
+        await doc.save()
+        await Revision.add(doc.id, doc.markdown, current_user.id)
+    if not settings.disable_search:
         await index_document(doc)
     logger.info(
         f"Document '{doc.title}' restored to revision {revision_id} by user {current_user.username}."
@@ -551,7 +642,9 @@ async def delete_doc(
         )
 
     await doc.delete()
-    if not settings.disable_search:  # pragma: no cover
+    # Links to the document and its descendants were deleted with them
+    ShareableLink.forget_all_tokens()
+    if not settings.disable_search:
         await delete_document_from_index(doc_id)
     logger.info(f"Document '{doc.title}' deleted by user {current_user.username}.")
 
@@ -594,9 +687,12 @@ async def list_docs(
 
 
 @router.post("/search")
+@read_only
 async def search_docs(
     current_user: OptionalUser,
     query: Annotated[str, Body(embed=True)],
+    page: Annotated[int, Body(ge=1)] = 1,
+    size: Annotated[int, Body(ge=1, le=100)] = 20,
 ) -> DocSearchResponse:
     """
     Search for documents based on a query string.
@@ -607,18 +703,29 @@ async def search_docs(
             detail="Search functionality is disabled",
         )
 
+    if page * size > MAX_SEARCH_RESULTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Only the first {MAX_SEARCH_RESULTS} results can be retrieved",
+        )
+
     query = query.strip()
     if len(query) < 3:
         return DocSearchResponse(results=[], total=0)
 
+    # One more result than requested tells whether there is another page
     results = await search_documents(
-        query, public_only=current_user is None
-    )  # pragma: no cover
+        query,
+        public_only=current_user is None,
+        limit=size + 1,
+        offset=(page - 1) * size,
+    )
     logger.info(
         f"User {current_user.username if current_user else 'anonymous'} searched for: {query}"
-    )  # pragma: no cover
+    )
 
     return DocSearchResponse(
-        results=results,
-        total=len(results),
-    )  # pragma: no cover
+        results=results[:size],
+        total=min(len(results), size),
+        has_more=len(results) > size,
+    )
@@ -0,0 +1,51 @@
+from datetime import UTC, datetime
+from logging import getLogger
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from ..auth.dependencies import LoggedInUser
+from ..schemas.role import Role
+from ..utils.dump import stream_export
+
+logger = getLogger(__name__)
+router = APIRouter(prefix="/export", tags=["export"])
+
+MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+}
+
+
+@router.get("/", response_class=StreamingResponse)
+async def export(
+    current_user: LoggedInUser,
+    format: Literal["zip", "tar"] = "zip",
+    revisions: bool = False,
+    attachments: bool = False,
+    public_only: bool = False,
+) -> StreamingResponse:
+    """
+    Download an archive of all documents, optionally with revisions and attachments.
+    The archive is streamed as it is generated. Requires admin role.
+    """
+    if current_user.role != Role.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can export the documents",
+        )
+    logger.info(f"Export started by user {current_user.username}.")
+    timestamp = datetime.now(UTC).strftime("%Y%m%d%H%M%S")
+    return StreamingResponse(
+        stream_export(
+            format,
+            include_revisions=revisions,
+            public_only=public_only,
+            include_attachments=attachments,
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="export-{timestamp}.{format}"'
+        },
+    )
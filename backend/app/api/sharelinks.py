@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from logging import getLogger
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from tortoise.exceptions import DoesNotExist
 
 from ..auth.dependencies import LoggedInUser
@@ -10,20 +10,29 @@ from ..models.sharelink import ShareableLink
 from ..schemas.role import Role
 from ..schemas.doc import DocInfo, DocResponse
 from ..schemas.sharelink import ShareLinkCreate, ShareLinkResponse
+from ..settings import settings
+from ..utils.cache import TTLCache
+from ..utils.replica import read_replica
 
 logger = getLogger(__name__)
 router = APIRouter(prefix="/sharelinks", tags=["sharelinks"])
 
+# (doc ID, doc updated_at) -> response for the shared document
+_shared_doc_cache: TTLCache[tuple[int, datetime], DocResponse] = TTLCache(
+    settings.shared_doc_cache_ttl, maxsize=1000, name="shared_doc"
+)
+
 
 def _to_response(link: ShareableLink) -> ShareLinkResponse:
+    access_count, last_accessed_at = link.current_access_stats()
     return ShareLinkResponse(
         id=link.id,
         token=link.token,
         doc_id=link.doc_id,
         created_by_id=link.created_by_id,
         expires_at=link.expires_at,
-        last_accessed_at=link.last_accessed_at,
-        access_count=link.access_count,
+        last_accessed_at=last_accessed_at,
+        access_count=access_count,
         created_at=link.created_at,
         updated_at=link.updated_at,
     )
@@ -168,12 +177,13 @@ async def delete_sharelink(
 
     doc_title = link.doc.title
     await link.delete()
+    ShareableLink.forget_token(link.token)
     logger.info(
         f"Share link for document '{doc_title}' deleted by user {current_user.username}."
     )
 
 
-@router.get("/access/{token}")
+@router.get("/access/{token}", dependencies=[Depends(read_replica)])
 async def access_shared_doc(
     token: str,
 ) -> DocResponse:
@@ -181,26 +191,43 @@ async def access_shared_doc(
     Access a document via a shareable link token.
     This endpoint is public and does not require authentication.
     """
-    try:
-        link = await ShareableLink.get(token=token).prefetch_related("doc")
-    except DoesNotExist:
+    info = await ShareableLink.lookup_token(token)
+    if info is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Share link not found or expired",
         )
 
-    if link.is_expired():
+    if info.is_expired():
         raise HTTPException(
             status_code=status.HTTP_410_GONE,
             detail="This share link has expired",
         )
 
+    updated_at = (
+        await Doc.filter(id=info.doc_id).first().values_list("updated_at", flat=True)
+    )
+    if updated_at is None:  # pragma: no cover
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Share link not found or expired",
+        )
+
     # Record the access
-    await link.record_access()
+    await ShareableLink.record_token_access(info.link_id, token)
+
+    # Only the document's version is checked on each access;
+    # changes to its parents and children show up once the entry expires.
+    cache_key = (info.doc_id, updated_at)
+    response = _shared_doc_cache.get(cache_key)
+    if response is None:
+        response = await _shared_doc_response(await Doc.get(id=info.doc_id))
+        _shared_doc_cache.set(cache_key, response)
+    return response
 
-    doc = link.doc
-    children = doc.children.filter(public=True)
 
+async def _shared_doc_response(doc: Doc) -> DocResponse:
+    children = doc.children.filter(public=True)
     return DocResponse(
         id=doc.id,
         parent_id=doc.parent_id,
@@ -1,10 +1,13 @@
+import hashlib
 from xml.etree import ElementTree as ET
 
-from fastapi import APIRouter
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response, StreamingResponse
 
 from ..models.doc import Doc
 from ..settings import settings
+from ..utils.dump import get_tree_order, iter_single_file_sections, single_file_header
+from ..utils.replica import read_replica
 
 router = APIRouter()
 
@@ -45,7 +48,7 @@ async def sitemap_head() -> Response:
     return Response(content="", media_type="application/xml; charset=utf-8")
 
 
-@router.get("/sitemap.xml")
+@router.get("/sitemap.xml", dependencies=[Depends(read_replica)])
 async def sitemap() -> Response:
     """
     Returns the sitemap.xml file.
@@ -59,3 +62,38 @@ async def sitemap() -> Response:
         lastmod.text = doc.updated_at.isoformat(timespec="seconds")
     content = ET.tostring(urlset, encoding="utf-8", xml_declaration=True)
     return Response(content=content, media_type="application/xml; charset=utf-8")
+
+
+@router.head("/llms-full.txt")
+async def llms_full_txt_head() -> Response:
+    """
+    Returns the headers for the llms-full.txt file.
+    """
+    return Response(content="", media_type="text/plain; charset=utf-8")
+
+
+@router.get("/llms-full.txt", response_class=StreamingResponse)
+async def llms_full_txt(request: Request) -> Response:
+    """
+    Returns all public documents as a single Markdown file for LLM consumption.
+    The file is streamed as it is generated. Its ETag is derived from the
+    document tree, so unchanged content is not regenerated for clients that have it.
+    """
+    header = await single_file_header()
+    tree = await get_tree_order(public_only=True)
+    hasher = hashlib.sha256(header.encode("utf-8"))
+    for id, updated_at in tree:
+        hasher.update(f"{id}:{updated_at.isoformat()}\n".encode())
+    etag = f'"{hasher.hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    async def generate():
+        yield header
+        async for section in iter_single_file_sections(tree):
+            yield section
+
+    return StreamingResponse(
+        generate(), media_type="text/plain; charset=utf-8", headers=headers
+    )
@@ -4,7 +4,15 @@ from logging import getLogger
 from typing import Annotated
 
 from aiofiles import open as aio_open
-from fastapi import APIRouter, Form, HTTPException, Request, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Form,
+    HTTPException,
+    Request,
+    status,
+)
 from fastapi.responses import FileResponse
 from tortoise.exceptions import DoesNotExist
 
@@ -12,81 +20,115 @@ from ..auth.dependencies import LoggedInUser, OptionalUser
 from ..models.doc import Doc
 from ..models.sharelink import ShareableLink
 from ..models.upload import Upload
+from ..models.user import User
 from ..schemas.role import Role
-from ..schemas.upload import UploadCreate, UploadResponse, UploadUpdate
+from ..schemas.upload import (
+    UploadCreate,
+    UploadResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
+    UploadUpdate,
+)
 from ..settings import settings
+from ..utils.images import delete_variants, find_variant, generate_variants
+from ..utils.metrics import UPLOAD_BYTES, UploadFileResponse
+from ..utils.replica import read_replica
+from ..utils.upload_sessions import ChunkSizeError, UploadSession
 from .pagination import PaginatedResponse, PaginationParams
 
 logger = getLogger(__name__)
 router = APIRouter(prefix="/uploads", tags=["uploads"])
 
+# Matches the share token in the URL of a shared page
+_SHARE_REFERER_RE = re.compile(r"/_share/([a-zA-Z0-9_-]+)")
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
-async def upload_file(
-    current_user: LoggedInUser,
-    upload_create: Annotated[UploadCreate, Form()],
-) -> UploadResponse:
+
+def _validate_upload_file(
+    filename: str,
+    content_type: str | None,
+    size: int | None,
+    max_size: int,
+) -> tuple[str, str]:
     """
-    Upload a file.
+    Validate the name, content type and size of a file to be uploaded.
+    Returns the sanitized filename and its extension.
     """
-    if current_user.role != Role.ADMIN and current_user.role != Role.USER:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to upload files",
-        )
-
-    file = upload_create.file
-    file.filename = Upload.sanitize_filename(upload_create.filename or "")
-    if len(file.filename) > settings.max_upload_filename_length:
+    filename = Upload.sanitize_filename(filename)
+    if len(filename) > settings.max_upload_filename_length:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Filename is too long. Maximum length is {settings.max_upload_filename_length} characters",
         )
 
-    extension = file.filename.split(".")[-1].lower()
+    extension = filename.split(".")[-1].lower()
     if extension not in settings.allowed_upload_filename_extensions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File extension '{extension}' is not allowed. Allowed extensions are: {', '.join(settings.allowed_upload_filename_extensions)}",
         )
 
-    if not file.content_type:
+    if not content_type:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Content type is required",
         )
-    guessed = mimetypes.guess_type(file.filename)[0]
-    if guessed and guessed != file.content_type:
+    guessed = mimetypes.guess_type(filename)[0]
+    if guessed and guessed != content_type:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Content type mismatch: expected '{guessed}' for file '{file.filename}'",
+            detail=f"Content type mismatch: expected '{guessed}' for file '{filename}'",
         )
 
-    if file.size and file.size > settings.max_upload_size:
+    if size and size > max_size:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File size exceeds the maximum limit of {settings.max_upload_size / (1024 * 1024)} MB",
+            detail=f"File size exceeds the maximum limit of {max_size / (1024 * 1024)} MB",
         )
+    return filename, extension
 
-    # Validate doc_id if provided and inherit public status from document
-    doc = None
-    public = upload_create.public
-    if upload_create.doc_id is not None:
-        try:
-            doc = await Doc.get(id=upload_create.doc_id)
-        except DoesNotExist:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Document not found",
-            )
-        # Check user has permission to attach uploads to this document
-        if current_user.role != Role.ADMIN and current_user.role != Role.USER:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You do not have permission to attach uploads to this document",
-            )
-        # Inherit public status from the document
-        public = doc.public
+
+async def _resolve_upload_doc(
+    doc_id: int | None, public: bool
+) -> tuple[Doc | None, bool]:
+    """
+    Get the document an upload is attached to, if any.
+    Uploads attached to a document inherit its public status.
+    """
+    if doc_id is None:
+        return None, public
+    try:
+        doc = await Doc.get(id=doc_id)
+    except DoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document not found",
+        )
+    return doc, doc.public
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def upload_file(
+    current_user: LoggedInUser,
+    upload_create: Annotated[UploadCreate, Form()],
+    background_tasks: BackgroundTasks,
+) -> UploadResponse:
+    """
+    Upload a file.
+    """
+    if current_user.role != Role.ADMIN and current_user.role != Role.USER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to upload files",
+        )
+
+    file = upload_create.file
+    file.filename, extension = _validate_upload_file(
+        upload_create.filename or "",
+        file.content_type,
+        file.size,
+        settings.max_upload_size,
+    )
+    doc, public = await _resolve_upload_doc(upload_create.doc_id, upload_create.public)
 
     storage_path = Upload.generate_storage_path() + "." + extension
     filename = settings.uploads_dir / storage_path
@@ -103,6 +145,7 @@ async def upload_file(
                     detail=f"File size exceeds the maximum limit of {settings.max_upload_size / (1024 * 1024)} MB",
                 )
         file.size = await out_file.tell()
+    UPLOAD_BYTES.labels("in").inc(file.size)
     upload = await Upload.create(
         filename=file.filename,
         content_type=file.content_type,
@@ -112,6 +155,7 @@ async def upload_file(
         created_by=current_user,
         doc=doc,
     )
+    background_tasks.add_task(generate_variants, storage_path, file.content_type)
     logger.info(f"File '{file.filename}' uploaded by user {current_user.id}.")
 
     return UploadResponse(
@@ -127,6 +171,188 @@ async def upload_file(
     )
 
 
+async def _get_upload_session(current_user: User, session_id: str) -> UploadSession:
+    """
+    Get an upload session owned by the current user.
+    """
+    session = await UploadSession.load(session_id)
+    if session is None or (
+        session.created_by_id != current_user.id and current_user.role != Role.ADMIN
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found",
+        )
+    return session
+
+
+async def _session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        content_type=session.content_type,
+        size=session.size,
+        chunk_size=session.chunk_size,
+        chunk_count=session.chunk_count,
+        received_chunks=await session.received_chunks(),
+        created_at=session.created_at,
+    )
+
+
+@router.post("/sessions", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    current_user: LoggedInUser,
+    session_create: UploadSessionCreate,
+) -> UploadSessionResponse:
+    """
+    Start a resumable chunked upload.
+
+    The file is sent as numbered chunks of `chunk_size` bytes
+    (the last chunk may be shorter), in any order,
+    and the upload is then finalized to create the upload record.
+    """
+    if current_user.role != Role.ADMIN and current_user.role != Role.USER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to upload files",
+        )
+
+    filename, _ = _validate_upload_file(
+        session_create.filename,
+        session_create.content_type,
+        session_create.size,
+        settings.max_chunked_upload_size,
+    )
+    await _resolve_upload_doc(session_create.doc_id, session_create.public)
+
+    await UploadSession.cleanup_expired()
+    session = await UploadSession.create(
+        filename=filename,
+        content_type=session_create.content_type,
+        size=session_create.size,
+        public=session_create.public,
+        doc_id=session_create.doc_id,
+        created_by_id=current_user.id,
+    )
+    logger.info(
+        f"Upload session {session.id} for '{filename}' started by user {current_user.id}."
+    )
+    return await _session_response(session)
+
+
+@router.get("/sessions/{session_id}")
+async def get_upload_session(
+    current_user: LoggedInUser,
+    session_id: str,
+) -> UploadSessionResponse:
+    """
+    Get the state of a chunked upload, e.g. to find which chunks to resend.
+    """
+    session = await _get_upload_session(current_user, session_id)
+    return await _session_response(session)
+
+
+@router.put("/sessions/{session_id}/chunks/{index}")
+async def upload_chunk(
+    request: Request,
+    current_user: LoggedInUser,
+    session_id: str,
+    index: int,
+) -> UploadSessionResponse:
+    """
+    Upload a single chunk of a chunked upload as the raw request body.
+    The chunk is written at offset `index * chunk_size`.
+    Resending a chunk overwrites it.
+    """
+    session = await _get_upload_session(current_user, session_id)
+    if index < 0 or index >= session.chunk_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk index must be between 0 and {session.chunk_count - 1}",
+        )
+    try:
+        await session.write_chunk(index, request.stream())
+    except ChunkSizeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except FileNotFoundError:
+        # Completed or aborted meanwhile
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found",
+        )
+    return await _session_response(session)
+
+
+@router.post("/sessions/{session_id}/complete", status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(
+    current_user: LoggedInUser,
+    session_id: str,
+    background_tasks: BackgroundTasks,
+) -> UploadResponse:
+    """
+    Finalize a chunked upload once all chunks have been received.
+    """
+    session = await _get_upload_session(current_user, session_id)
+    received = await session.received_chunks()
+    missing = session.chunk_count - len(received)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Upload is incomplete: {missing} chunk(s) missing",
+        )
+    doc, public = await _resolve_upload_doc(session.doc_id, session.public)
+
+    extension = session.filename.split(".")[-1].lower()
+    storage_path = Upload.generate_storage_path() + "." + extension
+    try:
+        await session.finalize(settings.uploads_dir / storage_path)
+    except FileNotFoundError:
+        # Another request completed or aborted the session first
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found",
+        )
+    upload = await Upload.create(
+        filename=session.filename,
+        content_type=session.content_type,
+        size=session.size,
+        public=public,
+        storage_path=storage_path,
+        created_by=current_user,
+        doc=doc,
+    )
+    background_tasks.add_task(generate_variants, storage_path, upload.content_type)
+    logger.info(f"File '{upload.filename}' uploaded by user {current_user.id}.")
+
+    return UploadResponse(
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        public=upload.public,
+        doc_id=upload.doc_id,
+        id=upload.id,
+        created_by_id=upload.created_by_id,
+        created_at=upload.created_at,
+        updated_at=upload.updated_at,
+    )
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload_session(
+    current_user: LoggedInUser,
+    session_id: str,
+) -> None:
+    """
+    Abort a chunked upload and discard the data received so far.
+    """
+    session = await _get_upload_session(current_user, session_id)
+    await session.discard()
+    logger.info(f"Upload session {session_id} aborted by user {current_user.id}.")
+
+
 @router.get("/")
 async def list_uploads(
     current_user: LoggedInUser,
@@ -292,6 +518,7 @@ async def delete_upload(
     filename = settings.uploads_dir / upload.storage_path
     print(settings.uploads_dir, upload.storage_path, filename)
     filename.unlink(missing_ok=True)
+    delete_variants(upload.storage_path)
     logger.info(f"Upload {upload_id} deleted by user {current_user.id}.")
 
 
@@ -304,6 +531,7 @@ async def download_upload(
     download: bool = True,
     filename: str | None = None,
     share_token: str | None = None,
+    w: int | None = None,
 ) -> FileResponse:
     """
     Download an upload.
@@ -313,9 +541,12 @@ async def download_upload(
     - Upload is explicitly public, OR
     - Upload belongs to a public page, OR
     - A valid share token for the upload's page is provided (via query param or Referer header)
+
+    For images, `w` requests a resized WebP variant at least `w` pixels wide,
+    falling back to the original if no such variant exists.
     """
     try:
-        upload = await Upload.get(id=upload_id).prefetch_related("doc")
+        upload = await Upload.get(id=upload_id).select_related("doc")
     except DoesNotExist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -331,7 +562,7 @@ async def download_upload(
     if not share_token:
         referer = request.headers.get("referer", "")
         # Match /_share/TOKEN pattern in the Referer URL
-        match = re.search(r"/_share/([a-zA-Z0-9_-]+)", referer)
+        match = _SHARE_REFERER_RE.search(referer)
         if match:
             share_token = match.group(1)
 
@@ -348,14 +579,11 @@ async def download_upload(
     elif upload.doc and upload.doc.public:
         has_access = True
     # 4. Valid share token for the upload's page
-    elif share_token and upload.doc:
-        try:
-            link = await ShareableLink.get(token=share_token, doc_id=upload.doc_id)
-            if not link.is_expired():
-                has_access = True
-                await link.record_access()
-        except DoesNotExist:
-            pass  # Invalid token, access denied
+    elif share_token and upload.doc_id is not None:
+        link_id = await ShareableLink.get_valid_link_id(share_token, upload.doc_id)
+        if link_id is not None:
+            has_access = True
+            await ShareableLink.record_asset_access(link_id, share_token)
 
     if not has_access:
         raise HTTPException(
@@ -363,7 +591,17 @@ async def download_upload(
             detail="Upload not found",
         )
 
-    return FileResponse(
+    if w is not None:
+        variant = find_variant(upload.storage_path, w)
+        if variant is not None:
+            return UploadFileResponse(
+                path=variant,
+                filename=upload.filename.rsplit(".", 1)[0] + ".webp",
+                media_type="image/webp",
+                content_disposition_type="attachment" if download else "inline",
+            )
+
+    return UploadFileResponse(
         path=settings.uploads_dir / upload.storage_path,
         filename=upload.filename,
         media_type=upload.content_type,
@@ -371,7 +609,7 @@ async def download_upload(
     )
 
 
-@router.get("/by-doc/{doc_id}")
+@router.get("/by-doc/{doc_id}", dependencies=[Depends(read_replica)])
 async def list_uploads_by_doc(
     current_user: OptionalUser,
     doc_id: int,
@@ -400,12 +638,9 @@ async def list_uploads_by_doc(
     elif doc.public:
         has_access = True
     elif share_token:
-        try:
-            link = await ShareableLink.get(token=share_token, doc_id=doc_id)
-            if not link.is_expired():
-                has_access = True
-        except DoesNotExist:
-            pass
+        has_access = (
+            await ShareableLink.get_valid_link_id(share_token, doc_id) is not None
+        )
 
     if not has_access:
         raise HTTPException(
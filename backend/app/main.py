@@ -1,5 +1,7 @@
+import asyncio
 import http.cookies
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,9 +10,17 @@ from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import Response
 from starlette_csrf.middleware import CSRFMiddleware
 from tortoise.contrib.fastapi import register_tortoise
+from tortoise.exceptions import BaseORMException
 
 from .api import router
+from .api.metrics import router as metrics_router
+from .models.sharelink import ShareableLink
 from .settings import TORTOISE_ORM, settings
+from .utils.images import shutdown_executor
+from .utils.indexing import create_or_update_index
+from .utils.metrics import MetricsMiddleware, mark_process_dead
+from .utils.querystats import QueryStatsMiddleware, instrument_db_clients
+from .utils.replica import LastWriteMiddleware
 
 
 class CustomCSRFMiddleware(CSRFMiddleware):
@@ -36,11 +46,35 @@ class CustomCSRFMiddleware(CSRFMiddleware):
         )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run background tasks while the application is up.
+    This runs inside the Tortoise ORM lifespan, so the database is available.
+    """
+    instrument_db_clients()
+    if not settings.disable_search and settings.search_backend == "fts5":
+        # The index is in the database, so it is cheap to make sure it exists
+        await create_or_update_index()
+    flusher = asyncio.create_task(ShareableLink.flush_accesses_periodically())
+    yield
+    flusher.cancel()
+    try:
+        await ShareableLink.flush_accesses()
+    except BaseORMException as e:  # pragma: no cover
+        logging.getLogger(__name__).error(f"Failed to flush share link accesses: {e}")
+    shutdown_executor()
+    mark_process_dead()
+
+
 app = FastAPI(
     title="Gnotus",
     description="An open-source knowledge-base software",
     version="0.1.0",
+    lifespan=lifespan,
 )
+# Innermost, so that the session is available
+app.add_middleware(LastWriteMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -65,7 +99,12 @@ app.add_middleware(
     header_name="x-csrftoken",
     sensitive_cookies={settings.session_cookie},
 )
+app.add_middleware(MetricsMiddleware)
+# Outermost, so that all queries of the request are counted
+app.add_middleware(QueryStatsMiddleware)
 app.include_router(router)
+if settings.metrics_enabled and settings.metrics_port is None:
+    app.include_router(metrics_router)
 register_tortoise(app, TORTOISE_ORM, add_exception_handlers=False)
 logging.getLogger("tortoise").setLevel(logging.WARNING)
 logging.basicConfig(
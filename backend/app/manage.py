@@ -64,6 +64,48 @@ async def create_user(admin: bool, username: str, password: str) -> None:
     print(f"User created: {user.username}")
 
 
+@cli.command()
+@async_command
+async def init_db() -> None:
+    """
+    Create the tables of an empty PostgreSQL database from the models and mark
+    all migrations as applied, since the migrations up to this command's
+    introduction are written for SQLite; later migrations run on both.
+    Does nothing if the database already has migrations applied,
+    or if it is SQLite, whose tables are created by running the migrations.
+    """
+    from aerich import Command
+    from aerich.models import Aerich
+    from tortoise import Tortoise, connections
+    from tortoise.exceptions import OperationalError
+
+    from .models.doc import Doc
+    from .settings import TORTOISE_ORM
+
+    async with Command(tortoise_config=TORTOISE_ORM, app="gnotus") as command:
+        if connections.get("default").capabilities.dialect != "postgres":
+            print("Only PostgreSQL databases need to be initialized.")
+            return
+        try:
+            if await Aerich.exists(app="gnotus"):
+                print("The database is already initialized.")
+                return
+        except OperationalError:
+            pass
+        await Tortoise.generate_schemas(safe=True)
+        if not await Doc.exists(parent_id=None):
+            await Doc.create(
+                title="Home",
+                slug="",
+                urlpath="/",
+                metadata={"subtitles": []},
+                markdown="",
+                html="",
+            )
+        await command.upgrade(fake=True)
+    print("Database initialized.")
+
+
 @cli.command()
 @click.option("--dir", "output_dir", help="Directory to output Markdown files.")
 @click.option("--zip", "zip_path", help="Zip file path to output Markdown files.")
@@ -73,6 +115,15 @@ async def create_user(admin: bool, username: str, password: str) -> None:
 @click.option("--revisions", is_flag=True, help="Include revisions in the dump.")
 @click.option("--public", is_flag=True, help="Only dump public documents.")
 @click.option("--attachments", is_flag=True, help="Include attachments in the dump.")
+@click.option(
+    "--since",
+    help="Manifest (or zip) of a previous export; only dump what changed since then.",
+)
+@click.option(
+    "--max-file-size",
+    type=int,
+    help="Split the --single-file dump into numbered files of at most this many bytes.",
+)
 @async_command
 @with_tortoise
 async def dump(
@@ -82,6 +133,8 @@ async def dump(
     revisions: bool,
     public: bool,
     attachments: bool,
+    since: str | None,
+    max_file_size: int | None,
 ) -> None:
     """Dump the database to Markdown files."""
     options = [output_dir, zip_path, single_file]
@@ -93,35 +146,133 @@ async def dump(
         raise click.UsageError(
             "--attachments and --revisions are not supported with --single-file."
         )
+    if max_file_size is not None and not single_file:
+        raise click.UsageError("--max-file-size is only supported with --single-file.")
+    if since and single_file:
+        raise click.UsageError("--since is not supported with --single-file.")
+    previous = None
+    if since:
+        from .utils.dump import load_manifest
+
+        previous = load_manifest(since)
     if single_file:
         from .utils.dump import dump_to_single_file
 
-        await dump_to_single_file(single_file, public_only=public)
-        print(f"Database dumped to {single_file}.")
+        paths = await dump_to_single_file(
+            single_file, public_only=public, max_size=max_file_size
+        )
+        print(f"Database dumped to {', '.join(paths)}.")
     elif zip_path:
-        from .utils.dump import dump_to_zip
+        from .utils.dump import ManifestError, dump_to_zip
 
-        await dump_to_zip(
-            zip_path,
-            include_revisions=revisions,
-            public_only=public,
-            include_attachments=attachments,
-        )
+        try:
+            await dump_to_zip(
+                zip_path,
+                include_revisions=revisions,
+                public_only=public,
+                include_attachments=attachments,
+                previous=previous,
+            )
+        except ManifestError as e:
+            raise click.UsageError(str(e))
         print(f"Database dumped to {zip_path}.")
     elif output_dir:
-        from .utils.dump import dump_to_dir
+        from .utils.dump import ManifestError, dump_to_dir
 
-        await dump_to_dir(
-            output_dir,
-            include_revisions=revisions,
-            public_only=public,
-            include_attachments=attachments,
-        )
+        try:
+            await dump_to_dir(
+                output_dir,
+                include_revisions=revisions,
+                public_only=public,
+                include_attachments=attachments,
+                previous=previous,
+            )
+        except ManifestError as e:
+            raise click.UsageError(str(e))
         print(f"Database dumped to {output_dir}.")
     else:
         raise click.UsageError("Must specify one of --dir, --zip, or --single-file.")
 
 
+@cli.command(name="import")
+@click.argument("path")
+@click.option(
+    "--workers",
+    type=int,
+    help="Number of processes rendering Markdown (defaults to the number of CPUs).",
+)
+@async_command
+@with_tortoise
+async def import_(path: str, workers: int | None) -> None:
+    """Import documents from a directory or zip file made by the dump command."""
+    from .utils.importer import ImportFormatError, import_docs
+
+    try:
+        imported, skipped = await import_docs(path, workers=workers)
+    except ImportFormatError as e:
+        raise click.UsageError(str(e))
+    print(f"Imported {imported} documents, skipped {skipped} existing documents.")
+
+
+@cli.command()
+@click.option(
+    "--batch-size", default=500, help="Number of revisions converted per transaction."
+)
+@click.option("--vacuum", is_flag=True, help="Rebuild the SQLite database afterwards.")
+@async_command
+@with_tortoise
+async def compact_revisions(batch_size: int, vacuum: bool) -> None:
+    """Convert revisions with full content into compressed deltas."""
+    from .utils.revisions import compact_revisions
+
+    count = await compact_revisions(batch_size=batch_size, vacuum=vacuum)
+    print(f"Compacted {count} revisions.")
+
+
+@cli.command()
+@click.option(
+    "--batch-size", default=500, help="Number of revisions deleted per query."
+)
+@async_command
+@with_tortoise
+async def prune_revisions(batch_size: int) -> None:
+    """Delete old revisions according to the retention policy."""
+    from .utils.revisions import prune_revisions
+
+    count = await prune_revisions(batch_size=batch_size)
+    print(f"Pruned {count} revisions.")
+
+
+@cli.command()
+@async_command
+@with_tortoise
+async def generate_variants() -> None:
+    """Generate the resized variants of images uploaded before they were recorded."""
+    from .models.upload import Upload
+    from .utils.images import VARIANT_CONTENT_TYPES, generate_variants
+
+    uploads = await Upload.filter(
+        content_type__in=list(VARIANT_CONTENT_TYPES), width__isnull=True
+    )
+    for upload in uploads:
+        await generate_variants(upload.storage_path, upload.content_type)
+    print(f"Generated variants for {len(uploads)} images.")
+
+
+@cli.command()
+def serve_metrics() -> None:
+    """Serve the metrics of all worker processes on the metrics port, if set."""
+    from prometheus_client import start_http_server
+
+    from .settings import settings
+    from .utils.metrics import metrics_registry
+
+    if not settings.metrics_enabled or settings.metrics_port is None:
+        return
+    _, thread = start_http_server(settings.metrics_port, registry=metrics_registry())
+    thread.join()
+
+
 @cli.command()
 @async_command
 @with_tortoise
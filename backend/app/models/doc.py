@@ -1,13 +1,14 @@
 import re
-from typing import TYPE_CHECKING, AsyncGenerator
+from typing import TYPE_CHECKING, AsyncGenerator, Mapping
 
 import nh3
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 from fastapi import HTTPException
-from tortoise import fields
+from tortoise import connections, fields
 
 from ..schemas.doc import DocSubtitle
+from ..utils.metrics import MARKDOWN_RENDER_DURATION
 from .utils import TimestampedModel
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -26,6 +27,54 @@ def slugify(text: str) -> str:
     return text[:50]
 
 
+@MARKDOWN_RENDER_DURATION.time()
+def render_markdown(
+    markdown: str, images: Mapping[int, tuple[int, list[int]]] | None = None
+) -> tuple[str, list[dict]]:
+    """
+    Render the markdown content of a document to HTML.
+    This includes generating subtitles and ensuring unique IDs for headings.
+    Images embedded from uploads with resized variants, given by image_variants(),
+    get a srcset.
+    Returns the HTML and the subtitles for the document metadata.
+    This is a pure function so that it can run in a worker process.
+    """
+    from markdown_it import MarkdownIt
+
+    from ..utils.images import add_srcset
+
+    html = nh3.clean(MarkdownIt("gfm-like").disable("code").render(markdown))
+    soup = BeautifulSoup(html, "html.parser")
+    subtitles: list[DocSubtitle] = []
+    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        if isinstance(tag, Tag):
+            text = tag.get_text()
+            if not text:
+                continue  # pragma: no cover
+            hash = str(tag.get("id", "") or slugify(text))
+            if not hash:
+                continue  # pragma: no cover
+            hash = "section-" + hash
+            existing_hashes = {subtitle.hash for subtitle in subtitles}
+            count = 1
+            original_hash = hash
+            while hash in existing_hashes:  # pragma: no cover
+                hash = f"{original_hash}-{count}"
+                count += 1
+            tag.attrs["id"] = hash
+            tag.insert(
+                len(tag.contents),
+                soup.new_tag(
+                    "a",
+                    attrs={"class": "heading-anchor", "href": f"#{hash}"},
+                    string="#",
+                ),
+            )
+            subtitles.append(DocSubtitle(title=text, hash=hash))
+    add_srcset(soup, images or {})
+    return str(soup), [subtitle.model_dump(mode="json") for subtitle in subtitles]
+
+
 class Doc(TimestampedModel):
     """
     Model representing a document.
@@ -57,6 +106,13 @@ class Doc(TimestampedModel):
         table = "docs"
         ordering = ["order", "title"]
         unique_together = [("parent_id", "slug")]
+        indexes = [
+            # Listing the children of a document in order
+            ("parent_id", "order", "title"),
+            # Listing public documents in order (sitemap, public exports);
+            # a boolean alone is not selective enough to be worth an index
+            ("public", "order", "title"),
+        ]
 
     @staticmethod
     def validate_slug(slug: str) -> None:
@@ -73,14 +129,45 @@ class Doc(TimestampedModel):
 
     async def parents(self) -> AsyncGenerator["Doc", None]:
         """
-        Asynchronously yield all parent documents of this document.
+        Asynchronously yield all parent documents of this document,
+        from its parent up to the home page.
+        The ancestors are fetched with a single recursive query.
+        """
+        if self.parent_id is None:
+            return
+        parents = await Doc.raw(
+            f"""
+            WITH RECURSIVE "ancestors" ("id", "depth") AS (
+                SELECT {int(self.parent_id)}, 0
+                UNION ALL
+                SELECT "docs"."parent_id", "ancestors"."depth" + 1
+                FROM "docs" JOIN "ancestors" ON "docs"."id" = "ancestors"."id"
+                WHERE "docs"."parent_id" IS NOT NULL
+            )
+            SELECT "docs".* FROM "docs"
+            JOIN "ancestors" ON "docs"."id" = "ancestors"."id"
+            ORDER BY "ancestors"."depth"
+            """
+        )
+        for parent in parents:
+            yield parent
+
+    async def descendant_ids(self) -> list[int]:
+        """
+        Get the IDs of all descendants of this document with a single recursive query.
         """
-        await self.fetch_related("parent")
-        current = self.parent
-        while current:  # pragma: no cover
-            yield current
-            await current.fetch_related("parent")
-            current = current.parent
+        _, rows = await connections.get("default").execute_query(
+            f"""
+            WITH RECURSIVE "subtree" ("id") AS (
+                SELECT "id" FROM "docs" WHERE "parent_id" = {int(self.id)}
+                UNION ALL
+                SELECT "docs"."id" FROM "docs"
+                JOIN "subtree" ON "docs"."parent_id" = "subtree"."id"
+            )
+            SELECT "id" FROM "subtree"
+            """
+        )
+        return [row[0] for row in rows]
 
     async def compute_urlpath(self) -> str:
         """
@@ -126,42 +213,8 @@ class Doc(TimestampedModel):
         This includes generating subtitles and ensuring unique IDs for headings.
         This method should be called after any changes to the markdown content.
         """
-        from markdown_it import MarkdownIt
+        from ..utils.images import image_variants
 
-        self.html = nh3.clean(
-            MarkdownIt("gfm-like").disable("code").render(self.markdown)
-        )
-        soup = BeautifulSoup(self.html, "html.parser")
-        subtitles = []
-        for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
-            if isinstance(tag, Tag):
-                text = tag.get_text()
-                if not text:
-                    continue  # pragma: no cover
-                hash = str(tag.get("id", "") or slugify(text))
-                if not hash:
-                    continue  # pragma: no cover
-                hash = "section-" + hash
-                existing_hashes = {subtitle.hash for subtitle in subtitles}
-                count = 1
-                original_hash = hash
-                while hash in existing_hashes:  # pragma: no cover
-                    hash = f"{original_hash}-{count}"
-                    count += 1
-                tag.attrs["id"] = hash
-                tag.insert(
-                    len(tag.contents),
-                    soup.new_tag(
-                        "a",
-                        attrs={"class": "heading-anchor", "href": f"#{hash}"},
-                        string="#",
-                    ),
-                )
-                subtitles.append(DocSubtitle(title=text, hash=hash))
-        self.html = str(soup)
-        self.metadata["subtitles"] = [
-            DocSubtitle(title=subtitle.title, hash=subtitle.hash).model_dump(
-                mode="json"
-            )
-            for subtitle in subtitles
-        ]
+        images = await image_variants(self.markdown)
+        self.html, subtitles = render_markdown(self.markdown, images)
+        self.metadata["subtitles"] = subtitles
@@ -1,6 +1,12 @@
-from typing import TYPE_CHECKING
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Iterable
 
 from tortoise import Model, fields
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from ..settings import settings
+from ..utils.deltas import apply_delta, compress_text, decompress_text, encode_text
 
 if TYPE_CHECKING:  # pragma: no cover
     from .doc import Doc
@@ -10,6 +16,15 @@ if TYPE_CHECKING:  # pragma: no cover
 class Revision(Model):
     """
     Model representing a revision of a document.
+
+    The markdown of a revision is stored either as a compressed full snapshot
+    or as a compressed delta against an earlier revision (its base).
+    Every revision_snapshot_interval revisions of a document start a new chain
+    with a snapshot, which bounds the work needed to reconstruct a revision.
+    The HTML is not stored; render the markdown when it is needed.
+
+    Revisions created before deltas were introduced keep their full markdown
+    in legacy_markdown until compact_revisions() converts them.
     """
 
     id = fields.IntField(primary_key=True)
@@ -17,8 +32,14 @@ class Revision(Model):
     doc: fields.ForeignKeyRelation["Doc"] = fields.ForeignKeyField(
         "gnotus.Doc", related_name="revisions", on_delete=fields.CASCADE
     )
-    markdown = fields.TextField()
-    html = fields.TextField()
+    # Compressed snapshot or delta, or None for legacy revisions
+    data = fields.BinaryField(null=True)
+    # The snapshot starting this revision's chain, or None for snapshots
+    snapshot_id = fields.IntField(null=True, db_index=True)
+    # The revision this revision's delta applies to, or None for snapshots
+    base_id = fields.IntField(null=True)
+    legacy_markdown = fields.TextField(source_field="markdown")
+    legacy_html = fields.TextField(source_field="html")
     created_by_id: int | None
     created_by: fields.ForeignKeyNullableRelation["User"] = fields.ForeignKeyField(
         "gnotus.User", null=True, on_delete=fields.SET_NULL
@@ -28,3 +49,161 @@ class Revision(Model):
     class Meta:
         table = "revisions"
         ordering = ["-created_at"]
+        indexes = [("doc_id", "created_at")]
+
+    @property
+    def root_id(self) -> int:
+        """
+        The ID of the snapshot starting this revision's chain.
+        """
+        return self.snapshot_id or self.id
+
+    @classmethod
+    async def record(
+        cls, doc_id: int, markdown: str, created_by_id: int | None
+    ) -> "Revision":
+        """
+        Record an edit of a document.
+        Edits by the same user within revision_coalesce_window seconds of the
+        creation of the latest revision replace its content instead of adding
+        a new revision, so that autosaves do not flood the history.
+        """
+        latest = await cls.filter(doc_id=doc_id).order_by("-id").first()
+        if (
+            latest is not None
+            and latest.data is not None
+            and created_by_id is not None
+            and latest.created_by_id == created_by_id
+            and settings.revision_coalesce_window > 0
+            and datetime.now(UTC) - latest.created_at
+            < timedelta(seconds=settings.revision_coalesce_window)
+        ):
+            # The latest revision is not the base of any other revision
+            base = None
+            if latest.base_id is not None:
+                base = await cls.get(id=latest.base_id)
+            await latest._encode(markdown, base)
+            await latest.save(update_fields=["data", "snapshot_id", "base_id"])
+            return latest
+        return await cls.add(doc_id, markdown, created_by_id)
+
+    @classmethod
+    async def add(
+        cls, doc_id: int, markdown: str, created_by_id: int | None
+    ) -> "Revision":
+        """
+        Create a revision of a document, stored as a delta against the
+        previous revision unless a new snapshot is due.
+        """
+        revision = cls(
+            doc_id=doc_id,
+            created_by_id=created_by_id,
+            legacy_markdown="",
+            legacy_html="",
+        )
+        latest = await cls.filter(doc_id=doc_id).order_by("-id").first()
+        await revision._encode(markdown, latest)
+        await revision.save()
+        return revision
+
+    async def _encode(
+        self,
+        markdown: str,
+        base: "Revision | None",
+        base_markdown: str | None = None,
+    ) -> None:
+        """
+        Set the stored data of this revision, as a delta against base if possible.
+        """
+        self.data, self.snapshot_id, self.base_id = compress_text(markdown), None, None
+        if base is None or base.data is None:
+            return
+        chain_length = await Revision.filter(snapshot_id=base.root_id).count() + 1
+        if chain_length >= settings.revision_snapshot_interval:
+            return
+        if base_markdown is None:
+            base_markdown = await base.get_markdown()
+        self.data, is_delta = encode_text(markdown, base_markdown)
+        if is_delta:
+            self.snapshot_id, self.base_id = base.root_id, base.id
+
+    async def get_markdown(self) -> str:
+        """
+        Reconstruct the markdown of this revision.
+        """
+        return (await Revision.get_markdowns([self]))[self.id]
+
+    @classmethod
+    async def get_markdowns(cls, revisions: Iterable["Revision"]) -> dict[int, str]:
+        """
+        Reconstruct the markdown of several revisions,
+        loading each chain they belong to only once.
+        """
+        markdowns: dict[int, str] = {}
+        chains: dict[int, int] = {}
+        for revision in revisions:
+            if revision.data is None:
+                markdowns[revision.id] = revision.legacy_markdown
+            else:
+                chains[revision.root_id] = max(
+                    chains.get(revision.root_id, 0), revision.id
+                )
+        for root_id, until_id in chains.items():
+            texts = decode_chain(
+                await cls.filter(Q(id=root_id) | Q(snapshot_id=root_id))
+                .filter(id__lte=until_id)
+                .order_by("id")
+                .values_list("id", "base_id", "data")
+            )
+            for revision in revisions:
+                if revision.id in texts:
+                    markdowns[revision.id] = texts[revision.id]
+        return markdowns
+
+    @classmethod
+    async def compact_legacy(cls, doc_id: int, batch_size: int) -> int:
+        """
+        Convert the legacy revisions of a document into snapshots and deltas,
+        committing each batch separately. Returns the number converted.
+        """
+        count = 0
+        base: Revision | None = None
+        base_markdown = None
+        while True:
+            batch = (
+                await cls.filter(doc_id=doc_id, data__isnull=True)
+                .order_by("id")
+                .limit(batch_size)
+            )
+            if not batch:
+                return count
+            async with in_transaction("default"):
+                for revision in batch:
+                    markdown = revision.legacy_markdown
+                    await revision._encode(markdown, base, base_markdown)
+                    revision.legacy_markdown = revision.legacy_html = ""
+                    await revision.save(
+                        update_fields=[
+                            "data",
+                            "snapshot_id",
+                            "base_id",
+                            "legacy_markdown",
+                            "legacy_html",
+                        ]
+                    )
+                    base, base_markdown = revision, markdown
+            count += len(batch)
+
+
+def decode_chain(rows: Iterable[tuple[int, int | None, bytes]]) -> dict[int, str]:
+    """
+    Reconstruct the markdown of the (id, base_id, data) rows of a chain,
+    in ascending ID order.
+    """
+    texts: dict[int, str] = {}
+    for id, base_id, data in rows:
+        if base_id is None:
+            texts[id] = decompress_text(data)
+        else:
+            texts[id] = apply_delta(texts[base_id], data)
+    return texts
@@ -1,15 +1,50 @@
+import asyncio
 import secrets
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING
+import time
+from datetime import UTC, datetime
+from logging import getLogger
+from typing import TYPE_CHECKING, NamedTuple
 
 from tortoise import fields
+from tortoise.exceptions import BaseORMException
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
+from ..settings import settings
+from ..utils.cache import TTLCache
 from .utils import TimestampedModel
 
 if TYPE_CHECKING:  # pragma: no cover
     from .doc import Doc
     from .user import User
 
+logger = getLogger(__name__)
+
+
+class ShareTokenInfo(NamedTuple):
+    """
+    What a share link token grants access to.
+    """
+
+    link_id: int
+    doc_id: int
+    expires_at: datetime | None
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and datetime.now(UTC) > self.expires_at
+
+
+# Token -> (time the link was last known to exist, token info)
+_token_cache: TTLCache[str, tuple[float, ShareTokenInfo]] = TTLCache(
+    settings.share_link_cache_ttl, name="share_token"
+)
+# Tokens whose access was recorded within the coalescing window
+_recorded_accesses: TTLCache[str, bool] = TTLCache(
+    settings.share_access_coalesce_window
+)
+# Link ID -> (access count, last access time) not yet written to the database
+_pending_accesses: dict[int, tuple[int, datetime]] = {}
+
 
 class ShareableLink(TimestampedModel):
     """
@@ -33,6 +68,7 @@ class ShareableLink(TimestampedModel):
     class Meta:
         table = "shareable_links"
         ordering = ["-created_at"]
+        indexes = [("doc_id", "created_by_id")]
 
     @staticmethod
     def generate_token() -> str:
@@ -48,13 +84,136 @@ class ShareableLink(TimestampedModel):
         """
         if self.expires_at is None:
             return False
-        return datetime.now(timezone.utc) > self.expires_at
+        return datetime.now(UTC) > self.expires_at
+
+    @classmethod
+    async def lookup_token(cls, token: str) -> ShareTokenInfo | None:
+        """
+        Get what a token grants access to, or None if there is no such link.
+        Lookups are cached briefly so that a popular link or a shared page
+        embedding many uploads does not query the token every time.
+        The expiry is part of the cached value, so expired links are still refused.
+
+        Revoking a link only clears the cache of the worker that handled it,
+        so cached links are checked again once they are older than
+        `share_link_revalidate_interval` seconds.
+        """
+        entry = _token_cache.get(token)
+        if entry is not None:
+            checked_at, info = entry
+            if time.monotonic() - checked_at < settings.share_link_revalidate_interval:
+                return info
+            if not await cls.exists(id=info.link_id):
+                _token_cache.pop(token)
+                return None
+        else:
+            link = await cls.get_or_none(token=token)
+            if link is None:
+                return None
+            info = ShareTokenInfo(link.id, link.doc_id, link.expires_at)
+        _token_cache.set(token, (time.monotonic(), info))
+        return info
+
+    @classmethod
+    async def get_valid_link_id(cls, token: str, doc_id: int) -> int | None:
+        """
+        Get the ID of the unexpired link with the given token for a document,
+        or None if the token does not grant access to it.
+        """
+        info = await cls.lookup_token(token)
+        if info is None or info.doc_id != doc_id or info.is_expired():
+            return None
+        return info.link_id
+
+    @staticmethod
+    def forget_token(token: str) -> None:
+        """
+        Remove a token from the lookup cache, e.g. when the link is revoked.
+        """
+        _token_cache.pop(token)
+
+    @staticmethod
+    def forget_all_tokens() -> None:
+        """
+        Clear the token lookup cache, e.g. when documents and their links are deleted.
+        """
+        _token_cache.clear()
+
+    @staticmethod
+    def _add_pending_access(link_id: int) -> None:
+        count, _ = _pending_accesses.get(link_id, (0, None))
+        _pending_accesses[link_id] = (count + 1, datetime.now(UTC))
+
+    def current_access_stats(self) -> tuple[int, datetime | None]:
+        """
+        Get the access count and last access time,
+        including accesses in this worker not yet written to the database.
+        """
+        count, last_accessed_at = _pending_accesses.get(
+            self.id, (0, self.last_accessed_at)
+        )
+        return self.access_count + count, last_accessed_at
 
     async def record_access(self) -> None:
         """
         Record an access to this shareable link.
-        Updates last_accessed_at and increments access_count.
+        The access is written to the database by the next flush_accesses().
+        """
+        await self.record_token_access(self.id, self.token)
+
+    @classmethod
+    async def record_token_access(cls, link_id: int, token: str) -> None:
+        """
+        Record an access to the link with the given ID and token.
+        """
+        cls._add_pending_access(link_id)
+        _recorded_accesses.set(token, True)
+
+    @classmethod
+    async def record_asset_access(cls, link_id: int, token: str) -> None:
+        """
+        Record an access to an upload embedded in a shared document.
+        Accesses within the coalescing window of a previous one are not counted,
+        so that viewing a shared page counts once rather than once per image.
+        """
+        if _recorded_accesses.get(token):
+            return
+        _recorded_accesses.set(token, True)
+        cls._add_pending_access(link_id)
+
+    @classmethod
+    async def flush_accesses(cls) -> None:
+        """
+        Write the accesses recorded in this worker to the database in one transaction.
+        """
+        global _pending_accesses
+        if not _pending_accesses:
+            return
+        pending, _pending_accesses = _pending_accesses, {}
+        try:
+            async with in_transaction("default"):
+                for link_id, (count, last_accessed_at) in pending.items():
+                    await cls.filter(id=link_id).update(
+                        last_accessed_at=last_accessed_at,
+                        access_count=F("access_count") + count,
+                    )
+        except Exception:
+            # Keep the accesses for the next flush
+            for link_id, (count, last_accessed_at) in pending.items():
+                newer_count, newer_at = _pending_accesses.get(
+                    link_id, (0, last_accessed_at)
+                )
+                _pending_accesses[link_id] = (count + newer_count, newer_at)
+            raise
+
+    @classmethod
+    async def flush_accesses_periodically(cls) -> None:
+        """
+        Flush recorded accesses every share_access_flush_interval seconds, forever.
         """
-        self.last_accessed_at = datetime.now(timezone.utc)
-        self.access_count += 1
-        await self.save(update_fields=["last_accessed_at", "access_count"])
+        while True:
+            await asyncio.sleep(settings.share_access_flush_interval)
+            try:
+                await cls.flush_accesses()
+            except BaseORMException as e:  # pragma: no cover
+                logger.error(f"Failed to flush share link accesses: {e}")
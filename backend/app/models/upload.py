@@ -21,6 +21,9 @@ class Upload(TimestampedModel):
     size = fields.IntField()
     public = fields.BooleanField(default=False)
     storage_path = fields.CharField(max_length=256, unique=True)
+    # Width of an image, and those of its resized variants, once generated
+    width = fields.IntField(null=True)
+    variant_widths = fields.JSONField(default=list)
     created_by_id: int | None
     created_by = fields.ForeignKeyField(
         "gnotus.User",
@@ -39,6 +42,7 @@ class Upload(TimestampedModel):
     class Meta:
         table = "uploads"
         ordering = ["filename", "created_at"]
+        indexes = [("doc_id",)]
 
     @staticmethod
     def generate_storage_path() -> str:
@@ -101,6 +101,11 @@ class DocSearchResult(BaseModel):
     urlpath: str
     text: str
     public: bool
+    # The heading of the matching section, or empty for the text before it
+    section: str = ""
+    anchor: str = ""
+    # Titles of the ancestors of the document, from the home page down
+    breadcrumbs: list[str] = []
 
 
 class DocSearchResponse(BaseModel):
@@ -110,16 +115,35 @@ class DocSearchResponse(BaseModel):
 
     total: int
     results: list[DocSearchResult] = []
+    # Whether there are more results after this page
+    has_more: bool = False
+
+
+class DocSuggestion(BaseModel):
+    """
+    Model for autocomplete suggestions of documents.
+    """
+
+    id: int
+    title: str
+    urlpath: str
+    public: bool
 
 
 class DocIndexSchema(BaseModel):
     """
-    Schema for indexing documents in Meilisearch.
+    Schema for indexing documents in the search backend.
+    Each section of a document, starting at a heading, is a separate record.
     """
 
+    # "<doc_id>_<section index>"
     id: str
+    doc_id: int
     urlpath: str
     urlpathbase: str
     title: str
+    section: str
+    anchor: str
+    breadcrumbs: list[str]
     text: str
     public: bool
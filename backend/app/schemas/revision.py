@@ -1,4 +1,5 @@
 import datetime
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -22,3 +23,37 @@ class RevisionResponse(RevisionBase):
 
     id: int
     created_by_username: str | None
+
+
+class RevisionDiffChange(BaseModel):
+    """
+    A run of text that is unchanged, deleted or inserted.
+    """
+
+    op: Literal["equal", "delete", "insert"]
+    text: str
+
+
+class RevisionDiffHunk(BaseModel):
+    """
+    A group of nearby changes with their surrounding context.
+    Line numbers start at 1, as in unified diffs.
+    """
+
+    old_start: int
+    old_lines: int
+    new_start: int
+    new_lines: int
+    changes: list[RevisionDiffChange]
+
+
+class RevisionDiffResponse(BaseModel):
+    """
+    Response model for the diff between two revisions.
+    A to_revision_id of None means the current document content.
+    """
+
+    from_revision_id: int
+    to_revision_id: int | None
+    mode: Literal["line", "word"]
+    hunks: list[RevisionDiffHunk]
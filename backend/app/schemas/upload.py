@@ -46,3 +46,30 @@ class UploadResponse(UploadBase):
     created_by_id: int | None
     created_at: datetime
     updated_at: datetime
+
+
+class UploadSessionCreate(BaseModel):
+    """
+    Model for starting a resumable chunked upload.
+    """
+
+    filename: str = Field(min_length=3, max_length=255)
+    content_type: str
+    size: int = Field(gt=0)
+    public: bool
+    doc_id: int | None = None
+
+
+class UploadSessionResponse(BaseModel):
+    """
+    Model for the state of a resumable chunked upload.
+    """
+
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    chunk_size: int
+    chunk_count: int
+    received_chunks: list[int]
+    created_at: datetime
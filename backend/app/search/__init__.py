@@ -0,0 +1,27 @@
+from ..settings import settings
+from .base import MAX_SEARCH_RESULTS as MAX_SEARCH_RESULTS
+from .base import MAX_SECTIONS as MAX_SECTIONS
+from .base import SearchBackend as SearchBackend
+
+_backend: SearchBackend | None = None
+
+
+def get_search_backend() -> SearchBackend:
+    """
+    Get the search backend selected in the settings.
+    """
+    global _backend
+    if _backend is None:
+        if settings.search_backend == "fts5":
+            from .fts5 import FTS5Backend
+
+            _backend = FTS5Backend()
+        elif settings.search_backend == "memory":
+            from .memory import MemoryBackend
+
+            _backend = MemoryBackend()
+        else:  # pragma: no cover
+            from .meilisearch import MeilisearchBackend
+
+            _backend = MeilisearchBackend()
+    return _backend
@@ -0,0 +1,67 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterable
+
+from ..schemas.doc import DocIndexSchema, DocSearchResult, DocSuggestion
+
+# Markup around matched terms and cropped text in search results
+HIGHLIGHT_PRE_TAG = "<em class='search-highlight'>"
+HIGHLIGHT_POST_TAG = "</em>"
+CROP_MARKER = "..."
+# Maximum number of records (sections) of a document
+MAX_SECTIONS = 1 << 16
+# Maximum offset + limit of a search
+MAX_SEARCH_RESULTS = 1000
+
+
+class SearchBackend(ABC):
+    """
+    A full-text index of documents.
+    Documents are always indexed and deleted in batches.
+    Each document has a record per section, and searches return the best
+    matching section of each document.
+    """
+
+    @abstractmethod
+    async def setup(self) -> None:
+        """
+        Create the index if it does not exist and update its settings.
+        """
+
+    @abstractmethod
+    async def index(self, records: list[DocIndexSchema]) -> None:
+        """
+        Add the records of documents to the index,
+        replacing all previous records of the same documents.
+        """
+
+    @abstractmethod
+    async def delete(self, doc_ids: list[int]) -> None:
+        """
+        Remove all records of documents from the index.
+        """
+
+    @abstractmethod
+    async def rebuild(self, batches: AsyncIterable[list[DocIndexSchema]]) -> None:
+        """
+        Replace the contents of the index with the given batches of documents.
+        Searches keep using the previous contents until the new ones are complete.
+        """
+
+    @abstractmethod
+    async def search(
+        self, query: str, public_only: bool, limit: int = 20, offset: int = 0
+    ) -> list[DocSearchResult]:
+        """
+        Search the index, with the best matches first.
+        Matched terms are highlighted in the title and text,
+        and the text is cropped around the matches.
+        """
+
+    @abstractmethod
+    async def suggest(
+        self, query: str, public_only: bool, limit: int = 10
+    ) -> list[DocSuggestion]:
+        """
+        Find documents whose titles match a query being typed,
+        with the last word matched as a prefix. Nothing is highlighted or cropped.
+        """
@@ -0,0 +1,236 @@
+import json
+import re
+from logging import getLogger
+from typing import AsyncIterable
+
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from ..schemas.doc import DocIndexSchema, DocSearchResult, DocSuggestion
+from .base import (
+    CROP_MARKER,
+    HIGHLIGHT_POST_TAG,
+    HIGHLIGHT_PRE_TAG,
+    MAX_SECTIONS,
+    SearchBackend,
+)
+
+logger = getLogger(__name__)
+
+# Number of tokens in the cropped text of a result (at most 64 for snippet())
+SNIPPET_TOKENS = 48
+# Relative weights of the title, section, text and urlpath columns in the ranking
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 5.0)
+# The rowid of a record is doc_id << SECTION_BITS | section index
+SECTION_BITS = MAX_SECTIONS.bit_length() - 1
+COLUMNS = "title, section, text, urlpath, anchor, breadcrumbs, public"
+
+SETUP_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS "docs_fts" USING fts5(
+    title, section, text, urlpath,
+    anchor UNINDEXED, breadcrumbs UNINDEXED, public UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS "docs_fts_update"
+AFTER UPDATE OF title, urlpath, public ON "docs" BEGIN
+    UPDATE "docs_fts"
+    SET title = new.title, urlpath = new.urlpath, public = new.public
+    WHERE rowid BETWEEN new.id << {SECTION_BITS}
+        AND (new.id << {SECTION_BITS}) + {MAX_SECTIONS - 1};
+END;
+CREATE TRIGGER IF NOT EXISTS "docs_fts_delete" AFTER DELETE ON "docs" BEGIN
+    DELETE FROM "docs_fts"
+    WHERE rowid BETWEEN old.id << {SECTION_BITS}
+        AND (old.id << {SECTION_BITS}) + {MAX_SECTIONS - 1};
+END;
+"""
+
+# Index tables created before documents were split into sections
+OUTDATED_SQL = """
+DROP TRIGGER IF EXISTS "docs_fts_update";
+DROP TRIGGER IF EXISTS "docs_fts_delete";
+DROP TABLE IF EXISTS "docs_fts";
+"""
+
+
+def match_query(query: str) -> str:
+    """
+    Convert a user query into an FTS5 query matching all of its words,
+    with the last one matched as a prefix since it may still be typed.
+    Returns an empty string if the query has no words.
+    """
+    terms = [f'"{term}"' for term in re.findall(r"\w+", query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _rowid(record: DocIndexSchema) -> int:
+    return record.doc_id << SECTION_BITS | int(record.id.rpartition("_")[2])
+
+
+def _row(record: DocIndexSchema) -> list:
+    return [
+        _rowid(record),
+        record.title,
+        record.section,
+        record.text,
+        record.urlpath,
+        record.anchor,
+        json.dumps(record.breadcrumbs),
+        int(record.public),
+    ]
+
+
+class FTS5Backend(SearchBackend):
+    """
+    Search index in an FTS5 table of the SQLite database.
+
+    Each section of a document is a row whose rowid combines the document ID
+    and the section index, so all sections of a document are a rowid range.
+    Triggers on the docs table update the title, URL path and public flag of
+    indexed documents, and remove deleted documents (including descendants
+    deleted by cascade), in the same transaction as the change to the document.
+    The text is updated when documents are indexed after their content changes.
+    """
+
+    async def setup(self) -> None:
+        connection = connections.get("default")
+        _, columns = await connection.execute_query('PRAGMA table_info("docs_fts")')
+        if columns and "anchor" not in {column[1] for column in columns}:
+            logger.warning(
+                "Recreating the outdated search index; it must be rebuilt "
+                "with the index command."
+            )
+            await connection.execute_script(OUTDATED_SQL)
+        await connection.execute_script(SETUP_SQL)
+
+    async def index(self, records: list[DocIndexSchema]) -> None:
+        if not records:
+            return
+        doc_ids = list({record.doc_id for record in records})
+        async with in_transaction("default") as connection:
+            await self._delete(connection, doc_ids)
+            await self._insert(connection, records)
+
+    async def rebuild(self, batches: AsyncIterable[list[DocIndexSchema]]) -> None:
+        """
+        Fill a staging table, then replace the contents of the index with it
+        in a single transaction.
+        """
+        connection = connections.get("default")
+        await connection.execute_query('DROP TABLE IF EXISTS "docs_fts_rebuild"')
+        await connection.execute_query(
+            f'CREATE TABLE "docs_fts_rebuild" (id INTEGER PRIMARY KEY, {COLUMNS})'
+        )
+        async for batch in batches:
+            await self._insert(connection, batch, table="docs_fts_rebuild")
+        async with in_transaction("default") as connection:
+            await connection.execute_query('DELETE FROM "docs_fts"')
+            await connection.execute_query(
+                f'INSERT INTO "docs_fts" (rowid, {COLUMNS}) '
+                f'SELECT id, {COLUMNS} FROM "docs_fts_rebuild"'
+            )
+            await connection.execute_query('DROP TABLE "docs_fts_rebuild"')
+
+    @staticmethod
+    async def _insert(
+        connection, records: list[DocIndexSchema], table: str = "docs_fts"
+    ) -> None:
+        rowid = "rowid" if table == "docs_fts" else "id"
+        await connection.execute_many(
+            f'INSERT INTO "{table}" ({rowid}, {COLUMNS}) '
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [_row(record) for record in records],
+        )
+
+    async def delete(self, doc_ids: list[int]) -> None:
+        if doc_ids:
+            await self._delete(connections.get("default"), doc_ids)
+
+    @staticmethod
+    async def _delete(connection, doc_ids: list[int]) -> None:
+        # A rowid range per document lets FTS5 avoid a full scan
+        await connection.execute_many(
+            'DELETE FROM "docs_fts" WHERE rowid BETWEEN ? AND ?',
+            [
+                [doc_id << SECTION_BITS, (doc_id << SECTION_BITS) + MAX_SECTIONS - 1]
+                for doc_id in doc_ids
+            ],
+        )
+
+    async def search(
+        self, query: str, public_only: bool, limit: int = 20, offset: int = 0
+    ) -> list[DocSearchResult]:
+        match = match_query(query)
+        if not match:
+            return []
+        connection = connections.get("default")
+        # The best section of each document is selected first, since the
+        # highlight functions cannot be used in a query with a window function.
+        _, rows = await connection.execute_query(
+            "SELECT rowid FROM ("
+            f"SELECT rowid, rank, row_number() OVER ("
+            f"PARTITION BY rowid >> {SECTION_BITS} ORDER BY rank) AS n "
+            'FROM "docs_fts" WHERE "docs_fts" MATCH ? AND rank MATCH ? '
+            + ("AND public = 1" if public_only else "")
+            + ") WHERE n = 1 ORDER BY rank, rowid LIMIT ? OFFSET ?",
+            [match, f"bm25({', '.join(map(str, BM25_WEIGHTS))})", limit, offset],
+        )
+        rowids = [row[0] for row in rows]
+        if not rowids:
+            return []
+        placeholders = ", ".join("?" * len(rowids))
+        _, rows = await connection.execute_query(
+            "SELECT rowid, urlpath, public, anchor, breadcrumbs, "
+            'highlight("docs_fts", 0, ?, ?), '
+            'highlight("docs_fts", 1, ?, ?), '
+            'snippet("docs_fts", 2, ?, ?, ?, ?) '
+            f'FROM "docs_fts" WHERE "docs_fts" MATCH ? AND rowid IN ({placeholders})',
+            [
+                HIGHLIGHT_PRE_TAG,
+                HIGHLIGHT_POST_TAG,
+                HIGHLIGHT_PRE_TAG,
+                HIGHLIGHT_POST_TAG,
+                HIGHLIGHT_PRE_TAG,
+                HIGHLIGHT_POST_TAG,
+                CROP_MARKER,
+                SNIPPET_TOKENS,
+                match,
+                *rowids,
+            ],
+        )
+        results = {
+            row[0]: DocSearchResult(
+                id=row[0] >> SECTION_BITS,
+                urlpath=row[1],
+                public=bool(row[2]),
+                anchor=row[3],
+                breadcrumbs=json.loads(row[4]),
+                title=row[5],
+                section=row[6],
+                text=row[7],
+            )
+            for row in rows
+        }
+        return [results[rowid] for rowid in rowids if rowid in results]
+
+    async def suggest(
+        self, query: str, public_only: bool, limit: int = 10
+    ) -> list[DocSuggestion]:
+        match = match_query(query)
+        if not match:
+            return []
+        # The first record of each document always exists and has its title
+        _, rows = await connections.get("default").execute_query(
+            f"SELECT rowid >> {SECTION_BITS}, title, urlpath, public "
+            'FROM "docs_fts" WHERE "docs_fts" MATCH ? '
+            f"AND rowid & {MAX_SECTIONS - 1} = 0 "
+            + ("AND public = 1 " if public_only else "")
+            + "ORDER BY rank LIMIT ?",
+            [f"title : ({match})", limit],
+        )
+        return [
+            DocSuggestion(id=row[0], title=row[1], urlpath=row[2], public=bool(row[3]))
+            for row in rows
+        ]
@@ -0,0 +1,204 @@
+from typing import AsyncIterable
+
+from meilisearch_python_sdk import AsyncClient
+from meilisearch_python_sdk.errors import MeilisearchApiError
+from meilisearch_python_sdk.models.search import SearchResults
+from meilisearch_python_sdk.models.settings import (
+    MeilisearchSettings,
+    MinWordSizeForTypos,
+    Pagination,
+    TypoTolerance,
+)
+
+from ..schemas.doc import DocIndexSchema, DocSearchResult, DocSuggestion
+from ..settings import settings
+from .base import (
+    CROP_MARKER,
+    HIGHLIGHT_POST_TAG,
+    HIGHLIGHT_PRE_TAG,
+    MAX_SEARCH_RESULTS,
+    SearchBackend,
+)
+
+index_settings = MeilisearchSettings(
+    searchable_attributes=["title", "section", "text", "urlpath", "urlpathbase"],
+    displayed_attributes=[
+        "id",
+        "doc_id",
+        "title",
+        "section",
+        "anchor",
+        "breadcrumbs",
+        "urlpath",
+        "text",
+        "public",
+    ],
+    stop_words=[
+        "the",
+        "and",
+        "is",
+        "to",
+        "a",
+        "of",
+        "in",
+        "for",
+        "on",
+        "with",
+        "as",
+        "that",
+        "by",
+    ],
+    ranking_rules=[
+        "typo",
+        "words",
+        "proximity",
+        "attribute",
+        "exactness",
+    ],
+    filterable_attributes=["public", "doc_id"],
+    # Return only the best matching section of each document
+    distinct_attribute="doc_id",
+    typo_tolerance=TypoTolerance(
+        enabled=True,
+        disable_on_words=["urlpathbase"],
+        min_word_size_for_typos=MinWordSizeForTypos(
+            one_typo=5,
+            two_typos=10,
+        ),
+    ),
+    pagination=Pagination(
+        max_total_hits=MAX_SEARCH_RESULTS,
+    ),
+)
+
+
+def get_meilisearch_client():  # pragma: no cover
+    """
+    Create a Meilisearch client using the configured settings.
+    """
+    return AsyncClient(
+        url=settings.meilisearch_url,
+        api_key=settings.meilisearch_api_key.get_secret_value(),
+    )
+
+
+class MeilisearchBackend(SearchBackend):  # pragma: no cover
+    """
+    Search index in a Meilisearch instance.
+    """
+
+    def _index(self):
+        return get_meilisearch_client().index(settings.meilisearch_index_name)
+
+    async def setup(self) -> None:
+        client = get_meilisearch_client()
+        try:
+            index = client.index(settings.meilisearch_index_name)
+            await index.update_settings(index_settings)
+            return
+        except MeilisearchApiError as e:
+            if e.code != "index_not_found":
+                raise
+        await client.create_index(
+            uid=settings.meilisearch_index_name,
+            primary_key="id",
+            settings=index_settings,
+        )
+
+    async def index(self, records: list[DocIndexSchema]) -> None:
+        # Remove sections that no longer exist; tasks are processed in order
+        await self.delete(list({record.doc_id for record in records}))
+        await self._index().update_documents(
+            [record.model_dump(mode="json") for record in records]
+        )
+
+    async def delete(self, doc_ids: list[int]) -> None:
+        if doc_ids:
+            await self._index().delete_documents_by_filter(
+                f"doc_id IN [{', '.join(map(str, doc_ids))}]"
+            )
+
+    async def rebuild(self, batches: AsyncIterable[list[DocIndexSchema]]) -> None:
+        """
+        Fill a new index and swap it with the current one once it is ready.
+        """
+        client = get_meilisearch_client()
+        uid = settings.meilisearch_index_name
+        new_uid = f"{uid}_rebuild"
+        await client.delete_index_if_exists(new_uid)
+        new_index = await client.create_index(
+            uid=new_uid, primary_key="id", settings=index_settings
+        )
+        task = None
+        async for batch in batches:
+            task = await new_index.update_documents(
+                [record.model_dump(mode="json") for record in batch]
+            )
+        if task is not None:
+            # Tasks of an index are processed in order
+            await client.wait_for_task(
+                task.task_uid, timeout_in_ms=None, raise_for_status=True
+            )
+        await self.setup()
+        task = await client.swap_indexes([(uid, new_uid)])
+        await client.wait_for_task(task.task_uid, raise_for_status=True)
+        await client.delete_index_if_exists(new_uid)
+
+    async def search(
+        self, query: str, public_only: bool, limit: int = 20, offset: int = 0
+    ) -> list[DocSearchResult]:
+        results: SearchResults[dict] = await self._index().search(
+            query=query,
+            filter=["public = true"] if public_only else [],
+            limit=limit,
+            offset=offset,
+            attributes_to_retrieve=[
+                "doc_id",
+                "title",
+                "section",
+                "anchor",
+                "breadcrumbs",
+                "urlpath",
+                "public",
+                "text",
+            ],
+            attributes_to_crop=["text"],
+            crop_length=100,
+            crop_marker=CROP_MARKER,
+            attributes_to_highlight=["title", "section", "text"],
+            highlight_pre_tag=HIGHLIGHT_PRE_TAG,
+            highlight_post_tag=HIGHLIGHT_POST_TAG,
+        )
+        return [
+            DocSearchResult(
+                id=result["doc_id"],
+                title=result["_formatted"]["title"],
+                section=result["_formatted"]["section"],
+                anchor=result["anchor"],
+                breadcrumbs=result["breadcrumbs"],
+                urlpath=result["urlpath"],
+                text=result["_formatted"]["text"],
+                public=result["public"],
+            )
+            for result in results.hits
+        ]
+
+    async def suggest(
+        self, query: str, public_only: bool, limit: int = 10
+    ) -> list[DocSuggestion]:
+        results: SearchResults[dict] = await self._index().search(
+            query=query,
+            filter=["public = true"] if public_only else [],
+            limit=limit,
+            attributes_to_search_on=["title"],
+            attributes_to_retrieve=["doc_id", "title", "urlpath", "public"],
+        )
+        return [
+            DocSuggestion(
+                id=result["doc_id"],
+                title=result["title"],
+                urlpath=result["urlpath"],
+                public=result["public"],
+            )
+            for result in results.hits
+        ]
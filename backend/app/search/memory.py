@@ -0,0 +1,209 @@
+import bisect
+import math
+import re
+from typing import AsyncIterable, Callable
+
+from ..schemas.doc import DocIndexSchema, DocSearchResult, DocSuggestion
+from .base import CROP_MARKER, HIGHLIGHT_POST_TAG, HIGHLIGHT_PRE_TAG, SearchBackend
+
+WORD_PATTERN = re.compile(r"\w+")
+# Relative weights of the fields in the ranking
+FIELD_WEIGHTS = {"title": 10.0, "section": 5.0, "text": 1.0, "urlpath": 5.0}
+# Number of words in the cropped text of a result
+CROP_WORDS = 48
+
+
+class MemoryBackend(SearchBackend):
+    """
+    Search index kept in process memory as an inverted index
+    from lowercased words to the records (sections of documents) containing them.
+    Each process has its own index, so this is meant for tests and benchmarks.
+    """
+
+    def __init__(self) -> None:
+        self.records: dict[str, DocIndexSchema] = {}
+        # Document ID -> IDs of its records
+        self.doc_records: dict[int, list[str]] = {}
+        # Word -> record ID -> weighted number of occurrences
+        self.postings: dict[str, dict[str, float]] = {}
+        # Sorted words, for prefix lookups, or None if it must be rebuilt
+        self._words: list[str] | None = []
+
+    async def setup(self) -> None:
+        pass
+
+    async def index(self, records: list[DocIndexSchema]) -> None:
+        for doc_id in {record.doc_id for record in records}:
+            self._remove(doc_id)
+        for record in records:
+            self.records[record.id] = record
+            self.doc_records.setdefault(record.doc_id, []).append(record.id)
+            for field, weight in FIELD_WEIGHTS.items():
+                for word in _words(getattr(record, field)):
+                    if word not in self.postings:
+                        self.postings[word] = {}
+                        self._words = None
+                    postings = self.postings[word]
+                    postings[record.id] = postings.get(record.id, 0.0) + weight
+
+    async def delete(self, doc_ids: list[int]) -> None:
+        for doc_id in doc_ids:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: int) -> None:
+        for record_id in self.doc_records.pop(doc_id, []):
+            record = self.records.pop(record_id)
+            for field in FIELD_WEIGHTS:
+                for word in _words(getattr(record, field)):
+                    postings = self.postings.get(word)
+                    if (
+                        postings is not None
+                        and postings.pop(record_id, None)
+                        and not postings
+                    ):
+                        del self.postings[word]
+                        self._words = None
+
+    async def rebuild(self, batches: AsyncIterable[list[DocIndexSchema]]) -> None:
+        new = MemoryBackend()
+        async for batch in batches:
+            await new.index(batch)
+        self.records, self.doc_records = new.records, new.doc_records
+        self.postings, self._words = new.postings, None
+
+    def _prefixed(self, prefix: str) -> list[str]:
+        """Get the indexed words starting with a prefix."""
+        if self._words is None:
+            self._words = sorted(self.postings)
+        start = bisect.bisect_left(self._words, prefix)
+        end = bisect.bisect_left(self._words, prefix + "\U0010ffff")
+        return self._words[start:end]
+
+    def _scores(self, words: list[str]) -> dict[str, float]:
+        """Score the records containing any of the words, weighted by rarity."""
+        scores: dict[str, float] = {}
+        for word in words:
+            postings = self.postings.get(word, {})
+            if not postings:
+                continue
+            idf = math.log(1 + len(self.records) / len(postings))
+            for record_id, weight in postings.items():
+                scores[record_id] = scores.get(record_id, 0.0) + weight * idf
+        return scores
+
+    def _matching(self, terms: list[str]) -> dict[str, float]:
+        """
+        Score the records matching all terms. Like the FTS5 backend,
+        the last term is a prefix since it may still be typed.
+        """
+        matches = [[term] for term in terms[:-1]] + [self._prefixed(terms[-1])]
+        scores = self._scores(matches[0])
+        for words in matches[1:]:
+            term_scores = self._scores(words)
+            scores = {
+                record_id: score + term_scores[record_id]
+                for record_id, score in scores.items()
+                if record_id in term_scores
+            }
+        return scores
+
+    async def search(
+        self, query: str, public_only: bool, limit: int = 20, offset: int = 0
+    ) -> list[DocSearchResult]:
+        terms = _words(query)
+        if not terms:
+            return []
+        scores = self._matching(terms)
+        # The best matching record of each document
+        best: dict[int, tuple[float, str]] = {}
+        for record_id, score in scores.items():
+            record = self.records[record_id]
+            if public_only and not record.public:
+                continue
+            if record.doc_id not in best or (-score, record_id) < best[record.doc_id]:
+                best[record.doc_id] = (-score, record_id)
+        ranked = sorted(best, key=lambda doc_id: (best[doc_id][0], doc_id))
+        words = set(terms[:-1])
+        prefix = terms[-1]
+
+        def matched(word: str) -> bool:
+            word = word.lower()
+            return word in words or word.startswith(prefix)
+
+        results = []
+        for doc_id in ranked[offset : offset + limit]:
+            record = self.records[best[doc_id][1]]
+            results.append(
+                DocSearchResult(
+                    id=doc_id,
+                    title=_highlight(record.title, matched),
+                    section=_highlight(record.section, matched),
+                    anchor=record.anchor,
+                    breadcrumbs=record.breadcrumbs,
+                    urlpath=record.urlpath,
+                    text=_crop(record.text, matched),
+                    public=record.public,
+                )
+            )
+        return results
+
+    async def suggest(
+        self, query: str, public_only: bool, limit: int = 10
+    ) -> list[DocSuggestion]:
+        terms = _words(query)
+        if not terms:
+            return []
+        scores = self._matching(terms)
+        words = set(terms[:-1])
+        prefix = terms[-1]
+        results: list[DocSuggestion] = []
+        for record_id in sorted(scores, key=lambda id: (-scores[id], id)):
+            record = self.records[record_id]
+            # The first record of each document always exists and has its title
+            if not record_id.endswith("_0") or (public_only and not record.public):
+                continue
+            title = set(_words(record.title))
+            if words <= title and any(word.startswith(prefix) for word in title):
+                results.append(
+                    DocSuggestion(
+                        id=record.doc_id,
+                        title=record.title,
+                        urlpath=record.urlpath,
+                        public=record.public,
+                    )
+                )
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def _words(text: str) -> list[str]:
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+
+def _highlight(text: str, matched: Callable[[str], bool]) -> str:
+    """Wrap the matched words of a text in highlight tags."""
+    return WORD_PATTERN.sub(
+        lambda m: (
+            f"{HIGHLIGHT_PRE_TAG}{m[0]}{HIGHLIGHT_POST_TAG}" if matched(m[0]) else m[0]
+        ),
+        text,
+    )
+
+
+def _crop(text: str, matched: Callable[[str], bool]) -> str:
+    """Crop a text to CROP_WORDS words around the first match and highlight it."""
+    spans = [m.span() for m in WORD_PATTERN.finditer(text)]
+    if len(spans) <= CROP_WORDS:
+        return _highlight(text, matched)
+    first = next(
+        (i for i, (start, end) in enumerate(spans) if matched(text[start:end])), 0
+    )
+    start = max(0, min(first - CROP_WORDS // 4, len(spans) - CROP_WORDS))
+    end = start + CROP_WORDS
+    cropped = _highlight(text[spans[start][0] : spans[end - 1][1]], matched)
+    if start > 0:
+        cropped = CROP_MARKER + cropped
+    if end < len(spans):
+        cropped += CROP_MARKER
+    return cropped
@@ -4,10 +4,12 @@ import os
 import secrets
 from pathlib import Path
 from typing import Literal
+from urllib.parse import parse_qs, urlsplit
 
 import yaml
 from pydantic import Field, FilePath, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from tortoise.backends.base.config_generator import expand_db_url
 
 _secrets_dir = os.environ.get("GNOTUS_SECRETS_DIR")
 if _secrets_dir:
@@ -31,9 +33,36 @@ class Settings(BaseSettings):
 
     # Database
     db_url: str = "sqlite://./gnotus.db"
+    # SQLite pragmas applied to every connection,
+    # unless given as query parameters in db_url
+    sqlite_busy_timeout: int = 5000  # milliseconds
+    sqlite_journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST"] = "WAL"
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    sqlite_cache_size: int = -64 * 1024  # negative values are in KiB, so 64 MB
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 256 MB
+    sqlite_temp_store: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    # PostgreSQL connection pool of each worker process,
+    # unless given as query parameters in db_url
+    postgres_pool_min_size: int = 1
+    postgres_pool_max_size: int = 10
+    postgres_max_inactive_connection_lifetime: float = 300  # seconds
+    # Prepared statements cached per connection, 0 behind PgBouncer in transaction mode
+    postgres_statement_cache_size: int = 100
+    # Optional read replica for read-only endpoints
+    db_replica_url: str | None = None
+    # Seconds after a write request that the user reads from the primary
+    db_replica_lag: float = 5
 
     # Logging
     log_level: Literal["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"] = "INFO"
+    slow_query_threshold: float = 200  # milliseconds, 0 to disable
+    # Report the number of queries and their time in Server-Timing headers
+    server_timing: bool = True
+
+    # Prometheus metrics, served at /metrics,
+    # or on metrics_port instead by the serve-metrics command
+    metrics_enabled: bool = True
+    metrics_port: int | None = None
 
     # Site URL
     base_url: str = "http://localhost"
@@ -57,17 +86,40 @@ class Settings(BaseSettings):
     csrf_cookie_domain: str | None = None
     csrf_cookie_samesite: Literal["lax", "strict", "none"] = "strict"
 
+    # Revisions
+    revision_snapshot_interval: int = 20  # revisions per full snapshot
+    revision_coalesce_window: int = 60 * 5  # 5 minutes, 0 to disable
+    revision_keep_all_days: int = 30  # keep every revision this recent
+    revision_keep_daily_days: int = 365  # then one per day, then one per week
+    revision_diff_cache_ttl: int = 60 * 10  # 10 minutes
+
+    # Share links
+    share_link_cache_ttl: int = 30  # seconds
+    # Cached links are checked against the database when older than this,
+    # as revoking a link only clears the cache of one worker
+    share_link_revalidate_interval: int = 2  # seconds
+    shared_doc_cache_ttl: int = 60  # seconds
+    share_access_coalesce_window: int = 60 * 30  # 30 minutes
+    share_access_flush_interval: int = 10  # seconds
+
     # Indexing
     disable_search: bool = False
+    # "memory" keeps a separate index in each process, for tests and benchmarks
+    search_backend: Literal["meilisearch", "fts5", "memory"] = "meilisearch"
     meilisearch_url: str = "http://localhost:7700"
     meilisearch_api_key: SecretStr = Field(
         default_factory=lambda: SecretStr("changeme")
     )
     meilisearch_index_name: str = "docs"
+    search_cache_ttl: int = 10  # seconds, 0 to disable
+    search_cache_size: int = 1000  # cached queries per process
 
     # Uploads
     uploads_dir: Path = Path("./uploads")
     max_upload_size: int = 10 * 1024 * 1024  # 10 MB
+    max_chunked_upload_size: int = 1024 * 1024 * 1024  # 1 GB
+    upload_chunk_size: int = 8 * 1024 * 1024  # 8 MB
+    upload_session_max_age: int = 60 * 60 * 24  # 1 day
     max_upload_filename_length: int = 64
     allowed_upload_filename_extensions: list[str] = [
         "jpg",
@@ -81,6 +133,11 @@ class Settings(BaseSettings):
         "txt",
     ]
 
+    # Image variants
+    image_variant_widths: list[int] = [160, 320, 640, 1280, 1920]
+    image_variant_quality: int = 80
+    image_variant_workers: int = 2
+
     # Icon uploads
     allowed_icon_extensions: list[str] = [
         "svg",
@@ -113,9 +170,56 @@ settings = Settings(**config)
 if settings.base_url.endswith("/"):  # pragma: no cover
     settings.base_url = settings.base_url.rstrip("/")
 
+
+def _connection_config(db_url: str) -> str | dict:
+    """
+    Get the Tortoise connection config for a database URL,
+    adding the configured pragmas to SQLite connections
+    and the configured pool settings to PostgreSQL connections.
+    """
+    if db_url.startswith(("postgres:", "asyncpg:")):
+        return _postgres_config(db_url)
+    if not db_url.startswith("sqlite:"):
+        return db_url
+    config = expand_db_url(db_url)
+    pragmas = {
+        # Set first so that the other pragmas wait for locks held by other workers
+        "busy_timeout": settings.sqlite_busy_timeout,
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+    url_params = parse_qs(urlsplit(db_url).query)
+    credentials = {**pragmas, **config["credentials"]}
+    for pragma, value in pragmas.items():
+        if pragma not in url_params:
+            credentials[pragma] = value
+    config["credentials"] = credentials
+    return config
+
+
+def _postgres_config(db_url: str) -> dict:
+    """
+    Get the Tortoise connection config for a PostgreSQL URL with the asyncpg driver.
+    """
+    config = expand_db_url(db_url)
+    pool = {
+        "minsize": settings.postgres_pool_min_size,
+        "maxsize": settings.postgres_pool_max_size,
+        "max_inactive_connection_lifetime": (
+            settings.postgres_max_inactive_connection_lifetime
+        ),
+        "statement_cache_size": settings.postgres_statement_cache_size,
+    }
+    config["credentials"] = {**pool, **config["credentials"]}
+    return config
+
+
 TORTOISE_ORM = {
     "connections": {
-        "default": settings.db_url,
+        "default": _connection_config(settings.db_url),
     },
     "apps": {
         "gnotus": {
@@ -123,4 +227,7 @@ TORTOISE_ORM = {
             "default_connection": "default",
         }
     },
+    "routers": ["app.utils.replica.ReplicaRouter"],
 }
+if settings.db_replica_url:
+    TORTOISE_ORM["connections"]["replica"] = _connection_config(settings.db_replica_url)
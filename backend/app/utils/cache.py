@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+from .metrics import CACHE_REQUESTS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A small in-process cache whose entries expire a fixed time after being set.
+
+    Each worker process has its own copy, so cached values can be stale
+    in other workers for up to `ttl` seconds after a change.
+    Lookups in caches with a name are counted in the metrics.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000, name: str = "") -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._hits = self._misses = None
+        if name:
+            self._hits = CACHE_REQUESTS.labels(name, "hit")
+            self._misses = CACHE_REQUESTS.labels(name, "miss")
+
+    def get(self, key: K) -> V | None:
+        """
+        Get a cached value, or None if it is missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._data[key]
+            entry = None
+        if entry is None:
+            if self._misses is not None:
+                self._misses.inc()
+            return None
+        if self._hits is not None:
+            self._hits.inc()
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        """
+        Cache a value, evicting the oldest entries if the cache is full.
+        """
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        """
+        Remove a value from the cache.
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all values from the cache.
+        """
+        self._data.clear()
@@ -0,0 +1,63 @@
+import difflib
+import json
+import zlib
+
+
+def compress_text(text: str) -> bytes:
+    """
+    Compress a full text for storage.
+    """
+    return zlib.compress(text.encode("utf-8"))
+
+
+def decompress_text(data: bytes) -> str:
+    """
+    Decompress a text stored with compress_text().
+    """
+    return zlib.decompress(data).decode("utf-8")
+
+
+def make_delta(base: str, text: str) -> bytes:
+    """
+    Make a compressed line-based delta that turns base into text.
+    The delta is a list of [start, end] ranges of base lines to copy
+    and strings of new text to insert, in order.
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops: list[list[int] | str] = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    """
+    Apply a delta made by make_delta() to its base text.
+    """
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0] : op[1]])
+    return "".join(parts)
+
+
+def encode_text(text: str, base: str | None = None) -> tuple[bytes, bool]:
+    """
+    Encode a text for storage, as a delta against base if that is smaller
+    than a compressed snapshot.
+    Returns the data and whether it is a delta.
+    """
+    snapshot = compress_text(text)
+    if base is not None:
+        delta = make_delta(base, text)
+        if len(delta) < len(snapshot):
+            return delta, True
+    return snapshot, False
@@ -0,0 +1,73 @@
+import difflib
+import re
+from typing import Literal
+
+from ..schemas.revision import RevisionDiffChange, RevisionDiffHunk
+
+# Words and the whitespace between them, so that joining the tokens
+# reproduces the text exactly
+WORD_PATTERN = re.compile(r"\s+|\w+|[^\w\s]")
+
+
+def diff_texts(
+    old: str, new: str, mode: Literal["line", "word"] = "line", context: int = 3
+) -> list[RevisionDiffHunk]:
+    """
+    Compute the hunks of a line diff between two texts, with the given
+    number of unchanged context lines around each group of changes.
+    In word mode, changed lines are further diffed word by word.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    hunks = []
+    for group in matcher.get_grouped_opcodes(context):
+        changes: list[RevisionDiffChange] = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                _append(changes, "equal", "".join(old_lines[i1:i2]))
+            elif tag == "replace" and mode == "word":
+                _diff_words(
+                    changes, "".join(old_lines[i1:i2]), "".join(new_lines[j1:j2])
+                )
+            else:
+                _append(changes, "delete", "".join(old_lines[i1:i2]))
+                _append(changes, "insert", "".join(new_lines[j1:j2]))
+        first, last = group[0], group[-1]
+        hunks.append(
+            RevisionDiffHunk(
+                old_start=first[1] + 1,
+                old_lines=last[2] - first[1],
+                new_start=first[3] + 1,
+                new_lines=last[4] - first[3],
+                changes=changes,
+            )
+        )
+    return hunks
+
+
+def _diff_words(changes: list[RevisionDiffChange], old: str, new: str) -> None:
+    """Append the word-level changes between two blocks of lines."""
+    old_words = WORD_PATTERN.findall(old)
+    new_words = WORD_PATTERN.findall(new)
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            _append(changes, "equal", "".join(old_words[i1:i2]))
+        else:
+            _append(changes, "delete", "".join(old_words[i1:i2]))
+            _append(changes, "insert", "".join(new_words[j1:j2]))
+
+
+def _append(
+    changes: list[RevisionDiffChange],
+    op: Literal["equal", "delete", "insert"],
+    text: str,
+) -> None:
+    """Append a change, merging it into the previous one if it has the same op."""
+    if not text:
+        return
+    if changes and changes[-1].op == op:
+        changes[-1].text += text
+    else:
+        changes.append(RevisionDiffChange(op=op, text=text))
@@ -1,10 +1,81 @@
+import asyncio
+import io
+import json
 import os
+import queue
 import shutil
+import tarfile
+import threading
+import time
 import zipfile
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import IO, AsyncGenerator, Callable, NamedTuple, Self
+
+import aiofiles
 
 from ..models.doc import Doc
+from ..models.revision import Revision
 from ..models.setting import Setting
 from ..settings import settings
+from .deltas import apply_delta, decompress_text
+
+# File listing what an export contains, for differential exports
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Number of documents fetched from the database at a time
+DOC_PAGE_SIZE = 100
+# Number of revisions of a document fetched from the database at a time
+REVISION_PAGE_SIZE = 50
+# Number of entries waiting for the writer thread before the export pauses
+WRITE_QUEUE_SIZE = 32
+# Size of the chunks sent to the client when streaming an export
+STREAM_CHUNK_SIZE = 64 * 1024
+# Number of chunks waiting to be sent before the writer thread pauses
+STREAM_QUEUE_SIZE = 16
+# Attachments in these formats are already compressed, so deflating them
+# again costs CPU time for little or no saving.
+STORED_EXTENSIONS = {
+    # Images
+    ".avif",
+    ".gif",
+    ".heic",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".webp",
+    # Audio and video
+    ".aac",
+    ".flac",
+    ".m4a",
+    ".m4v",
+    ".mkv",
+    ".mov",
+    ".mp3",
+    ".mp4",
+    ".ogg",
+    ".opus",
+    ".webm",
+    # Archives and compressed documents
+    ".7z",
+    ".bz2",
+    ".docx",
+    ".epub",
+    ".gz",
+    ".odp",
+    ".ods",
+    ".odt",
+    ".pdf",
+    ".pptx",
+    ".rar",
+    ".tgz",
+    ".xlsx",
+    ".xz",
+    ".zip",
+    ".zst",
+}
 
 
 def _generate_doc_content(doc) -> str:
@@ -32,69 +103,467 @@ def _generate_doc_content(doc) -> str:
     return "".join(lines)
 
 
-def _generate_revision_content(revision) -> str:
+class ManifestError(ValueError):
+    """
+    Raised when a differential export cannot be based on a previous export.
+    """
+
+
+class _RevisionRow(NamedTuple):
+    """The columns of a revision needed for an export."""
+
+    id: int
+    doc_id: int
+    created_at: datetime
+    markdown: str
+    created_by_id: int | None
+    created_by_username: str | None
+
+
+def _generate_revision_content(revision: _RevisionRow) -> str:
     """Generate markdown content for a revision."""
     lines = []
     lines.append("---\n")
     lines.append(f"id: {revision.id}\n")
     lines.append(f"doc_id: {revision.doc_id}\n")
     lines.append(f"created_at: {revision.created_at.isoformat()}\n")
-    lines.append(
-        f"created_by_id: {revision.created_by.id if revision.created_by else ''}\n"
-    )
-    lines.append(
-        f'created_by_username: "{revision.created_by.username if revision.created_by else ""}"\n'
-    )
+    lines.append(f"created_by_id: {revision.created_by_id or ''}\n")
+    lines.append(f'created_by_username: "{revision.created_by_username or ""}"\n')
     lines.append("---\n\n")
     lines.append(revision.markdown)
     return "".join(lines)
 
 
-async def dump_to_dir(
-    directory: str,
-    include_revisions: bool = False,
-    public_only: bool = False,
-    include_attachments: bool = False,
-) -> None:
-    """Dump documents to Markdown files."""
+class _DirSink:
+    """Writes export entries to files under a directory."""
 
-    # Ensure the directory exists
-    os.makedirs(directory, exist_ok=True)
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
 
-    # Fetch all documents
-    docs = Doc.all()
-    if public_only:
-        docs = docs.filter(public=True)
+    def _prepare(self, path: str) -> str:
+        file_path = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return file_path
+
+    def write_text(self, path: str, text: str) -> None:
+        with open(self._prepare(path), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def copy_file(self, path: str, source: Path) -> None:
+        shutil.copy2(source, self._prepare(path))
+
+    def close(self) -> None:
+        pass
+
+
+class _ZipSink:
+    """Writes export entries to a zip file."""
+
+    def __init__(self, file: str | IO[bytes]) -> None:
+        self.zf = zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED)
+
+    def write_text(self, path: str, text: str) -> None:
+        self.zf.writestr(path, text)
+
+    def copy_file(self, path: str, source: Path) -> None:
+        if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS:
+            compress_type = zipfile.ZIP_STORED
+        else:
+            compress_type = zipfile.ZIP_DEFLATED
+        self.zf.write(source, path, compress_type=compress_type)
+
+    def close(self) -> None:
+        self.zf.close()
+
+
+class _TarSink:
+    """Writes export entries to a tar stream."""
+
+    def __init__(self, file: IO[bytes]) -> None:
+        self.tf = tarfile.TarFile(fileobj=file, mode="w")
+
+    def write_text(self, path: str, text: str) -> None:
+        data = text.encode("utf-8")
+        info = tarfile.TarInfo(path)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tf.addfile(info, io.BytesIO(data))
+
+    def copy_file(self, path: str, source: Path) -> None:
+        self.tf.add(source, path)
+
+    def close(self) -> None:
+        self.tf.close()
+
+
+class _StreamPipe(io.RawIOBase):
+    """
+    Write-only file that passes the written data to a reader in chunks.
+    Writing blocks while the reader is behind, so memory use stays constant.
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.Queue[bytes | None] = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.buffer = bytearray()
+        self.position = 0
+        self.aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def write(self, data) -> int:  # type: ignore[override]
+        if self.aborted:
+            raise BrokenPipeError("The export stream was closed by the reader")
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= STREAM_CHUNK_SIZE:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed and not self.aborted:
+            if self.buffer:
+                self.queue.put(bytes(self.buffer))
+                self.buffer.clear()
+            self.queue.put(None)
+        super().close()
+
+    def abort(self) -> None:
+        """Stop accepting data and unblock the writer, e.g. if the client went away."""
+        self.aborted = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+_Sink = _DirSink | _ZipSink | _TarSink
+# Errors of writing an entry, which are passed on to the export
+_WRITE_ERRORS = (OSError, ValueError, tarfile.TarError, zipfile.LargeZipFile)
+_STOP = object()
+
+
+class _ExportWriter:
+    """
+    Applies export entries to a sink in a worker thread, so that compression
+    and file copying do not block the event loop.
+    Entries are passed through a bounded queue, so the export waits for the
+    writer to catch up instead of buffering the whole export in memory.
+    """
+
+    def __init__(self, sink: _Sink) -> None:
+        self.sink = sink
+        self.queue: queue.Queue[Callable[[], None] | object] = queue.Queue(
+            maxsize=WRITE_QUEUE_SIZE
+        )
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            if self.error is not None:
+                # Keep draining so the producer never blocks on a full queue
+                continue
+            try:
+                item()  # type: ignore[operator]
+            except _WRITE_ERRORS as e:
+                self.error = e
+        try:
+            self.sink.close()
+        except _WRITE_ERRORS as e:
+            self.error = self.error or e
+
+    async def _put(self, item: Callable[[], None] | object) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self.queue.put, item)
+
+    async def write_text(self, path: str, text: str) -> None:
+        if self.error is not None:
+            raise self.error
+        await self._put(partial(self.sink.write_text, path, text))
+
+    async def copy_file(self, path: str, source: Path) -> None:
+        if self.error is not None:
+            raise self.error
+        await self._put(partial(self.sink.copy_file, path, source))
+
+    async def __aenter__(self) -> Self:
+        self.thread.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._put(_STOP)
+        await asyncio.to_thread(self.thread.join)
+        if exc is None and self.error is not None:
+            raise self.error
+
+
+async def _iter_docs(
+    public_only: bool, include_attachments: bool
+) -> AsyncGenerator[Doc, None]:
+    """Yield the documents to export, fetching them a page at a time."""
     prefetch = ["updated_by"]
-    if include_revisions:
-        prefetch.extend(["revisions", "revisions__created_by"])
     if include_attachments:
         prefetch.append("uploads")
-    docs = docs.prefetch_related(*prefetch)
+    last_id = 0
+    while True:
+        docs = Doc.filter(id__gt=last_id)
+        if public_only:
+            docs = docs.filter(public=True)
+        page = (
+            await docs.order_by("id").limit(DOC_PAGE_SIZE).prefetch_related(*prefetch)
+        )
+        for doc in page:
+            yield doc
+        if len(page) < DOC_PAGE_SIZE:
+            break
+        last_id = page[-1].id
 
-    async for doc in docs:
-        file_path = os.path.join(directory, f"{doc.urlpath}.md")
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(_generate_doc_content(doc))
+
+async def _iter_revisions(
+    doc_id: int, after_id: int = 0, until_id: int | None = None
+) -> AsyncGenerator[_RevisionRow, None]:
+    """
+    Yield the revisions of a document with IDs in (after_id, until_id],
+    fetching them a page at a time in ascending order
+    and reconstructing each from the previous ones in its chain.
+    Only the columns needed for the export are loaded,
+    so memory use does not depend on how much history there is.
+    """
+    revisions = Revision.filter(doc_id=doc_id, id__gt=after_id)
+    if until_id is not None:
+        revisions = revisions.filter(id__lte=until_id)
+    first = await revisions.order_by("id").first().values("id", "snapshot_id")
+    if first is None:
+        return
+    # Start from the snapshot of the first revision's chain
+    last_id = (first["snapshot_id"] or first["id"]) - 1
+    # Markdown of the revisions in the current chain, by ID
+    texts: dict[int, str] = {}
+    while True:
+        revisions = Revision.filter(doc_id=doc_id, id__gt=last_id)
+        if until_id is not None:
+            revisions = revisions.filter(id__lte=until_id)
+        page = await (
+            revisions.order_by("id")
+            .limit(REVISION_PAGE_SIZE)
+            .values_list(
+                "id",
+                "created_at",
+                "data",
+                "base_id",
+                "legacy_markdown",
+                "created_by_id",
+                "created_by__username",
+            )
+        )
+        for id, created_at, data, base_id, legacy, created_by_id, username in page:
+            if data is None:
+                markdown = legacy
+            elif base_id is None:
+                texts.clear()
+                markdown = texts[id] = decompress_text(data)
+            elif base_id in texts:
+                markdown = texts[id] = apply_delta(texts[base_id], data)
+            else:  # pragma: no cover
+                # The base is in another chain, e.g. after concurrent saves
+                markdown = texts[id] = await (await Revision.get(id=id)).get_markdown()
+            if id > after_id:
+                yield _RevisionRow(
+                    id, doc_id, created_at, markdown, created_by_id, username
+                )
+        if len(page) < REVISION_PAGE_SIZE:
+            break
+        last_id = page[-1][0]
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Load the manifest of a previous export,
+    from either the manifest file or the zip file containing it.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            return json.loads(zf.read(MANIFEST_NAME))
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _export_options(
+    include_revisions: bool, public_only: bool, include_attachments: bool
+) -> dict[str, bool]:
+    return {
+        "include_revisions": include_revisions,
+        "public_only": public_only,
+        "include_attachments": include_attachments,
+    }
+
+
+def _check_previous(previous: dict | None, options: dict[str, bool]) -> None:
+    """Check that a differential export can be based on a previous export."""
+    if previous is None:
+        return
+    if previous.get("version") != MANIFEST_VERSION:
+        raise ManifestError("Unsupported manifest version")
+    if previous.get("options") != options:
+        raise ManifestError(
+            "The previous export was made with different options: "
+            + ", ".join(f"{k}={v}" for k, v in previous["options"].items())
+        )
+
+
+def _revision_name(created_at: datetime) -> str:
+    """Name of the file of a revision in an export, without the extension."""
+    return created_at.strftime("%Y%m%d%H%M%S")
+
+
+async def _stable_revision_id(last_revision_id: int) -> int:
+    """
+    Get the ID up to which the revisions can no longer change,
+    which the next differential export starts after.
+    Edits within revision_coalesce_window of the creation of the latest revision
+    of a document rewrite that revision in place instead of adding one.
+    """
+    if settings.revision_coalesce_window <= 0:
+        return last_revision_id
+    cutoff = datetime.now(UTC) - timedelta(seconds=settings.revision_coalesce_window)
+    open_id = (
+        await Revision.filter(created_at__gte=cutoff, id__lte=last_revision_id)
+        .order_by("id")
+        .first()
+        .values_list("id", flat=True)
+    )
+    return last_revision_id if open_id is None else open_id - 1
+
+
+async def _dump(
+    writer: _ExportWriter,
+    include_revisions: bool,
+    public_only: bool,
+    include_attachments: bool,
+    previous: dict | None = None,
+) -> None:
+    """
+    Write the documents and their revisions and attachments to an export,
+    followed by a manifest of what the export contains.
+
+    If the manifest of a previous export is given, only what changed since then
+    is written: changed documents, new revisions and new attachments.
+    The paths that no longer exist, including those of pruned revisions,
+    are listed in the manifest under "deleted".
+    Everything belonging to a document that was moved is written again.
+    Uploads are never modified in place, so their storage path identifies their content.
+    Revisions still within revision_coalesce_window may be rewritten by later edits,
+    so they are written again by the next differential export.
+    """
+    options = _export_options(include_revisions, public_only, include_attachments)
+    prev_docs: dict[str, dict] = previous["docs"] if previous else {}
+    prev_uploads: dict[str, dict] = previous["uploads"] if previous else {}
+    prev_revisions: dict[str, list[str]] = (
+        previous.get("revisions", {}) if previous else {}
+    )
+    prev_revision_id: int = previous["last_revision_id"] if previous else 0
+    # Revisions created while the export runs are exported by the next one
+    last_revision_id = (
+        await Revision.all().order_by("-id").first().values_list("id", flat=True)
+    ) or 0
+    next_revision_id = await _stable_revision_id(last_revision_id)
+    docs: dict[str, dict] = {}
+    uploads: dict[str, dict] = {}
+    revisions: dict[str, list[str]] = {}
+    deleted = set()
+
+    async for doc in _iter_docs(public_only, include_attachments):
+        # Paths in the export are relative, even though URL paths start with a slash
+        path = doc.urlpath.lstrip("/")
+        entry = {"path": path, "updated_at": doc.updated_at.isoformat()}
+        docs[str(doc.id)] = entry
+        prev_entry = prev_docs.get(str(doc.id))
+        moved = prev_entry is None or prev_entry["path"] != path
+        if prev_entry != entry:
+            await writer.write_text(f"{path}.md", _generate_doc_content(doc))
         if include_revisions:
-            for revision in doc.revisions:
-                revision_file_path = os.path.join(
-                    directory,
-                    f"{doc.urlpath}__revisions/{revision.created_at.strftime('%Y%m%d%H%M%S')}.md",
+            after_id = 0 if moved else prev_revision_id
+            async for revision in _iter_revisions(doc.id, after_id, last_revision_id):
+                await writer.write_text(
+                    f"{path}__revisions/{_revision_name(revision.created_at)}.md",
+                    _generate_revision_content(revision),
                 )
-                os.makedirs(os.path.dirname(revision_file_path), exist_ok=True)
-                with open(revision_file_path, "w", encoding="utf-8") as rf:
-                    rf.write(_generate_revision_content(revision))
+            names = [
+                _revision_name(created_at)
+                for created_at in await Revision.filter(
+                    doc_id=doc.id, id__lte=last_revision_id
+                )
+                .order_by("id")
+                .values_list("created_at", flat=True)
+            ]
+            revisions[str(doc.id)] = names
+            if not moved:
+                # Pruned since the previous export
+                for name in set(prev_revisions.get(str(doc.id), [])) - set(names):
+                    deleted.add(f"{path}__revisions/{name}.md")
         if include_attachments:
             for upload in doc.uploads:
-                attachment_path = os.path.join(
-                    directory,
-                    f"{doc.urlpath}__attachments/{upload.filename}",
-                )
-                os.makedirs(os.path.dirname(attachment_path), exist_ok=True)
-                source_path = settings.uploads_dir / upload.storage_path
-                shutil.copy2(source_path, attachment_path)
+                upload_path = f"{path}__attachments/{upload.filename}"
+                entry = {"path": upload_path, "fingerprint": upload.storage_path}
+                uploads[str(upload.id)] = entry
+                if prev_uploads.get(str(upload.id)) != entry:
+                    await writer.copy_file(
+                        upload_path, settings.uploads_dir / upload.storage_path
+                    )
+
+    for id, prev_entry in prev_docs.items():
+        if id not in docs or docs[id]["path"] != prev_entry["path"]:
+            deleted.add(f"{prev_entry['path']}.md")
+            if include_revisions:
+                deleted.add(f"{prev_entry['path']}__revisions/")
+            if include_attachments:
+                deleted.add(f"{prev_entry['path']}__attachments/")
+    for id, prev_entry in prev_uploads.items():
+        if id not in uploads or uploads[id]["path"] != prev_entry["path"]:
+            deleted.add(prev_entry["path"])
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now(UTC).isoformat(),
+        "options": options,
+        "differential": previous is not None,
+        "docs": docs,
+        "uploads": uploads,
+        "revisions": revisions,
+        "last_revision_id": next_revision_id,
+        "deleted": sorted(deleted),
+    }
+    await writer.write_text(MANIFEST_NAME, json.dumps(manifest, indent=1))
+
+
+async def dump_to_dir(
+    directory: str,
+    include_revisions: bool = False,
+    public_only: bool = False,
+    include_attachments: bool = False,
+    previous: dict | None = None,
+) -> None:
+    """Dump documents to Markdown files."""
+    _check_previous(
+        previous,
+        _export_options(include_revisions, public_only, include_attachments),
+    )
+    sink = await asyncio.to_thread(_DirSink, directory)
+    async with _ExportWriter(sink) as writer:
+        await _dump(
+            writer, include_revisions, public_only, include_attachments, previous
+        )
 
 
 async def dump_to_zip(
@@ -102,54 +571,149 @@ async def dump_to_zip(
     include_revisions: bool = False,
     public_only: bool = False,
     include_attachments: bool = False,
+    previous: dict | None = None,
 ) -> None:
     """Dump documents to a zip file containing Markdown files."""
+    _check_previous(
+        previous,
+        _export_options(include_revisions, public_only, include_attachments),
+    )
+    sink = await asyncio.to_thread(_ZipSink, zip_path)
+    async with _ExportWriter(sink) as writer:
+        await _dump(
+            writer, include_revisions, public_only, include_attachments, previous
+        )
+
+
+async def stream_export(
+    format: str = "zip",
+    include_revisions: bool = False,
+    public_only: bool = False,
+    include_attachments: bool = False,
+) -> AsyncGenerator[bytes, None]:
+    """Generate a zip or tar archive of the documents as a stream of chunks."""
+    pipe = _StreamPipe()
+    sink: _Sink = _ZipSink(pipe) if format == "zip" else _TarSink(pipe)
+
+    async def produce() -> None:
+        try:
+            async with _ExportWriter(sink) as writer:
+                await _dump(writer, include_revisions, public_only, include_attachments)
+        finally:
+            await asyncio.to_thread(pipe.close)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                chunk = pipe.queue.get_nowait()
+            except queue.Empty:
+                chunk = await asyncio.to_thread(pipe.queue.get)
+            if chunk is None:
+                break
+            yield chunk
+        await task
+    finally:
+        if not task.done():
+            pipe.abort()
+            task.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await task
 
-    # Fetch all documents
+
+async def get_tree_order(public_only: bool = False) -> list[tuple[int, datetime]]:
+    """
+    Get the IDs and update times of the documents in tree order
+    (depth-first, ordered by order/title) from a single query.
+    Documents below an excluded document are excluded too.
+    """
     docs = Doc.all()
     if public_only:
         docs = docs.filter(public=True)
-    prefetch = ["updated_by"]
-    if include_revisions:
-        prefetch.extend(["revisions", "revisions__created_by"])
-    if include_attachments:
-        prefetch.append("uploads")
-    docs = docs.prefetch_related(*prefetch)
+    children: dict[int | None, list[tuple[int, str, int, datetime]]] = {}
+    for id, parent_id, order, title, updated_at in await docs.values_list(
+        "id", "parent_id", "order", "title", "updated_at"
+    ):
+        children.setdefault(parent_id, []).append((order, title, id, updated_at))
+    tree = []
+    stack = sorted(children.get(None, []), reverse=True)
+    while stack:
+        _, _, id, updated_at = stack.pop()
+        tree.append((id, updated_at))
+        stack.extend(sorted(children.get(id, []), reverse=True))
+    return tree
 
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        async for doc in docs:
-            file_path = f"{doc.urlpath}.md"
-            zf.writestr(file_path, _generate_doc_content(doc))
-            if include_revisions:
-                for revision in doc.revisions:
-                    revision_file_path = f"{doc.urlpath}__revisions/{revision.created_at.strftime('%Y%m%d%H%M%S')}.md"
-                    zf.writestr(
-                        revision_file_path, _generate_revision_content(revision)
-                    )
-            if include_attachments:
-                for upload in doc.uploads:
-                    attachment_path = f"{doc.urlpath}__attachments/{upload.filename}"
-                    source_path = settings.uploads_dir / upload.storage_path
-                    zf.write(source_path, attachment_path)
 
+async def single_file_header() -> str:
+    """Generate the header of the single-file dump."""
+    site_name = await Setting.get_value("site_name", "Gnotus")
+    return f"# {site_name}\n\n"
 
-async def dump_to_single_file(file_path: str, public_only: bool = False) -> None:
-    """Dump all documents to a single Markdown file for LLM consumption."""
 
-    async def write_doc_tree(f, parent_id: int | None) -> None:
-        """Recursively write documents in tree order (depth-first, ordered by order/title)."""
-        docs = Doc.filter(parent_id=parent_id).order_by("order", "title")
-        if public_only:
-            docs = docs.filter(public=True)
-        async for doc in docs:
-            f.write("=" * 80)
-            f.write(f"\n<!-- path: /{doc.urlpath} -->\n\n")
-            f.write(f"# {doc.title}\n\n")
-            f.write(doc.markdown)
-            f.write("\n\n")
-            await write_doc_tree(f, doc.id)
+async def iter_single_file_sections(
+    tree: list[tuple[int, datetime]],
+) -> AsyncGenerator[str, None]:
+    """Yield the section of the single-file dump for each document in the tree."""
+    for start in range(0, len(tree), DOC_PAGE_SIZE):
+        ids = [id for id, _ in tree[start : start + DOC_PAGE_SIZE]]
+        docs = {
+            id: (urlpath, title, markdown)
+            for id, urlpath, title, markdown in await Doc.filter(
+                id__in=ids
+            ).values_list("id", "urlpath", "title", "markdown")
+        }
+        for id in ids:
+            if id not in docs:  # pragma: no cover
+                continue  # Deleted during the dump
+            urlpath, title, markdown = docs[id]
+            yield (
+                "=" * 80
+                + f"\n<!-- path: /{urlpath} -->\n\n"
+                + f"# {title}\n\n"
+                + markdown
+                + "\n\n"
+            )
 
-    site_name = await Setting.get_value("site_name", "Gnotus")
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"# {site_name}\n\n")
-        await write_doc_tree(f, None)
+
+async def dump_to_single_file(
+    file_path: str, public_only: bool = False, max_size: int | None = None
+) -> list[str]:
+    """
+    Dump all documents to a single Markdown file for LLM consumption.
+    If max_size is given, the dump is split into numbered files of at most
+    that many bytes (unless a single document is larger), each with the header.
+    Returns the paths of the files written.
+    """
+    header = (await single_file_header()).encode("utf-8")
+    base, ext = os.path.splitext(file_path)
+    paths: list[str] = []
+
+    async def next_file():
+        if max_size is None:
+            path = file_path
+        else:
+            path = f"{base}-{len(paths) + 1}{ext}"
+        paths.append(path)
+        f = await aiofiles.open(path, "wb")
+        await f.write(header)
+        return f
+
+    f = await next_file()
+    size = len(header)
+    try:
+        tree = await get_tree_order(public_only)
+        async for section in iter_single_file_sections(tree):
+            data = section.encode("utf-8")
+            if (
+                max_size is not None
+                and size > len(header)
+                and size + len(data) > max_size
+            ):
+                await f.close()
+                f = await next_file()
+                size = len(header)
+            await f.write(data)
+            size += len(data)
+    finally:
+        await f.close()
+    return paths
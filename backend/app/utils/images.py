@@ -0,0 +1,207 @@
+import asyncio
+import os
+import re
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging import getLogger
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from bs4 import BeautifulSoup
+
+from ..settings import settings
+
+logger = getLogger(__name__)
+
+# Formats that can be resized without losing anything (e.g. GIF animation)
+VARIANT_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp"}
+
+# Path of the download of an upload, capturing its ID
+UPLOAD_DOWNLOAD_RE = re.compile(r"/api/uploads/(\d+)/download")
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.image_variant_workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Stop the worker processes generating image variants, if they were started.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def variant_path(storage_path: str, width: int) -> Path:
+    """
+    Get the path of the WebP variant of an upload with the given width.
+    Variants are stored beside the original file.
+    """
+    return settings.uploads_dir / f"{storage_path}.w{width}.webp"
+
+
+def _generate_variants(
+    source: Path, destinations: dict[int, Path], quality: int
+) -> tuple[int, list[int]]:
+    """
+    Resize an image to each width narrower than the original and save it as WebP.
+    Returns the width of the original and the widths of the variants.
+    Runs in a worker process.
+    """
+    from PIL import Image, ImageOps
+
+    generated = []
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width, destination in sorted(destinations.items()):
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            variant = image.resize((width, height), Image.Resampling.LANCZOS)
+            tmp_path = destination.with_name(destination.name + ".tmp")
+            variant.save(tmp_path, "WEBP", quality=quality)
+            os.replace(tmp_path, destination)
+            generated.append(width)
+        return image.width, generated
+
+
+async def generate_variants(storage_path: str, content_type: str) -> None:
+    """
+    Generate the resized variants of an uploaded image in the worker pool.
+    Failures are logged and leave the original to be served instead.
+    """
+    from PIL import Image
+
+    if content_type not in VARIANT_CONTENT_TYPES or not settings.image_variant_widths:
+        return
+    destinations = {
+        width: variant_path(storage_path, width)
+        for width in settings.image_variant_widths
+    }
+    loop = asyncio.get_running_loop()
+    try:
+        width, generated = await loop.run_in_executor(
+            _get_executor(),
+            _generate_variants,
+            settings.uploads_dir / storage_path,
+            destinations,
+            settings.image_variant_quality,
+        )
+    except (
+        OSError,
+        ValueError,
+        Image.DecompressionBombError,
+        BrokenProcessPool,
+    ) as e:
+        logger.error(f"Failed to generate image variants for {storage_path}: {e}")
+        return
+    logger.debug(f"Generated image variants {generated} for {storage_path}.")
+    await _record_variants(storage_path, width, generated)
+
+
+async def _record_variants(storage_path: str, width: int, generated: list[int]) -> None:
+    """
+    Record the generated variants of an upload,
+    and render again the document it belongs to so that it gets a srcset.
+    Other documents embedding the upload get one when they are next saved.
+    """
+    from ..models.doc import Doc
+    from ..models.upload import Upload
+
+    upload = await Upload.get_or_none(storage_path=storage_path)
+    if upload is None:  # pragma: no cover
+        return  # Deleted in the meantime
+    upload.width = width
+    upload.variant_widths = generated
+    await upload.save(update_fields=["width", "variant_widths"])
+    if not generated or upload.doc_id is None:
+        return
+    doc = await Doc.get_or_none(id=upload.doc_id)
+    if doc is None or f"/api/uploads/{upload.id}/download" not in doc.markdown:
+        return
+    await doc.update_content()
+    # Bumping updated_at refreshes the cached shared views of the document
+    await doc.save(update_fields=["html", "metadata", "updated_at"])
+
+
+def find_variant(storage_path: str, width: int) -> Path | None:
+    """
+    Get the narrowest existing variant at least as wide as the requested width.
+    Returns None if the original should be served instead.
+    """
+    for variant_width in sorted(settings.image_variant_widths):
+        if variant_width >= width:
+            path = variant_path(storage_path, variant_width)
+            if path.is_file():
+                return path
+            # Narrower variants exist only if the original is wider than them,
+            # so a missing variant means the original is the best fit.
+            return None
+    return None
+
+
+def delete_variants(storage_path: str) -> None:
+    """
+    Delete all variants of an upload.
+    """
+    for width in settings.image_variant_widths:
+        variant_path(storage_path, width).unlink(missing_ok=True)
+
+
+async def image_variants(markdown: str) -> dict[int, tuple[int, list[int]]]:
+    """
+    Get the width and the variant widths of the uploads embedded in some Markdown
+    that have resized variants, by upload ID.
+    """
+    from ..models.upload import Upload
+
+    ids = {int(id) for id in UPLOAD_DOWNLOAD_RE.findall(markdown)}
+    if not ids:
+        return {}
+    rows = await Upload.filter(id__in=ids, width__isnull=False).values_list(
+        "id", "width", "variant_widths"
+    )
+    return {id: (width, widths) for id, width, widths in rows if widths}
+
+
+def add_srcset(
+    soup: BeautifulSoup, images: Mapping[int, tuple[int, list[int]]]
+) -> None:
+    """
+    Add a srcset of resized variants to images embedded from uploads,
+    given the width and variant widths of the uploads by ID (see image_variants()).
+    Only the variants that were generated are listed, along with the original,
+    and the sizes let the browser show the image at its natural width.
+    """
+    for img in soup.find_all("img"):
+        src = str(img.get("src", ""))
+        parts = urlsplit(src)
+        if parts.scheme or parts.netloc or img.get("srcset"):
+            continue
+        match = UPLOAD_DOWNLOAD_RE.match(parts.path)
+        if match is None or int(match[1]) not in images:
+            continue
+        width, variant_widths = images[int(match[1])]
+        widths = sorted(set(variant_widths) & set(settings.image_variant_widths))
+        if not widths:
+            continue
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k != "w"]
+        img["srcset"] = ", ".join(
+            [
+                urlunsplit(parts._replace(query=urlencode(query + [("w", str(w))])))
+                + f" {w}w"
+                for w in widths
+            ]
+            + [f"{src} {width}w"]
+        )
+        img["sizes"] = f"(max-width: {width}px) 100vw, {width}px"
@@ -0,0 +1,296 @@
+import asyncio
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from logging import getLogger
+from typing import NamedTuple
+
+from tortoise.transactions import in_transaction
+
+from ..models.doc import Doc, render_markdown, slugify
+from ..settings import settings
+
+logger = getLogger(__name__)
+
+# Number of documents read, rendered and inserted at a time
+IMPORT_BATCH_SIZE = 500
+# Directories written by the dump command that do not contain documents
+SKIPPED_SUFFIXES = ("__revisions", "__attachments")
+
+
+class ImportFormatError(ValueError):
+    """
+    Raised when a file is not in the format written by the dump command.
+    """
+
+
+class _ImportedDoc(NamedTuple):
+    """The frontmatter of a document in an export."""
+
+    name: str
+    id: int
+    parent_id: int | None
+    title: str
+    slug: str
+    public: bool
+    order: int
+    created_at: datetime | None
+
+
+def _parse_doc(name: str, text: str) -> tuple[_ImportedDoc, str]:
+    """
+    Parse a document written by _generate_doc_content.
+    Returns the frontmatter and the markdown content.
+    """
+    if not text.startswith("---\n"):
+        raise ImportFormatError(f"{name}: missing frontmatter")
+    end = text.find("\n---\n", 3)
+    if end == -1:
+        raise ImportFormatError(f"{name}: unterminated frontmatter")
+    fields: dict[str, str] = {}
+    for line in text[4:end].splitlines():
+        key, _, value = line.partition(":")
+        fields[key.strip()] = value.strip()
+    try:
+        title = fields["title"]
+        if len(title) >= 2 and title[0] == title[-1] == '"':
+            title = title[1:-1]
+        doc = _ImportedDoc(
+            name=name,
+            id=int(fields["id"]),
+            parent_id=int(fields["parent_id"]) if fields.get("parent_id") else None,
+            title=title,
+            slug=fields.get("slug", ""),
+            public=fields.get("public") == "True",
+            order=int(fields.get("order") or 0),
+            created_at=datetime.fromisoformat(fields["created_at"])
+            if fields.get("created_at")
+            else None,
+        )
+    except (KeyError, ValueError) as e:
+        raise ImportFormatError(f"{name}: invalid frontmatter: {e}")
+    markdown = text[end + 5 :].removeprefix("\n").removeprefix(f"# {title}\n\n")
+    return doc, markdown
+
+
+class _DirSource:
+    """Reads the documents of an export in a directory."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def names(self) -> list[str]:
+        names = []
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if not d.endswith(SKIPPED_SUFFIXES)]
+            rel = os.path.relpath(root, self.directory)
+            for file in files:
+                if file.endswith(".md"):
+                    names.append(os.path.normpath(os.path.join(rel, file)))
+        return sorted(names)
+
+    def read(self, names: list[str]) -> list[str]:
+        texts = []
+        for name in names:
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                texts.append(f.read())
+        return texts
+
+    def close(self) -> None:
+        pass
+
+
+class _ZipSource:
+    """Reads the documents of an export in a zip file."""
+
+    def __init__(self, zip_path: str) -> None:
+        self.zf = zipfile.ZipFile(zip_path)
+
+    def names(self) -> list[str]:
+        return sorted(
+            name
+            for name in self.zf.namelist()
+            if name.endswith(".md")
+            and not any(
+                part.endswith(SKIPPED_SUFFIXES) for part in name.split("/")[:-1]
+            )
+        )
+
+    def read(self, names: list[str]) -> list[str]:
+        return [self.zf.read(name).decode("utf-8") for name in names]
+
+    def close(self) -> None:
+        self.zf.close()
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def import_docs(path: str, workers: int | None = None) -> tuple[int, int]:
+    """
+    Import the documents of an export made by the dump command,
+    from either a directory or a zip file.
+
+    The hierarchy is recreated from the IDs in the frontmatter, one level
+    at a time with bulk inserts, and Markdown is rendered in a process pool.
+    Documents whose URL path already exists are left unchanged, but their
+    imported children are still placed below them; the imported home page
+    is only used if the wiki does not have one yet.
+    Revisions and attachments are not imported.
+    Returns the number of documents imported and skipped.
+    """
+    if zipfile.is_zipfile(path):
+        source: _DirSource | _ZipSource = await asyncio.to_thread(_ZipSource, path)
+    elif os.path.isdir(path):
+        source = _DirSource(path)
+    else:
+        raise ImportFormatError(f"{path} is not a directory or a zip file")
+    try:
+        docs = await _read_structure(source)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            imported_ids, skipped = await _import_tree(source, docs, pool)
+    finally:
+        source.close()
+
+    if not settings.disable_search:
+        from .indexing import index_documents
+
+        for ids in _batches(imported_ids, IMPORT_BATCH_SIZE):
+            await index_documents(Doc.filter(id__in=ids))
+    return len(imported_ids), skipped
+
+
+async def _read_structure(source: _DirSource | _ZipSource) -> list[_ImportedDoc]:
+    """Read the frontmatter of all documents, discarding their content."""
+    names = await asyncio.to_thread(source.names)
+    docs = []
+    for batch in _batches(names, IMPORT_BATCH_SIZE):
+        texts = await asyncio.to_thread(source.read, batch)
+        docs.extend(_parse_doc(name, text)[0] for name, text in zip(batch, texts))
+    return docs
+
+
+async def _import_tree(
+    source: _DirSource | _ZipSource,
+    docs: list[_ImportedDoc],
+    pool: ProcessPoolExecutor,
+) -> tuple[list[int], int]:
+    """Create the documents level by level, so parents exist before children."""
+    ids = {doc.id for doc in docs}
+    imported_home = None
+    children: dict[int | None, list[_ImportedDoc]] = {}
+    for doc in docs:
+        if doc.parent_id is None and not doc.slug and imported_home is None:
+            imported_home = doc
+            continue
+        # Top-level documents and documents whose parent was not exported
+        # (e.g. in a public-only export) go below the home page.
+        parent_id = doc.parent_id if doc.parent_id in ids else None
+        children.setdefault(parent_id, []).append(doc)
+
+    imported_ids: list[int] = []
+    skipped = 0
+    # Imported document ID -> (ID, URL path) of the document in the database
+    created: dict[int | None, tuple[int, str]] = {}
+    home = await Doc.get_or_none(parent_id=None)
+    if home is None and imported_home is not None:
+        await _create_docs(source, [(imported_home, None, "/")], pool)
+        home = await Doc.get(parent_id=None)
+        imported_ids.append(home.id)
+    elif imported_home is not None:
+        skipped += 1
+    if home is None:
+        raise ImportFormatError("The wiki and the export both lack a home page")
+    created[None] = (home.id, "")
+    if imported_home is not None:
+        created[imported_home.id] = created[None]
+        children.setdefault(None, []).extend(children.pop(imported_home.id, []))
+
+    level = [None]
+    while level:
+        next_level: list[int] = []
+        pending = [
+            (doc, parent_id)
+            for parent_id in level
+            for doc in children.get(parent_id, [])
+        ]
+        for batch in _batches(pending, IMPORT_BATCH_SIZE):
+            rows = []
+            seen = set()
+            for doc, parent_id in batch:
+                parent_db_id, parent_urlpath = created[parent_id]
+                slug = doc.slug or slugify(doc.title)
+                urlpath = f"{parent_urlpath}/{slug}"
+                if urlpath in seen:
+                    logger.warning(f"{doc.name}: duplicate path {urlpath}, skipped.")
+                    skipped += 1
+                    continue
+                seen.add(urlpath)
+                rows.append((doc._replace(slug=slug), parent_db_id, urlpath))
+            existing = dict(
+                await Doc.filter(urlpath__in=list(seen)).values_list("urlpath", "id")
+            )
+            new_rows = [row for row in rows if row[2] not in existing]
+            skipped += len(rows) - len(new_rows)
+            db_ids = {**existing, **await _create_docs(source, new_rows, pool)}
+            for doc, _, urlpath in rows:
+                created[doc.id] = (db_ids[urlpath], urlpath)
+                next_level.append(doc.id)
+            imported_ids.extend(db_ids[row[2]] for row in new_rows)
+        level = next_level
+    unreachable = len(docs) - len(imported_ids) - skipped
+    if unreachable:  # pragma: no cover
+        logger.warning(f"{unreachable} documents are not below the home page.")
+    return imported_ids, skipped
+
+
+async def _create_docs(
+    source: _DirSource | _ZipSource,
+    rows: list[tuple[_ImportedDoc, int | None, str]],
+    pool: ProcessPoolExecutor,
+) -> dict[str, int]:
+    """
+    Render and insert documents.
+    Returns the IDs of the new documents by URL path.
+    """
+    if not rows:
+        return {}
+    texts = await asyncio.to_thread(source.read, [doc.name for doc, _, _ in rows])
+    markdowns = [
+        _parse_doc(doc.name, text)[1] for (doc, _, _), text in zip(rows, texts)
+    ]
+    loop = asyncio.get_running_loop()
+    rendered = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, render_markdown, markdown)
+            for markdown in markdowns
+        )
+    )
+    async with in_transaction("default"):
+        await Doc.bulk_create(
+            [
+                Doc(
+                    parent_id=parent_id,
+                    title=doc.title,
+                    slug=doc.slug,
+                    urlpath=urlpath,
+                    public=doc.public,
+                    order=doc.order,
+                    markdown=markdown,
+                    html=html,
+                    metadata={"subtitles": subtitles},
+                    created_at=doc.created_at,
+                )
+                for (doc, parent_id, urlpath), markdown, (html, subtitles) in zip(
+                    rows, markdowns, rendered
+                )
+            ]
+        )
+    return dict(
+        await Doc.filter(urlpath__in=[urlpath for _, _, urlpath in rows]).values_list(
+            "urlpath", "id"
+        )
+    )
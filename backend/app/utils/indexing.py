@@ -1,161 +1,208 @@
+from typing import AsyncIterator
+
 import nh3
 from bs4 import BeautifulSoup
-from meilisearch_python_sdk import AsyncClient, AsyncIndex
-from meilisearch_python_sdk.errors import MeilisearchApiError
-from meilisearch_python_sdk.models.search import SearchResults
-from meilisearch_python_sdk.models.settings import (
-    MeilisearchSettings,
-    MinWordSizeForTypos,
-    Pagination,
-    TypoTolerance,
-)
+from bs4.element import Tag
+from tortoise.queryset import QuerySet
 
 from ..models.doc import Doc
-from ..schemas.doc import DocIndexSchema, DocSearchResult
+from ..schemas.doc import DocIndexSchema, DocSearchResult, DocSuggestion
+from ..search import MAX_SECTIONS, get_search_backend
 from ..settings import settings
-
-index_settings = MeilisearchSettings(
-    searchable_attributes=["title", "text", "urlpath", "urlpathbase"],
-    displayed_attributes=["id", "title", "urlpath", "text", "public"],
-    stop_words=[
-        "the",
-        "and",
-        "is",
-        "to",
-        "a",
-        "of",
-        "in",
-        "for",
-        "on",
-        "with",
-        "as",
-        "that",
-        "by",
-    ],
-    ranking_rules=[
-        "typo",
-        "words",
-        "proximity",
-        "attribute",
-        "exactness",
-    ],
-    filterable_attributes=["public"],
-    typo_tolerance=TypoTolerance(
-        enabled=True,
-        disable_on_words=["urlpathbase"],
-        min_word_size_for_typos=MinWordSizeForTypos(
-            one_typo=5,
-            two_typos=10,
-        ),
-    ),
-    pagination=Pagination(
-        max_total_hits=1000,
-    ),
+from .cache import TTLCache
+from .metrics import observe_search
+
+# Number of documents sent to the search backend at a time when indexing many
+INDEX_BATCH_SIZE = 500
+# Separates the sections of a document's text while it is split at headings
+SECTION_MARKER = "\x00"
+
+# Incremented whenever this process changes the index, so that cached
+# results from before the change are no longer used.
+# Changes made by other processes show up once the entries expire.
+_index_version = 0
+# (normalized query, public_only, limit, offset, index version) -> results
+_search_cache: TTLCache[tuple[str, bool, int, int, int], list[DocSearchResult]] = (
+    TTLCache(
+        settings.search_cache_ttl, maxsize=settings.search_cache_size, name="search"
+    )
 )
+# (normalized query, public_only, limit, index version) -> suggestions
+_suggest_cache: TTLCache[tuple[str, bool, int, int], list[DocSuggestion]] = TTLCache(
+    settings.search_cache_ttl, maxsize=settings.search_cache_size, name="suggest"
+)
+
 
+def _index_changed() -> None:
+    global _index_version
+    _index_version += 1
 
-def get_meilisearch_client():  # pragma: no cover
+
+async def create_or_update_index():
     """
-    Create a Meilisearch client using the configured settings.
+    Create the search index if it does not exist.
+    This function should be called before indexing documents.
     """
-    return AsyncClient(
-        url=settings.meilisearch_url,
-        api_key=settings.meilisearch_api_key.get_secret_value(),
-    )
+    with observe_search(settings.search_backend, "setup"):
+        await get_search_backend().setup()
 
 
-async def create_or_update_index():  # pragma: no cover
+async def index_all_documents(batch_size: int = INDEX_BATCH_SIZE):
     """
-    Create the Meilisearch index if it does not exist.
-    This function should be called before indexing documents.
+    Rebuild the search index from all documents,
+    removing any documents that no longer exist.
     """
-    client = get_meilisearch_client()
-    try:
-        index = client.index(settings.meilisearch_index_name)
-        await index.update_settings(index_settings)
-        return
-    except MeilisearchApiError as e:
-        if e.code != "index_not_found":
-            raise
-    await client.create_index(
-        uid=settings.meilisearch_index_name,
-        primary_key="id",
-        settings=index_settings,
-    )
+    with observe_search(settings.search_backend, "rebuild"):
+        await get_search_backend().rebuild(_record_batches(Doc.all(), batch_size))
+    _index_changed()
 
 
-async def index_all_documents():  # pragma: no cover
+def _index_records(doc: Doc, breadcrumbs: list[str]) -> list[DocIndexSchema]:
     """
-    Index all documents in the Meilisearch instance.
-    This function should be called after the database is populated.
+    Get the search index records of a document: one for the text before
+    the first heading, and one for each section starting at a heading,
+    identified by the heading anchors in the document metadata.
     """
+    soup = BeautifulSoup(doc.html, "html.parser")
+    for anchor in soup.select("a.heading-anchor"):
+        anchor.decompose()
+    titles = {
+        subtitle["hash"]: subtitle["title"]
+        for subtitle in doc.metadata.get("subtitles", [])
+    }
+    # Replace the headings with markers to split the text on
+    for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        if isinstance(tag, Tag) and tag.get("id") in titles:
+            tag.replace_with(f"{SECTION_MARKER}{tag['id']}{SECTION_MARKER}")
+    parts = soup.get_text(separator="\n", strip=True).split(SECTION_MARKER)
+    # parts is [text, anchor, text, anchor, text, ...]
+    sections = [("", parts[0])] + list(zip(parts[1::2], parts[2::2]))
+    if len(sections) > MAX_SECTIONS:  # pragma: no cover
+        merged = "\n".join(text for _, text in sections[MAX_SECTIONS - 1 :])
+        sections = sections[: MAX_SECTIONS - 1] + [(sections[-1][0], merged)]
+    return [
+        DocIndexSchema(
+            id=f"{doc.id}_{index}",
+            doc_id=doc.id,
+            urlpath=doc.urlpath,
+            urlpathbase=doc.urlpath.split("/")[0],
+            title=doc.title,
+            section=titles.get(anchor, ""),
+            anchor=anchor,
+            breadcrumbs=breadcrumbs,
+            text=nh3.clean(text.strip()),
+            public=doc.public,
+        )
+        for index, (anchor, text) in enumerate(sections)
+    ]
 
-    client = get_meilisearch_client()
-    index = client.index(settings.meilisearch_index_name)
 
-    for doc in await Doc.all():
-        await index_document(doc, index=index)
+async def index_document(doc: Doc):
+    """
+    Index a single document.
+    """
+    breadcrumbs = [parent.title async for parent in doc.parents()]
+    breadcrumbs.reverse()
+    records = _index_records(doc, breadcrumbs)
+    with observe_search(settings.search_backend, "index"):
+        await get_search_backend().index(records)
+    _index_changed()
 
 
-async def index_document(doc: Doc, index: AsyncIndex | None = None):  # pragma: no cover
+async def index_documents(docs: QuerySet[Doc], batch_size: int = INDEX_BATCH_SIZE):
     """
-    Index a single document in Meilisearch.
+    Index many documents, sending them to the search backend in batches
+    instead of one at a time.
     """
-    soup = BeautifulSoup(doc.html, "html.parser")
-    text = soup.get_text(separator="\n", strip=True)
-    text = nh3.clean(text)
-    doc_schema = DocIndexSchema(
-        id=str(doc.id),
-        urlpath=doc.urlpath,
-        urlpathbase=doc.urlpath.split("/")[0],
-        title=doc.title,
-        text=text,
-        public=doc.public,
-    ).model_dump(mode="json")
-    if index is None:
-        client = get_meilisearch_client()
-        index = client.index(settings.meilisearch_index_name)
-    await index.update_documents([doc_schema])
+    backend = get_search_backend()
+    async for batch in _record_batches(docs, batch_size):
+        with observe_search(settings.search_backend, "index"):
+            await backend.index(batch)
+    _index_changed()
 
 
-async def delete_document_from_index(doc_id: int):  # pragma: no cover
+async def _record_batches(
+    docs: QuerySet[Doc], batch_size: int
+) -> AsyncIterator[list[DocIndexSchema]]:
+    """
+    Get the search index records of documents in batches of batch_size documents.
+    The breadcrumbs are computed from a single query of the whole tree.
+    """
+    tree: dict[int, tuple[int | None, str]] = {
+        id: (parent_id, title)
+        for id, parent_id, title in await Doc.all().values_list(
+            "id", "parent_id", "title"
+        )
+    }
+    batch: list[DocIndexSchema] = []
+    count = 0
+    async for doc in docs:
+        breadcrumbs = []
+        parent_id = doc.parent_id
+        while parent_id is not None and parent_id in tree:
+            parent_id, title = tree[parent_id]
+            breadcrumbs.append(title)
+        breadcrumbs.reverse()
+        batch.extend(_index_records(doc, breadcrumbs))
+        count += 1
+        if count >= batch_size:
+            yield batch
+            batch, count = [], 0
+    if batch:
+        yield batch
+
+
+async def delete_document_from_index(doc_id: int):
     """
-    Delete a document from the Meilisearch index by its ID.
+    Delete a document from the search index by its ID.
     """
-    client = get_meilisearch_client()
-    index = client.index(settings.meilisearch_index_name)
-    await index.delete_document(str(doc_id))
+    with observe_search(settings.search_backend, "delete"):
+        await get_search_backend().delete([doc_id])
+    _index_changed()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for caching. All backends ignore case and extra spaces.
+    """
+    return " ".join(query.lower().split())
 
 
 async def search_documents(
-    query: str, public_only: bool = True
-) -> list[DocSearchResult]:  # pragma: no cover
+    query: str, public_only: bool = True, limit: int = 20, offset: int = 0
+) -> list[DocSearchResult]:
     """
-    Search for documents in the Meilisearch index.
+    Search for documents in the search index.
     Returns a list of documents matching the query.
+    Results are cached for a short time, since type-ahead searches
+    repeat the same queries.
     """
-    client = get_meilisearch_client()
-    index = client.index(settings.meilisearch_index_name)
-
-    results: SearchResults[dict] = await index.search(
-        query=query,
-        filter=["public = true"] if public_only else [],
-        limit=20,
-        offset=0,
-        attributes_to_retrieve=["id", "title", "urlpath", "public", "text"],
-        attributes_to_crop=["text"],
-        crop_length=100,
-        crop_marker="...",
-        attributes_to_highlight=["title", "text"],
-        highlight_pre_tag="<em class='search-highlight'>",
-    )
-    return [
-        DocSearchResult(
-            id=int(result["id"]),
-            title=result["_formatted"]["title"],
-            urlpath=result["urlpath"],
-            text=result["_formatted"]["text"],
-            public=result["public"],
-        )
-        for result in results.hits
-    ]
+    query = normalize_query(query)
+    key = (query, public_only, limit, offset, _index_version)
+    results = _search_cache.get(key) if settings.search_cache_ttl else None
+    if results is None:
+        with observe_search(settings.search_backend, "search"):
+            results = await get_search_backend().search(
+                query, public_only=public_only, limit=limit, offset=offset
+            )
+        _search_cache.set(key, results)
+    return results
+
+
+async def suggest_documents(
+    query: str, public_only: bool = True, limit: int = 10
+) -> list[DocSuggestion]:
+    """
+    Get documents whose titles match a query being typed.
+    Results are cached like those of search_documents().
+    """
+    query = normalize_query(query)
+    key = (query, public_only, limit, _index_version)
+    results = _suggest_cache.get(key) if settings.search_cache_ttl else None
+    if results is None:
+        with observe_search(settings.search_backend, "suggest"):
+            results = await get_search_backend().suggest(
+                query, public_only=public_only, limit=limit
+            )
+        _suggest_cache.set(key, results)
+    return results
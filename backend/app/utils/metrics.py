@@ -0,0 +1,149 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+)
+from starlette.responses import FileResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# With several worker processes, each writes its metrics to files in this directory
+# (cleared before the workers start) and they are added up when collected.
+# It must be set before this module is imported.
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+REQUEST_DURATION = Histogram(
+    "gnotus_http_request_duration_seconds",
+    "Time to handle HTTP requests.",
+    ["method", "endpoint", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "gnotus_http_requests_in_progress",
+    "HTTP requests being handled.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_DURATION = Histogram(
+    "gnotus_db_query_duration_seconds",
+    "Time of database queries, including waiting for a connection.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SEARCH_DURATION = Histogram(
+    "gnotus_search_backend_duration_seconds",
+    "Time of search backend operations.",
+    ["backend", "operation"],
+)
+SEARCH_FAILURES = Counter(
+    "gnotus_search_backend_failures_total",
+    "Search backend operations that raised an error.",
+    ["backend", "operation"],
+)
+MARKDOWN_RENDER_DURATION = Histogram(
+    "gnotus_markdown_render_duration_seconds",
+    "Time to render the Markdown of a document to HTML.",
+)
+UPLOAD_BYTES = Counter(
+    "gnotus_upload_bytes_total",
+    "Bytes of uploaded files received and sent.",
+    ["direction"],
+)
+CACHE_REQUESTS = Counter(
+    "gnotus_cache_requests_total",
+    "Lookups in the in-process caches.",
+    ["cache", "result"],
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Get the registry to collect the metrics from,
+    adding up those of all worker processes in multiprocess mode.
+    """
+    if MULTIPROCESS_DIR_ENV not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def mark_process_dead() -> None:
+    """
+    Remove the live gauges of this process, when it exits in multiprocess mode.
+    """
+    if MULTIPROCESS_DIR_ENV in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@contextmanager
+def observe_search(backend: str, operation: str) -> Iterator[None]:
+    """
+    Time a search backend operation and count it if it fails.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SEARCH_FAILURES.labels(backend, operation).inc()
+        raise
+    finally:
+        SEARCH_DURATION.labels(backend, operation).observe(time.perf_counter() - start)
+
+
+class UploadFileResponse(FileResponse):
+    """
+    File response counting the bytes sent of uploaded files.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def counting_send(message: Message) -> None:
+            if message["type"] == "http.response.body":
+                UPLOAD_BYTES.labels("out").inc(len(message.get("body", b"")))
+            await send(message)
+
+        await super().__call__(scope, receive, counting_send)
+
+
+class MetricsMiddleware:
+    """
+    Measure the latency of requests by endpoint, and count those in progress.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # The endpoint function rather than the path,
+            # so that IDs in paths do not make new series
+            endpoint = scope.get("endpoint")
+            REQUEST_DURATION.labels(
+                method,
+                getattr(endpoint, "__name__", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,135 @@
+import functools
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from logging import getLogger
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from ..settings import settings
+from .metrics import DB_QUERY_DURATION
+
+logger = getLogger(__name__)
+
+# Methods of the Tortoise database clients that run SQL
+QUERY_METHODS = (
+    "execute_insert",
+    "execute_many",
+    "execute_query",
+    "execute_query_dict",
+    "execute_script",
+)
+
+
+@dataclass
+class QueryStats:
+    """
+    Number of queries and total time spent in the database during a request.
+    """
+
+    count: int = 0
+    duration: float = 0.0  # seconds
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Set while a query runs, so that methods calling each other count once
+_in_query: ContextVar[bool] = ContextVar("in_query", default=False)
+
+
+def _instrument(method):
+    @functools.wraps(method)
+    async def wrapper(self, query: str, *args, **kwargs):
+        if _in_query.get():
+            return await method(self, query, *args, **kwargs)
+        token = _in_query.set(True)
+        start = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            _in_query.reset(token)
+            DB_QUERY_DURATION.observe(duration)
+            stats = _query_stats.get()
+            if stats is not None:
+                stats.count += 1
+                stats.duration += duration
+            if (
+                settings.slow_query_threshold
+                and duration * 1000 >= settings.slow_query_threshold
+            ):
+                logger.warning(
+                    "Slow query (%.1f ms): %s",
+                    duration * 1000,
+                    query,
+                    extra={"duration_ms": duration * 1000, "sql": query},
+                )
+
+    wrapper._query_stats = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_db_clients() -> None:
+    """
+    Wrap the query methods of the loaded Tortoise database clients
+    (including their transaction wrappers) to count and time the queries.
+    Call after Tortoise is initialized, since it imports the clients it uses.
+    """
+    classes = [BaseDBAsyncClient]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        for name in QUERY_METHODS:
+            method = vars(cls).get(name)
+            if method is None or getattr(method, "_query_stats", False):
+                continue
+            if getattr(method, "__isabstractmethod__", False):
+                continue
+            setattr(cls, name, _instrument(method))
+
+
+class QueryStatsMiddleware:
+    """
+    Count the queries of each request and the time spent in them,
+    and report them as a Server-Timing header and in the log.
+    The header only includes the queries made before the response starts.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.server_timing:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _query_stats.reset(token)
+            logger.debug(
+                "%s %s: %d queries in %.1f ms",
+                scope["method"],
+                scope["path"],
+                stats.count,
+                stats.duration * 1000,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "queries": stats.count,
+                    "db_duration_ms": stats.duration * 1000,
+                },
+            )
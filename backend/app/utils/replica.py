@@ -0,0 +1,96 @@
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, TypeVar
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..settings import settings
+
+# Connection name of the read replica in the Tortoise config
+REPLICA_CONNECTION = "replica"
+# Session key of the time of the user's last write request
+LAST_WRITE_SESSION_KEY = "last_write"
+
+F = TypeVar("F", bound=Callable)
+
+_read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+
+class ReplicaRouter:
+    """
+    Tortoise router sending the reads of endpoints using the read_replica
+    dependency to the replica, if one is configured.
+    Writes and all other reads use the default connection.
+    """
+
+    def db_for_read(self, model: type) -> str | None:
+        if settings.db_replica_url and _read_from_replica.get():
+            return REPLICA_CONNECTION
+        return None
+
+    def db_for_write(self, model: type) -> str | None:
+        return None
+
+
+async def read_replica(request: Request) -> AsyncIterator[None]:
+    """
+    Dependency for read-only endpoints to read from the replica,
+    unless the user made a write request recently enough that
+    the replica may not have it yet.
+    """
+    last_write = request.session.get(LAST_WRITE_SESSION_KEY, 0)
+    if (
+        not settings.db_replica_url
+        or time.time() - last_write < settings.db_replica_lag
+    ):
+        yield
+        return
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def read_only(endpoint: F) -> F:
+    """
+    Mark an endpoint that uses a method other than GET but does not write,
+    e.g. a search, so that calling it does not make the user read from the primary.
+    """
+    endpoint._read_only = True  # type: ignore[attr-defined]
+    return endpoint
+
+
+class LastWriteMiddleware:
+    """
+    Record the time of successful write requests in the session when a replica
+    is configured, so that the user reads their own writes from the primary
+    afterwards. Requests with methods other than GET, HEAD and OPTIONS are writes
+    unless their endpoint is marked with read_only().
+    Must be inside the session middleware.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.db_replica_url
+            or scope["method"] in ("GET", "HEAD", "OPTIONS")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_last_write(message: Message) -> None:
+            # The session middleware saves the session when the response starts
+            if (
+                message["type"] == "http.response.start"
+                and 200 <= message["status"] < 300
+                and not getattr(scope.get("endpoint"), "_read_only", False)
+            ):
+                scope["session"][LAST_WRITE_SESSION_KEY] = time.time()
+            await send(message)
+
+        await self.app(scope, receive, send_with_last_write)
@@ -0,0 +1,133 @@
+from datetime import UTC, date, datetime, timedelta
+from logging import getLogger
+
+from tortoise import connections
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from ..models.revision import Revision, decode_chain
+from ..settings import settings
+from .deltas import encode_text
+
+logger = getLogger(__name__)
+
+
+async def compact_revisions(batch_size: int = 500, vacuum: bool = False) -> int:
+    """
+    Convert revisions stored with full markdown and HTML into snapshots and deltas.
+    Documents are processed one at a time and each batch is committed separately,
+    so the conversion can be interrupted and resumed.
+    With vacuum, the SQLite database file is rebuilt afterwards to release the space.
+    Returns the number of revisions converted.
+    """
+    count = 0
+    doc_ids = (
+        await Revision.filter(data__isnull=True)
+        .order_by("doc_id")
+        .distinct()
+        .values_list("doc_id", flat=True)
+    )
+    for doc_id in doc_ids:
+        converted = await Revision.compact_legacy(doc_id, batch_size)
+        logger.info(f"Compacted {converted} revisions of document {doc_id}.")
+        count += converted
+    if vacuum:
+        connection = connections.get("default")
+        if connection.capabilities.dialect == "sqlite":
+            await connection.execute_script("VACUUM")
+    return count
+
+
+def revisions_to_keep(revisions: list[tuple[int, datetime]], now: datetime) -> set[int]:
+    """
+    Select the revisions of a document kept by the retention policy, given their
+    (id, created_at) in ascending ID order: every revision from the last
+    revision_keep_all_days days, then the last revision of each day up to
+    revision_keep_daily_days days, then the last revision of each week.
+    The latest revision is always kept.
+    """
+    keep_all_after = now - timedelta(days=settings.revision_keep_all_days)
+    keep_daily_after = now - timedelta(days=settings.revision_keep_daily_days)
+    keep = set()
+    buckets: dict[date | tuple[int, int], int] = {}
+    for id, created_at in revisions:
+        if created_at >= keep_all_after:
+            keep.add(id)
+        elif created_at >= keep_daily_after:
+            buckets[created_at.date()] = id
+        else:
+            year, week, _ = created_at.isocalendar()
+            buckets[(year, week)] = id
+    keep.update(buckets.values())
+    if revisions:
+        keep.add(revisions[-1][0])
+    return keep
+
+
+async def prune_revisions(batch_size: int = 500, now: datetime | None = None) -> int:
+    """
+    Delete the revisions that are not kept by the retention policy.
+    Documents are processed one at a time, each in its own transaction.
+    Returns the number of revisions deleted.
+    """
+    now = now or datetime.now(UTC)
+    count = 0
+    doc_ids = (
+        await Revision.all()
+        .order_by("doc_id")
+        .distinct()
+        .values_list("doc_id", flat=True)
+    )
+    for doc_id in doc_ids:
+        count += await _prune_doc(doc_id, now, batch_size)
+    return count
+
+
+async def _prune_doc(doc_id: int, now: datetime, batch_size: int) -> int:
+    """Prune the revisions of a document and relink the chains they were part of."""
+    rows = (
+        await Revision.filter(doc_id=doc_id)
+        .order_by("id")
+        .values_list("id", "created_at", "snapshot_id")
+    )
+    keep = revisions_to_keep([(id, created_at) for id, created_at, _ in rows], now)
+    deleted = [id for id, _, _ in rows if id not in keep]
+    if not deleted:
+        return 0
+    roots = {snapshot_id or id for id, _, snapshot_id in rows if id not in keep}
+    async with in_transaction("default"):
+        for root_id in roots:
+            await _relink_chain(root_id, keep)
+        for start in range(0, len(deleted), batch_size):
+            await Revision.filter(id__in=deleted[start : start + batch_size]).delete()
+    logger.info(f"Pruned {len(deleted)} revisions of document {doc_id}.")
+    return len(deleted)
+
+
+async def _relink_chain(root_id: int, keep: set[int]) -> None:
+    """
+    Re-encode the kept revisions of a chain so that none of them depends
+    on a revision that is about to be deleted.
+    """
+    chain = (
+        await Revision.filter(Q(id=root_id) | Q(snapshot_id=root_id))
+        .filter(data__isnull=False)
+        .order_by("id")
+    )
+    texts = decode_chain((r.id, r.base_id, r.data) for r in chain)
+    new_root_id = None
+    previous = None
+    for revision in chain:
+        if revision.id not in keep:
+            continue
+        if previous is None or revision.base_id != previous.id:
+            revision.data, is_delta = encode_text(
+                texts[revision.id], texts[previous.id] if previous else None
+            )
+            revision.base_id = previous.id if previous and is_delta else None
+        # Deltas against the previous kept revision are still valid as they are
+        revision.snapshot_id = new_root_id if revision.base_id is not None else None
+        if revision.snapshot_id is None:
+            new_root_id = revision.id
+        await revision.save(update_fields=["data", "snapshot_id", "base_id"])
+        previous = revision
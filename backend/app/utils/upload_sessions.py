@@ -0,0 +1,185 @@
+import asyncio
+import json
+import re
+import secrets
+import shutil
+import time
+from contextlib import suppress
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles
+import aiofiles.os
+from pydantic import BaseModel
+
+from ..settings import settings
+from .metrics import UPLOAD_BYTES
+
+SESSIONS_DIRNAME = ".sessions"
+
+
+class ChunkSizeError(ValueError):
+    """
+    Raised when a chunk does not have the expected number of bytes.
+    """
+
+
+class UploadSession(BaseModel):
+    """
+    State of a resumable chunked upload.
+
+    Sessions are stored on disk under the uploads directory so that
+    every worker process can accept chunks for any session.
+    Chunks are written in place into a single preallocated data file,
+    which is moved to its final storage path when the upload is finalized.
+    """
+
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    chunk_size: int
+    public: bool
+    doc_id: int | None = None
+    created_by_id: int
+    created_at: datetime
+
+    @staticmethod
+    def sessions_dir() -> Path:
+        return settings.uploads_dir / SESSIONS_DIRNAME
+
+    @property
+    def directory(self) -> Path:
+        return self.sessions_dir() / self.id
+
+    @property
+    def data_path(self) -> Path:
+        return self.directory / "data"
+
+    @property
+    def chunks_dir(self) -> Path:
+        return self.directory / "chunks"
+
+    @property
+    def chunk_count(self) -> int:
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        """
+        Get the offset and length of the chunk with the given index.
+        """
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    @classmethod
+    async def create(
+        cls,
+        filename: str,
+        content_type: str,
+        size: int,
+        public: bool,
+        doc_id: int | None,
+        created_by_id: int,
+    ) -> "UploadSession":
+        """
+        Create a new upload session and preallocate its data file.
+        """
+        session = cls(
+            id=secrets.token_hex(16),
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            chunk_size=settings.upload_chunk_size,
+            public=public,
+            doc_id=doc_id,
+            created_by_id=created_by_id,
+            created_at=datetime.now(UTC),
+        )
+        await aiofiles.os.makedirs(session.chunks_dir, exist_ok=True)
+        async with aiofiles.open(session.data_path, "wb") as f:
+            await f.truncate(size)
+        async with aiofiles.open(session.directory / "session.json", "w") as f:
+            await f.write(session.model_dump_json())
+        return session
+
+    @classmethod
+    async def load(cls, session_id: str) -> "UploadSession | None":
+        """
+        Load an upload session by ID, or return None if it does not exist.
+        """
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            return None
+        path = cls.sessions_dir() / session_id / "session.json"
+        try:
+            async with aiofiles.open(path, "r") as f:
+                return cls.model_validate(json.loads(await f.read()))
+        except FileNotFoundError:
+            return None
+
+    async def received_chunks(self) -> list[int]:
+        """
+        Get the sorted indexes of the chunks received so far.
+        """
+        try:
+            names = await aiofiles.os.listdir(self.chunks_dir)
+        except FileNotFoundError:  # pragma: no cover
+            return []
+        return sorted(int(name) for name in names if name.isdigit())
+
+    async def write_chunk(self, index: int, stream: AsyncIterator[bytes]) -> None:
+        """
+        Write a chunk at its offset in the data file.
+        The chunk is only marked as received once all of its bytes are written,
+        so a resent chunk that fails partway is no longer marked as received.
+        """
+        offset, length = self.chunk_range(index)
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(self.chunks_dir / str(index))
+        written = 0
+        async with aiofiles.open(self.data_path, "r+b") as f:
+            await f.seek(offset)
+            async for data in stream:
+                written += len(data)
+                if written > length:
+                    raise ChunkSizeError(f"Chunk {index} must be {length} bytes")
+                await f.write(data)
+        if written != length:
+            raise ChunkSizeError(f"Chunk {index} must be {length} bytes")
+        UPLOAD_BYTES.labels("in").inc(written)
+        async with aiofiles.open(self.chunks_dir / str(index), "wb"):
+            pass
+
+    async def finalize(self, destination: Path) -> None:
+        """
+        Move the assembled data file to its final location and remove the session.
+        Raises FileNotFoundError if the session was finalized or discarded
+        concurrently, since only one move of the data file can succeed.
+        """
+        await aiofiles.os.replace(self.data_path, destination)
+        await self.discard()
+
+    async def discard(self) -> None:
+        """
+        Remove the session and any partial data.
+        """
+        await asyncio.to_thread(shutil.rmtree, self.directory, ignore_errors=True)
+
+    @classmethod
+    async def cleanup_expired(cls) -> None:
+        """
+        Remove sessions that have not received data within the maximum session age.
+        """
+
+        def cleanup() -> None:
+            sessions_dir = cls.sessions_dir()
+            if not sessions_dir.is_dir():
+                return
+            cutoff = time.time() - settings.upload_session_max_age
+            for entry in sessions_dir.iterdir():
+                data_path = entry / "data"
+                path = data_path if data_path.exists() else entry
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry, ignore_errors=True)
+
+        await asyncio.to_thread(cleanup)
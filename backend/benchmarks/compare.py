@@ -0,0 +1,72 @@
+"""
+Compare the results of two benchmark runs, e.g. of two releases.
+
+Run from the backend directory:
+
+    python -m benchmarks.compare old.json new.json
+"""
+
+import json
+import sys
+
+import click
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def scenario_stats(results: dict) -> dict[str, dict]:
+    """The statistics of each scenario of a run."""
+    return {bench["name"]: bench["stats"] for bench in results["benchmarks"]}
+
+
+@click.command()
+@click.argument("old_path", metavar="OLD")
+@click.argument("new_path", metavar="NEW")
+@click.option(
+    "--stat",
+    default="median",
+    type=click.Choice(["min", "max", "mean", "median"]),
+    help="Statistic to compare.",
+)
+@click.option(
+    "--threshold",
+    default=10.0,
+    help="Change in percent above which a scenario counts as slower.",
+)
+def main(old_path: str, new_path: str, stat: str, threshold: float) -> None:
+    """
+    Show the change of each scenario between two runs.
+    Exits with status 1 if any scenario got slower than the threshold.
+    """
+    old_results, new_results = load(old_path), load(new_path)
+    if old_results["shape"] != new_results["shape"]:
+        click.echo("Warning: the runs used wikis of different shapes.\n", err=True)
+    old, new = scenario_stats(old_results), scenario_stats(new_results)
+    slower = []
+    click.echo(f"{'scenario':<24} {'old (ms)':>10} {'new (ms)':>10} {'change':>8}")
+    for name in [*old, *(name for name in new if name not in old)]:
+        if name not in old or name not in new:
+            only = "new" if name in new else "old"
+            click.echo(f"{name:<24} only in {only}")
+            continue
+        before, after = old[name][stat], new[name][stat]
+        change = (after - before) / before * 100 if before else 0.0
+        mark = ""
+        if change > threshold:
+            slower.append(name)
+            mark = " slower"
+        elif change < -threshold:
+            mark = " faster"
+        click.echo(
+            f"{name:<24} {before * 1000:10.2f} {after * 1000:10.2f} {change:+7.1f}%{mark}"
+        )
+    if slower:
+        click.echo(f"\nSlower by more than {threshold}%: {', '.join(slower)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Generate a synthetic wiki with a realistic shape:
+a tree of documents with Markdown of a given size, revision histories and uploads.
+"""
+
+import random
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+BATCH_SIZE = 1000
+# Password of the generated admin user, who made all the changes
+PASSWORD = "benchmark"
+# Time of the first revisions
+START = datetime(2025, 1, 1, tzinfo=UTC)
+
+# Vocabulary of the generated text
+TEXT = (
+    "the server stores every document as markdown and renders it to html when "
+    "it is saved while readers browse the outline of pages and search for the "
+    "sections they need before editing configuration deployment backup restore "
+    "database index query cache request response user admin token upload image "
+    "archive export import revision history change review install update"
+)
+WORDS = TEXT.split()
+
+
+@dataclass
+class WikiShape:
+    """The shape of a generated wiki."""
+
+    breadth: int = 5  # children per document
+    depth: int = 3  # levels of documents below the home page
+    page_size: int = 4000  # characters of Markdown per document
+    revisions: int = 3  # revisions per document, including the current content
+    uploads: int = 1  # uploads attached to each document
+    upload_size: int = 16 * 1024  # bytes per upload
+    seed: int = 0
+
+    @property
+    def docs(self) -> int:
+        return sum(self.breadth**level for level in range(self.depth + 1))
+
+
+@dataclass
+class Wiki:
+    """The IDs of what was generated, by level of the tree for the documents."""
+
+    user_id: int
+    levels: list[list[int]] = field(default_factory=list)
+    upload_ids: list[int] = field(default_factory=list)
+
+    @property
+    def doc_ids(self) -> list[int]:
+        return [id for level in self.levels for id in level]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_markdown(rng: random.Random, size: int, links: Sequence[str] = ()) -> str:
+    """
+    Generate Markdown of about the given number of characters,
+    with headings, paragraphs, lists, code blocks, tables and links.
+    """
+    blocks: list[str] = []
+    length = 0
+    while length < size:
+        kind = rng.randrange(6)
+        if kind == 0 or not blocks:
+            block = f"{'#' * rng.randint(2, 3)} {_sentence(rng)[:-1]}"
+        elif kind == 1:
+            block = "\n".join(f"- {_sentence(rng)}" for _ in range(rng.randint(2, 5)))
+        elif kind == 2:
+            lines = (" ".join(rng.choices(WORDS, k=4)) for _ in range(4))
+            block = "```\n" + "\n".join(lines) + "\n```"
+        elif kind == 3:
+            rows = (
+                f"| {rng.choice(WORDS)} | {rng.randrange(1000)} | {_sentence(rng)} |"
+                for _ in range(rng.randint(2, 6))
+            )
+            block = "| Name | Value | Notes |\n| --- | --- | --- |\n" + "\n".join(rows)
+        else:
+            sentences = [_sentence(rng) for _ in range(rng.randint(2, 6))]
+            if links:
+                sentences.append(f"See [{rng.choice(WORDS)}]({rng.choice(links)}).")
+            block = " ".join(sentences)
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def _edit(rng: random.Random, markdown: str) -> str:
+    """Make an earlier version of a page by rewriting one of its paragraphs."""
+    blocks = markdown.split("\n\n")
+    blocks[rng.randrange(len(blocks))] = _sentence(rng)
+    return "\n\n".join(blocks)
+
+
+async def generate_wiki(shape: WikiShape) -> Wiki:
+    """
+    Create the documents, revisions and uploads of a wiki in an empty database,
+    and write the uploaded files to the uploads directory.
+    Documents are numbered breadth first from the home page.
+    """
+    # Imported here, so that the shape can be set up before the app's settings
+    from app.auth.passwords import hash_password
+    from app.models.doc import Doc, render_markdown
+    from app.models.revision import Revision
+    from app.models.upload import Upload
+    from app.models.user import User
+    from app.schemas.role import Role
+    from app.settings import settings
+
+    rng = random.Random(shape.seed)
+    user = await User.create(
+        username="bench", password_hash=hash_password(PASSWORD), role=Role.ADMIN
+    )
+    wiki = Wiki(user_id=user.id, levels=[[1]])
+    paths = {1: ""}
+    parent_ids: dict[int, int | None] = {1: None}
+    for _ in range(shape.depth):
+        parents = wiki.levels[-1]
+        first = parents[-1] + 1
+        ids = list(range(first, first + len(parents) * shape.breadth))
+        for i, id in enumerate(ids):
+            parent_ids[id] = parents[i // shape.breadth]
+            paths[id] = f"{paths[parent_ids[id]]}/doc-{id}"
+        wiki.levels.append(ids)
+
+    links = [path or "/" for path in paths.values()]
+    ids = wiki.doc_ids
+    for start in range(0, len(ids), BATCH_SIZE):
+        docs = []
+        for id in ids[start : start + BATCH_SIZE]:
+            markdown = generate_markdown(rng, shape.page_size, links)
+            html, subtitles = render_markdown(markdown)
+            docs.append(
+                Doc(
+                    id=id,
+                    parent_id=parent_ids[id],
+                    title="Home" if id == 1 else f"Document {id}",
+                    slug="" if id == 1 else f"doc-{id}",
+                    urlpath=paths[id] or "/",
+                    public=id % 4 != 0,
+                    order=id,
+                    markdown=markdown,
+                    html=html,
+                    metadata={"subtitles": subtitles},
+                    updated_by_id=user.id,
+                )
+            )
+        await Doc.bulk_create(docs)
+        for doc in docs:
+            # Oldest first, ending with the current content
+            versions = [doc.markdown]
+            for _ in range(shape.revisions - 1):
+                versions.append(_edit(rng, versions[-1]))
+            for k, markdown in enumerate(reversed(versions)):
+                revision = await Revision.add(doc.id, markdown, user.id)
+                # A day apart, since exports name revisions by their time
+                created_at = START + timedelta(days=k, minutes=doc.id)
+                await Revision.filter(id=revision.id).update(created_at=created_at)
+
+    settings.uploads_dir.mkdir(parents=True, exist_ok=True)
+    uploads = []
+    for id in ids:
+        for k in range(shape.uploads):
+            storage_path = f"{Upload.generate_storage_path()}.txt"
+            words = rng.choices(WORDS, k=shape.upload_size // 4 + 1)
+            content = " ".join(words).encode()[: shape.upload_size]
+            (settings.uploads_dir / storage_path).write_bytes(content)
+            uploads.append(
+                Upload(
+                    filename=f"attachment-{k}.txt",
+                    content_type="text/plain",
+                    size=len(content),
+                    public=id % 4 != 0,
+                    storage_path=storage_path,
+                    created_by_id=user.id,
+                    doc_id=id,
+                )
+            )
+    for start in range(0, len(uploads), BATCH_SIZE):
+        await Upload.bulk_create(uploads[start : start + BATCH_SIZE])
+    wiki.upload_ids = list(
+        await Upload.all().order_by("id").values_list("id", flat=True)
+    )
+    return wiki
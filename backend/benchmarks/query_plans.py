@@ -0,0 +1,201 @@
+"""
+Compare the query plans and timings of the hot lookup queries
+with and without the indexes declared in the models' Meta.indexes.
+
+Run from the backend directory:
+
+    python -m benchmarks.query_plans --docs 100000
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+
+import click
+from tortoise import Tortoise, connections
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+from app.models.doc import Doc
+from app.models.revision import Revision
+from app.models.sharelink import ShareableLink
+from app.models.upload import Upload
+from app.models.user import User
+from app.settings import _connection_config
+
+MODELS: list[type[Model]] = [Doc, Revision, Upload, ShareableLink]
+# Children per document, so that 100k documents are about five levels deep
+FANOUT = 10
+BATCH_SIZE = 5000
+
+
+async def populate(docs: int) -> None:
+    """Create a document tree with revisions, uploads and share links."""
+    rng = random.Random(0)
+    user = await User.create(username="bench", password_hash="")
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    await Doc.create(
+        title="Home", slug="", urlpath="/", markdown="", html="", metadata={}
+    )
+    for first in range(2, docs + 1, BATCH_SIZE):
+        ids = range(first, min(first + BATCH_SIZE, docs + 1))
+        await Doc.bulk_create(
+            [
+                Doc(
+                    id=i,
+                    parent_id=(i - 2) // FANOUT + 1,
+                    title=f"Document {rng.randrange(docs)}",
+                    slug=f"doc-{i}",
+                    urlpath=f"/doc-{i}",
+                    public=i % 3 != 0,
+                    order=i % FANOUT,
+                    markdown="",
+                    html="",
+                    metadata={},
+                )
+                for i in ids
+            ]
+        )
+        await Revision.bulk_create(
+            [
+                Revision(
+                    doc_id=i,
+                    data=b"",
+                    legacy_markdown="",
+                    legacy_html="",
+                    created_by_id=user.id,
+                    created_at=start + timedelta(minutes=i + k),
+                )
+                for i in ids
+                for k in range(2)
+            ]
+        )
+        await Upload.bulk_create(
+            [
+                Upload(
+                    filename=f"file-{i}.png",
+                    content_type="image/png",
+                    size=0,
+                    storage_path=f"bench/{i}",
+                    doc_id=i,
+                    created_by_id=user.id,
+                )
+                for i in ids
+                if i % 5 == 0
+            ]
+        )
+        await ShareableLink.bulk_create(
+            [
+                ShareableLink(token=f"token-{i}", doc_id=i, created_by_id=user.id)
+                for i in ids
+                if i % 10 == 0
+            ]
+        )
+
+
+def hot_queries(doc_id: int, user_id: int) -> dict[str, QuerySet]:
+    """The queries behind the outline, sitemap, uploads, revisions and links."""
+    return {
+        "children": Doc.filter(parent_id=doc_id).order_by("order", "title"),
+        "public children": Doc.filter(parent_id=doc_id, public=True).order_by(
+            "order", "title"
+        ),
+        "public docs page": Doc.filter(public=True).limit(100),
+        "doc uploads": Upload.filter(doc_id=doc_id),
+        "doc revisions": Revision.filter(doc_id=doc_id).order_by("-created_at"),
+        "user's doc links": ShareableLink.filter(doc_id=doc_id, created_by_id=user_id),
+    }
+
+
+async def model_indexes() -> list[tuple[str, str]]:
+    """Get the names and SQL of the indexes declared in Meta.indexes."""
+    connection = connections.get("default")
+    result = []
+    for model in MODELS:
+        table = model._meta.db_table
+        declared = [
+            [model._meta.fields_map[name].source_field or name for name in index]
+            for index in model._meta.indexes
+        ]
+        _, indexes = await connection.execute_query(f'PRAGMA index_list("{table}")')
+        for index in indexes:
+            _, columns = await connection.execute_query(
+                f'PRAGMA index_info("{index[1]}")'
+            )
+            if [column[2] for column in columns] in declared:
+                _, rows = await connection.execute_query(
+                    "SELECT sql FROM sqlite_master WHERE name = ?", [index[1]]
+                )
+                result.append((index[1], rows[0][0]))
+    return result
+
+
+async def measure(
+    samples: list[tuple[int, int]], repeat: int
+) -> dict[str, tuple[str, float]]:
+    """Get the plan and mean time in milliseconds of each hot query."""
+    connection = connections.get("default")
+    await connection.execute_query("ANALYZE")
+    results = {}
+    for name, query in hot_queries(*samples[0]).items():
+        _, plan = await connection.execute_query(
+            f"EXPLAIN QUERY PLAN {query.sql(params_inline=True)}"
+        )
+        start = time.perf_counter()
+        for i in range(repeat):
+            await hot_queries(*samples[i % len(samples)])[name]
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        results[name] = ("; ".join(row[3] for row in plan), elapsed)
+    return results
+
+
+async def run(docs: int, repeat: int, db_path: str) -> None:
+    await Tortoise.init(
+        config={
+            "connections": {"default": _connection_config(f"sqlite://{db_path}")},
+            "apps": {"gnotus": {"models": ["app.models"]}},
+        }
+    )
+    try:
+        await Tortoise.generate_schemas()
+        click.echo(f"Creating {docs} documents in {db_path}...")
+        await populate(docs)
+        user_id = (await User.first()).id
+        rng = random.Random(1)
+        samples = [(rng.randrange(1, docs // FANOUT), user_id) for _ in range(100)]
+
+        connection = connections.get("default")
+        indexes = await model_indexes()
+        for name, _ in indexes:
+            await connection.execute_query(f'DROP INDEX "{name}"')
+        before = await measure(samples, repeat)
+        for _, sql in indexes:
+            await connection.execute_query(sql)
+        after = await measure(samples, repeat)
+    finally:
+        await Tortoise.close_connections()
+
+    for name in before:
+        click.echo(f"\n{name}: {before[name][1]:.3f} ms -> {after[name][1]:.3f} ms")
+        click.echo(f"  before: {before[name][0]}")
+        click.echo(f"  after:  {after[name][0]}")
+
+
+@click.command()
+@click.option("--docs", default=100_000, help="Number of documents to create.")
+@click.option("--repeat", default=200, help="Executions of each query to time.")
+@click.option("--db", "db_path", help="SQLite file to create (default: temporary).")
+def main(docs: int, repeat: int, db_path: str | None) -> None:
+    """Compare query plans with and without the model indexes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = db_path or os.path.join(tmp, "bench.db")
+        if os.path.exists(path):
+            raise click.UsageError(f"{path} already exists")
+        asyncio.run(run(docs, repeat, path))
+
+
+if __name__ == "__main__":
+    main()
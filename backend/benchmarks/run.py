@@ -0,0 +1,156 @@
+"""
+Time the main read and write paths of the API, search, the exports and uploads
+against a generated wiki in a temporary SQLite database.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --json results.json
+
+and compare the results of two runs, e.g. of two releases, with:
+
+    python -m benchmarks.compare old.json results.json
+"""
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from dataclasses import asdict
+from datetime import UTC, datetime
+
+import click
+from fastapi.testclient import TestClient
+
+from .generator import WikiShape
+
+
+def _commit() -> str | None:
+    """The git commit being benchmarked, if known."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError:
+        return None
+    except OSError:
+        return None
+    return result.stdout.strip()
+
+
+def run(shape: WikiShape, names: list[str], rounds: int, warmup: int, tmp: str) -> dict:
+    # Imported here, once the settings point to the temporary directory
+    from tortoise import Tortoise
+
+    from app.main import app
+
+    from .generator import PASSWORD, generate_wiki
+    from .scenarios import SCENARIOS, Benchmark, Context
+
+    results = []
+    # The session cookie is only sent over HTTPS
+    with TestClient(app, base_url="https://testserver") as client:
+        client.portal.call(Tortoise.generate_schemas)
+        click.echo(f"Generating {shape.docs} documents in {tmp}...")
+        wiki = client.portal.call(generate_wiki, shape)
+
+        client.get("/api/auth/user")
+        client.headers["x-csrftoken"] = client.cookies["csrftoken"]
+        client.post("/api/auth/login", json={"username": "bench", "password": PASSWORD})
+        # Logging in replaces the CSRF token
+        client.get("/api/auth/user")
+        client.headers["x-csrftoken"] = client.cookies["csrftoken"]
+
+        ctx = Context(client, client.portal, shape, wiki, tmp)
+        for name in names:
+            group, func = SCENARIOS[name]
+            benchmark = Benchmark(rounds, warmup)
+            func(ctx, benchmark)
+            stats = benchmark.stats()
+            results.append({"name": name, "group": group, "stats": stats})
+            click.echo(
+                f"{name:<24} median {stats['median'] * 1000:9.2f} ms"
+                f"  min {stats['min'] * 1000:9.2f} ms  max {stats['max'] * 1000:9.2f} ms"
+            )
+
+    return {
+        "datetime": datetime.now(UTC).isoformat(),
+        "version": app.version,
+        "commit": _commit(),
+        "machine_info": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "shape": asdict(shape),
+        "options": {"rounds": rounds, "warmup": warmup},
+        "benchmarks": results,
+    }
+
+
+@click.command()
+@click.option("--breadth", default=WikiShape.breadth, help="Children per document.")
+@click.option("--depth", default=WikiShape.depth, help="Levels below the home page.")
+@click.option(
+    "--page-size", default=WikiShape.page_size, help="Characters per document."
+)
+@click.option(
+    "--revisions", default=WikiShape.revisions, help="Revisions per document."
+)
+@click.option("--uploads", default=WikiShape.uploads, help="Uploads per document.")
+@click.option("--upload-size", default=WikiShape.upload_size, help="Bytes per upload.")
+@click.option("--seed", default=WikiShape.seed, help="Seed of the generated content.")
+@click.option("--rounds", default=10, help="Timed rounds of each scenario.")
+@click.option("--warmup", default=1, help="Untimed rounds before the timed ones.")
+@click.option(
+    "--scenario",
+    "-k",
+    "scenarios",
+    multiple=True,
+    help="Scenario to run (default: all). Can be repeated.",
+)
+@click.option("--json", "json_path", help="File to write the results to.")
+def main(
+    breadth: int,
+    depth: int,
+    page_size: int,
+    revisions: int,
+    uploads: int,
+    upload_size: int,
+    seed: int,
+    rounds: int,
+    warmup: int,
+    scenarios: tuple[str, ...],
+    json_path: str | None,
+) -> None:
+    """Benchmark the app against a generated wiki."""
+    shape = WikiShape(breadth, depth, page_size, revisions, uploads, upload_size, seed)
+    if breadth < 2 or depth < 1:
+        raise click.UsageError("The wiki needs a breadth of 2 and a depth of 1.")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["GNOTUS_DB_URL"] = f"sqlite://{os.path.join(tmp, 'bench.db')}"
+        os.environ["GNOTUS_UPLOADS_DIR"] = os.path.join(tmp, "uploads")
+        os.environ["GNOTUS_SEARCH_BACKEND"] = "memory"
+        os.environ["GNOTUS_LOG_LEVEL"] = "WARNING"
+
+        from .scenarios import SCENARIOS
+
+        names = list(scenarios) or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise click.UsageError(
+                f"Unknown scenarios: {', '.join(unknown)}. "
+                f"Choose from: {', '.join(SCENARIOS)}."
+            )
+        results = run(shape, names, rounds, warmup, tmp)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"Results written to {json_path}.")
+
+
+if __name__ == "__main__":
+    main()
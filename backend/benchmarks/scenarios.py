@@ -0,0 +1,320 @@
+"""
+Scenarios timing the main read and write paths of the API, search,
+the exports and uploads.
+This imports the app, so the environment must be set up first (see run.py).
+"""
+
+import itertools
+import os
+import random
+import shutil
+import statistics
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
+
+from anyio.from_thread import BlockingPortal
+from fastapi.testclient import TestClient
+
+from app.models.doc import Doc
+from app.settings import settings
+from app.utils.dump import (
+    MANIFEST_NAME,
+    dump_to_dir,
+    dump_to_single_file,
+    dump_to_zip,
+    load_manifest,
+)
+from app.utils.indexing import index_all_documents
+
+from .generator import Wiki, WikiShape, generate_markdown
+
+# Times the page size of the large documents
+LARGE_PAGE_FACTOR = 25
+# Queries of the generated text, and prefixes of the titles being typed
+SEARCH_QUERIES = ["markdown", "database backup", "revision history", "render html"]
+AUTOCOMPLETE_QUERIES = ["do", "doc", "document", "document 1", "home"]
+
+
+class Benchmark:
+    """
+    Time rounds of a target, in the manner of pytest-benchmark's pedantic mode:
+    the setup runs before each round, untimed, and returns the target's arguments.
+    """
+
+    def __init__(self, rounds: int, warmup: int) -> None:
+        self.rounds = rounds
+        self.warmup = warmup
+        self.times: list[float] = []
+
+    def __call__(
+        self,
+        target: Callable[..., Any],
+        setup: Callable[[], tuple] | None = None,
+    ) -> None:
+        for i in range(self.warmup + self.rounds):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            target(*args)
+            elapsed = time.perf_counter() - start
+            if i >= self.warmup:
+                self.times.append(elapsed)
+
+    def stats(self) -> dict[str, float | int]:
+        """Statistics of the timed rounds, in seconds."""
+        times = self.times
+        quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [0] * 3
+        mean = statistics.fmean(times)
+        return {
+            "rounds": len(times),
+            "min": min(times),
+            "max": max(times),
+            "mean": mean,
+            "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "median": statistics.median(times),
+            "iqr": quartiles[2] - quartiles[0],
+            "ops": 1 / mean if mean else 0.0,
+            "total": sum(times),
+        }
+
+
+@dataclass
+class Context:
+    """What the scenarios run against."""
+
+    client: TestClient
+    portal: BlockingPortal
+    shape: WikiShape
+    wiki: Wiki
+    tmp: str
+
+    def request(self, method: str, url: str, **kwargs) -> Any:
+        """Make a request to the app, failing on error responses."""
+        response = self.client.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{method} {url}: {response.status_code} {response.text[:200]}"
+            )
+        return response
+
+    def output(self, name: str) -> Callable[[], tuple[str]]:
+        """Setup giving the path to write to, with the previous output removed."""
+        path = os.path.join(self.tmp, name)
+
+        def setup() -> tuple[str]:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            return (path,)
+
+        return setup
+
+
+Scenario = Callable[[Context, Benchmark], None]
+# Scenarios by name, with their group, in the order they run
+SCENARIOS: dict[str, tuple[str, Scenario]] = {}
+
+
+def scenario(group: str) -> Callable[[Scenario], Scenario]:
+    def decorator(func: Scenario) -> Scenario:
+        SCENARIOS[func.__name__] = (group, func)
+        return func
+
+    return decorator
+
+
+def _cycle(*values: Any) -> Callable[[], tuple]:
+    """Setup giving each of the values in turn."""
+    it = itertools.cycle(values)
+    return lambda: (next(it),)
+
+
+@contextmanager
+def _uncached_search(ctx: Context) -> Iterator[None]:
+    """Fill the search index and disable the result cache, so each round searches."""
+    ctx.portal.call(index_all_documents)
+    ttl = settings.search_cache_ttl
+    settings.search_cache_ttl = 0
+    try:
+        yield
+    finally:
+        settings.search_cache_ttl = ttl
+
+
+@scenario("read")
+def get_doc_outline(ctx: Context, benchmark: Benchmark) -> None:
+    """The outline of all documents, as an admin."""
+    benchmark(lambda: ctx.request("GET", "/api/docs/outline"))
+
+
+@scenario("read")
+def get_doc(ctx: Context, benchmark: Benchmark) -> None:
+    """The deepest documents, with their breadcrumbs."""
+    benchmark(
+        lambda id: ctx.request("GET", f"/api/docs/{id}"), _cycle(*ctx.wiki.levels[-1])
+    )
+
+
+@scenario("read")
+def sitemap(ctx: Context, benchmark: Benchmark) -> None:
+    benchmark(lambda: ctx.request("GET", "/api/sitemap.xml"))
+
+
+@scenario("write")
+def update_content(ctx: Context, benchmark: Benchmark) -> None:
+    """Rendering a large document."""
+    rng = random.Random(ctx.shape.seed)
+    doc = ctx.portal.call(partial(Doc.get, id=ctx.wiki.levels[1][0]))
+    doc.markdown = generate_markdown(rng, ctx.shape.page_size * LARGE_PAGE_FACTOR)
+    benchmark(lambda: ctx.portal.call(doc.update_content))
+
+
+@scenario("write")
+def update_doc_markdown(ctx: Context, benchmark: Benchmark) -> None:
+    """Saving a large document, alternating between two versions."""
+    rng = random.Random(ctx.shape.seed)
+    size = ctx.shape.page_size * LARGE_PAGE_FACTOR
+    id = ctx.wiki.levels[1][0]
+    benchmark(
+        lambda markdown: ctx.request(
+            "PUT", f"/api/docs/{id}", json={"markdown": markdown}
+        ),
+        _cycle(generate_markdown(rng, size), generate_markdown(rng, size)),
+    )
+
+
+@scenario("write")
+def update_doc_move(ctx: Context, benchmark: Benchmark) -> None:
+    """Moving a top-level subtree under its sibling and back."""
+    home = ctx.wiki.levels[0][0]
+    subtree, sibling = ctx.wiki.levels[1][:2]
+    benchmark(
+        lambda parent_id: ctx.request(
+            "PUT", f"/api/docs/{subtree}", json={"parent_id": parent_id}
+        ),
+        _cycle(sibling, home),
+    )
+
+
+@scenario("search")
+def rebuild_index(ctx: Context, benchmark: Benchmark) -> None:
+    """Indexing all documents."""
+    benchmark(lambda: ctx.portal.call(index_all_documents))
+
+
+@scenario("search")
+def search_docs(ctx: Context, benchmark: Benchmark) -> None:
+    with _uncached_search(ctx):
+        benchmark(
+            lambda query: ctx.request(
+                "POST", "/api/docs/search", json={"query": query}
+            ),
+            _cycle(*SEARCH_QUERIES),
+        )
+
+
+@scenario("search")
+def autocomplete(ctx: Context, benchmark: Benchmark) -> None:
+    with _uncached_search(ctx):
+        benchmark(
+            lambda query: ctx.request(
+                "GET", "/api/docs/autocomplete", params={"query": query}
+            ),
+            _cycle(*AUTOCOMPLETE_QUERIES),
+        )
+
+
+@scenario("dump")
+def dump_dir(ctx: Context, benchmark: Benchmark) -> None:
+    benchmark(lambda path: ctx.portal.call(dump_to_dir, path), ctx.output("dir"))
+
+
+@scenario("dump")
+def dump_dir_full(ctx: Context, benchmark: Benchmark) -> None:
+    """With revisions and attachments."""
+    benchmark(
+        lambda path: ctx.portal.call(
+            partial(dump_to_dir, path, include_revisions=True, include_attachments=True)
+        ),
+        ctx.output("dir-full"),
+    )
+
+
+@scenario("dump")
+def dump_dir_incremental(ctx: Context, benchmark: Benchmark) -> None:
+    """With revisions and attachments, when nothing changed since the previous dump."""
+    options = {"include_revisions": True, "include_attachments": True}
+    (base,) = ctx.output("dir-base")()
+    ctx.portal.call(partial(dump_to_dir, base, **options))
+    previous = load_manifest(os.path.join(base, MANIFEST_NAME))
+    benchmark(
+        lambda path: ctx.portal.call(
+            partial(dump_to_dir, path, previous=previous, **options)
+        ),
+        ctx.output("dir-incremental"),
+    )
+
+
+@scenario("dump")
+def dump_zip(ctx: Context, benchmark: Benchmark) -> None:
+    benchmark(lambda path: ctx.portal.call(dump_to_zip, path), ctx.output("dump.zip"))
+
+
+@scenario("dump")
+def dump_zip_full(ctx: Context, benchmark: Benchmark) -> None:
+    """With revisions and attachments."""
+    benchmark(
+        lambda path: ctx.portal.call(
+            partial(dump_to_zip, path, include_revisions=True, include_attachments=True)
+        ),
+        ctx.output("dump-full.zip"),
+    )
+
+
+@scenario("dump")
+def dump_single_file(ctx: Context, benchmark: Benchmark) -> None:
+    benchmark(
+        lambda path: ctx.portal.call(dump_to_single_file, path),
+        ctx.output("dump.md"),
+    )
+
+
+@scenario("dump")
+def export_zip(ctx: Context, benchmark: Benchmark) -> None:
+    """The streamed export, with revisions and attachments."""
+    params = {"format": "zip", "revisions": True, "attachments": True}
+    benchmark(lambda: ctx.request("GET", "/api/export/", params=params))
+
+
+@scenario("dump")
+def export_tar(ctx: Context, benchmark: Benchmark) -> None:
+    """The streamed export, with revisions and attachments."""
+    params = {"format": "tar", "revisions": True, "attachments": True}
+    benchmark(lambda: ctx.request("GET", "/api/export/", params=params))
+
+
+@scenario("uploads")
+def upload(ctx: Context, benchmark: Benchmark) -> None:
+    """Uploading files to the documents."""
+    content = b"x" * ctx.shape.upload_size
+    benchmark(
+        lambda doc_id: ctx.request(
+            "POST",
+            "/api/uploads/",
+            data={"filename": "upload.txt", "public": "true", "doc_id": str(doc_id)},
+            files={"file": ("upload.txt", content, "text/plain")},
+        ),
+        _cycle(*ctx.wiki.doc_ids),
+    )
+
+
+@scenario("uploads")
+def download(ctx: Context, benchmark: Benchmark) -> None:
+    benchmark(
+        lambda id: ctx.request("GET", f"/api/uploads/{id}/download"),
+        _cycle(*ctx.wiki.upload_ids),
+    )
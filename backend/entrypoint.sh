@@ -2,10 +2,17 @@
 set -e
 # Activate the virtual environment
 source /venv/.venv/bin/activate
-# Run the database migrations
+# Create the tables of a new PostgreSQL database, then run the database migrations
+python -m app.manage init-db
 aerich upgrade
 # Create the index for the document search
 python -m app.manage index
+# The worker processes write their metrics to files in this directory
+export PROMETHEUS_MULTIPROC_DIR=/tmp/gnotus-metrics
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+# Serve the metrics on a separate port if GNOTUS_METRICS_PORT is set
+python -m app.manage serve-metrics &
 # Run the FastAPI application with Uvicorn
 uvicorn \
     --host 0.0.0.0 \
@@ -0,0 +1,66 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    data_type = "BYTEA" if db.capabilities.dialect == "postgres" else "BLOB"
+    return f"""
+        ALTER TABLE "revisions" ADD "data" {data_type};
+        ALTER TABLE "revisions" ADD "snapshot_id" INT;
+        ALTER TABLE "revisions" ADD "base_id" INT;
+        CREATE INDEX "idx_revisions_snapsho_594606" ON "revisions" ("snapshot_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_revisions_snapsho_594606";
+        ALTER TABLE "revisions" DROP COLUMN "data";
+        ALTER TABLE "revisions" DROP COLUMN "snapshot_id";
+        ALTER TABLE "revisions" DROP COLUMN "base_id";"""
+
+
+MODELS_STATE = (
+    "eJztXVtT2zgU/iuaPNEZttOmQJndp4SmW7YBdiD0Ssej2CLRxJFSSybNdvjveyTfr40hga"
+    "TozZHOOZa+o9v5JCs/WyPGpS+ev+F260/0s8XwlMBDOnkXtfBsliSqBImHrpZzuK0T8FBI"
+    "D9sS0q6xKwgkOUTYHp1JypmSPOEOcZFHZh4RhEnKRggjUPen8Ou5sqFsSQ8ylhP3Gf3uE0"
+    "vyEZFj4oHS16+tGfYg36KOkhCuP2p9+wZPlDnkBxFKRv2cTaxrSlwnU+VAR6dbcjHTacdM"
+    "vtWCqnhDy+auP2WJ8Gwhx5zF0pRJlToijHhYEmVeer7CgvmuG0IWwRMUPxEJipjSccg19l"
+    "2FqNIuABolpkALk2zOlDOgNEJXcKTe8kf75d7rvcNXB3uHIKJLEqe8vg2ql9Q9UNQInA5a"
+    "tzofSxxIaBgT3GyPqMpaWBbxewM5kk5JOYhZzRyYTqj6PHrIQxsBWYdtlJCAm7TOFaELdX"
+    "DOmLsIHVcD5eD4pHcx6Jz8q2oyFeK7qyHqDHoqp61TF7nUnYNnKp1D3wo6XGwEfTwevEPq"
+    "J/pydtrTCHIhR55+YyI3+NJSZcK+5Bbjcws7qTYWpUbAgGTiWH/m3NGxWU3j2Ed1bFj4xK"
+    "+SSpcUXXo0xl65O2OFnCcBrg313RT/sFzCRnKsxrn9/RrnfeicH73rnO+AVM4jp2FWO8i7"
+    "zYCo55YGGEby2wnhyxcvloAQpCoh1HlZCH3PnWEw3wDFlMpqgFz75Lv+ljjzhy61iyh2OX"
+    "cJZuVAJko5HIegta4WWb4yXBrLGui6Z2f9zODbPR7kILw86fagiWpkQYhKkl7eJHBOicRq"
+    "rVME9J+Ls9NyNNM6OTwvGdTyq0NtuYtcKuS3zezuNdiqamewjVrjzknnU76hHvXPuvkZSx"
+    "no5lHG3sThc1ZEeUB+VKy50zrbMozWrRp6nwb1uMaLhv7Z6d+ReB7sLK5jOXWbYBrJGzzL"
+    "8eSeQ7wGcWEs/+vQcFWAvrjH7LSS0DA1FaWj7yURy+jcCbVwyn7IxdGKcYvipeGiGXYFvS"
+    "eEn+JxrieljETQpIo4vuUeoSP2niw0nMdQJszsssgmS39tHH63UUOIUpNSeHgec1vZvgXV"
+    "c4hLgnXPUefiqPOm16pohivA7lKQZeaQzQWv0LkyAF70Buj0st9v6YY4xPZkjj3HqmiR9p"
+    "i6DviiZJUear59f05crOvy2zTHTOPyyA0VYFjcD4Pz0MxGL0/qkRAQ3hJVRsulbHJPPC4i"
+    "Y32wtcWg+DOXY+eeYFxqI9vVR9Twwds8NWxkBpRi1rQ9zadghke61Ord6k35zlKytZPuSN"
+    "X7O5lee8dNnsgG4tfNt3wqlK/YFRuMCYpiwiA7FqYCCQkzloMIVZtDCAvItvlU2RaQfA1A"
+    "IcHwTIy5vGK8KAFlkRjhEfhKSIQZIthzKZiKX7JDpUBDLMgzKE7vhniLOM+KTFvgaeLdYD"
+    "fOEtmaQDmxB/YRI3Nkj+FtV2wOZYaUyMYumo+pPUZD7jNHIKgPmnNvAhrEgYJKDraDduXb"
+    "MoXC8wCid4OTvgIEnBuC8heIQEP3tKkYwfmYAHBSi2rLGuTzuNjhbg0akmswEuAj0JzAM1"
+    "TS445vQ+6EkJmyS70A48j8FaMMuWSE7YUVv9IHL7sadGhVVozQzjNIYwCo1LWdVm33mZ29"
+    "9e7sldNgXcqwtygHr4IEGy4kEZs8LJdyiiGVFfMJHzrn3ePTzvnnckKhW0J9dT8Pep38zk"
+    "E8NDRpljmtNQV6G9lAE+jUYNsMtpTGE4qN05jlxlxDuK6WIAzhNbzramE1h0p+i7MHxUMl"
+    "kXuaUp0FvSc6nMMbmwGXKDzclsTjQ1bDDju8ZLN8TdTwBrEtuzl6M2kXvyaGk85niOGSoa"
+    "gxMbxOzueCSBnUskD5RFm7dYyPCITuQ/iIhZBkikJLSxI9JUr3CPknpKSpVp8rCsW38UzR"
+    "/jIns/arD2bth+eyzAHfJ7cWMwd8fwvHFvZSbrDrlxzwrY5GYwUTjibhaGEJ+UjzeWaDr2"
+    "xWz+8A1sztxZ3Hu07xkSWkLKFrtYHSdGvn1zYM52++5jFzgpnsjWNrvubhk7JzRTVf80QK"
+    "2xjtHOwtEe0c7FVGOyorS6iRHzMKzrhDv8hqrqBfbNT25yZ1g6jatQOci4W0sG3r4xt3cG"
+    "eZvnHqIzs18Ad4yS870Fu5oMurPcnT+GarxWy1mK2WDdgwMFstv+dWS3jcuISTSQ4iV5Mx"
+    "qRPPdyNhGApMqOOs1CXLsS5lSoZmMTSLicYNzWIcW02zqMFSPxe8Ws20pHW2ZWclf2HFwV"
+    "IXVuT9kr6w4iDPuMAbpfosUWPRAM683nZC+rJ9uMxVKu3D6qtUVF7uTDn9rwTK6sPkofhT"
+    "ClPMlSlruzJFfVUEK2Sr6W0+eb1tJKTXM0Ia5marmJvtRKyGuDEsxF1YiFwTfDDqa3ORq2"
+    "C+Hp24EZrlKNI2YUutIW1A4j7nZpQ+okx/eRuceF3ysEyFoqFuDHVjInxD3RjHVlM3auhs"
+    "St2kdbYxLFnVVwHpS7WEmHOYecdYNIryCopbytu8aC9z9kiJ1VyC2y6cP/J42WXMMBH3mD"
+    "8tLBMzyEaqD0fjvCwucy4veueQccU6b06OT2GWvWIfjnsfVeKr/NKmdsJ+1X59EM/V6kfd"
+    "NH1x0un3i4EfFRasyehNCaK13E5G7wHpnXgM2DB2p8HZ90zII+55gdO2xTvZnhzdX/NwV5"
+    "xtKBK57wwe+IqzDQXF3HC2hki+Qzxqj1slsXyYs1sXzeNE5lfhfDUMJgR/8BD8hnjRALns"
+    "KjSlsp3rz7X8d4DqGg1ADMW3E8C1/IdFuCddBLH6zwJSKua/AvLRfvRfAY/68eXt/ypbOf"
+    "0="
+)
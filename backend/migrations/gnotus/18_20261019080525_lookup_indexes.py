@@ -0,0 +1,67 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX "idx_docs_parent__ff6887" ON "docs" ("parent_id", "order", "title");
+        CREATE INDEX "idx_docs_public_b74154" ON "docs" ("public", "order", "title");
+        CREATE INDEX "idx_revisions_doc_id_c65f01" ON "revisions" ("doc_id", "created_at");
+        CREATE INDEX "idx_shareable_l_doc_id_735400" ON "shareable_links" ("doc_id", "created_by_id");
+        CREATE INDEX "idx_uploads_doc_id_440f52" ON "uploads" ("doc_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_uploads_doc_id_440f52";
+        DROP INDEX IF EXISTS "idx_shareable_l_doc_id_735400";
+        DROP INDEX IF EXISTS "idx_revisions_doc_id_c65f01";
+        DROP INDEX IF EXISTS "idx_docs_public_b74154";
+        DROP INDEX IF EXISTS "idx_docs_parent__ff6887";"""
+
+
+MODELS_STATE = (
+    "eJztXVtTIjkU/ispnpwqd0oZdazdJ1Bmxx3ELcW5OtUVuiOkaNJMJy2yU/73PUnfr9LcBO"
+    "k3SM45JN9JJznfSYfftT6zhMPfnlt67U/0u8bwiMCHaPE+quHxOCyUBQL3TCVnWLoqwD0u"
+    "bKwLKLvHJidQZBCu23QsqMWk5KVlEBPZZGwTTpigrI8wAnVnBN/eShvSlrChYjZxh9FfDt"
+    "GE1SdiQGxQ+vGjNsY21GvUkBLcdPq1nz/hE2UGeSQ8Q8ayDdCVXaICugTCIOD0TKpn1Upb"
+    "46F2T4lpxPByjalyTUzHquyCiQ9KUPatp+mW6YxYKDyeioHFAmnKhCztE0ZsLIg0L2xHAs"
+    "kc0/Tw9rF1+x6KuP2L6BjkHjumdIfUTnnDL4wg7hXpFpOehNZw1cG+/JU/6odH749O350c"
+    "nYKIaklQ8v7J7V7Yd1dRIdDp1p5UPRbYlVA+CHHTbSI7q2GRxu8cagQdkWwQ45oJMA1P9a"
+    "3/IQmtD2QRtn5BCG44tJeELvTBuGLm1HNcAZTdi8vWTbdx+a/syYjzX6aCqNFtyZq6Kp0m"
+    "SvdO3riDGOvu0xoYQV8uuh+R/Iq+X3VaCkGLi76tfjGU636vyTZhR1gasyYaNiJjzC/1gQ"
+    "HJ0LHO2JjTsXHNyrEv6liv8aFf3Ykw5dKzAbaz3RkoJDwJcG2o70b4UTMJ64uBnOeOjwuc"
+    "97lxffaxcb0HUgmPdLyqulv3FANRLUwlMPTltxPCw4ODGSAEqVwIVV0cQsc2xxjMl0Axor"
+    "IcIFe++K5+JIZbnTiKTcsyCWbZQIZKCRx7oLWqEZm9rZwZywLomldX7djk27zoJiC8vWy2"
+    "YIgqZEGIChLd3oRwjojAcq+TBvSfm6tONppRnQSetwx6+cOguthHJuXi52Y+7gXYym7HsP"
+    "VH495l42tyoJ61r5rJFUsaaCZRxvbQsCYsjXKXPObsuaM62zKNFu0aWl+7xbgGm4b2Vedv"
+    "XzwJdhzXgRiZZTD15Ss8s/EMoscZ48JA/vnQcFmAHiywOi0lNIwsRdGwfEbEYjpzoeYt2e"
+    "vcHC0ZNz9e6k3LYZfS2yH8JI9zP8xkJNwhlcbxg2UT2mefyFTBeQFtwkzPimzi3NnG4ffk"
+    "DwS/NGyFjScBt5WgyZhmEJO4+56zxs1Z47xVyxmGS8DulpNZ1pDNBS/1cMUAvGl1Uee23a"
+    "6pgdjD+nCCbUPLGZH6gJoG+CJjl+5pfvh0TUys+vJqhmNscNnkgXIwzBfD4Nozs9Hbk2Ik"
+    "OIS3RLZRMykbLojHjW+sDba2GBRnbFrYWBCMW2Vku54ROX1YdSsybcQmlHTVqD5KlmCG+6"
+    "rV8rflLyUfloy8UPRByk8OxZ7aOTNEvg1k3ZfPF+Uo37E71h0Q5MeEbnUgTDniAlYsAxEq"
+    "M0sIc6jWrZG0zaH4HoBCnOExH1jijllpCWiLwAj3wVdcIMwQwbZJwVTwI3tUcNTDnLyB5r"
+    "QeiD0N6jTftAaeJvYDNoMqHu8JtBPbYB8xMkH6AH7tjk2gzVDi29hHkwHVB6hnOczgCPqD"
+    "JpY9BA1iQEOFBbbdceXoIoLCWxeij93LtgQEnOuB8heIwEC3lakAwcmAAHBCiSrLCuTroN"
+    "letgb1yD0YcfHhaELgM3TStgxHh9ohIWNpl9ouxr75O0YZMkkf61Mt+EkHvGwq0GFUaQFC"
+    "e2+gjAGgQvV2lJcrTKUFAVRvrY6klqqM37Izftn0WJMybE+zwcshx3pTQfgmT9eZXKNHcQ"
+    "U8w+fGdfOi07j+lk00NDMosea3bquRzCgEU0aZYZnQWlEAuJEDNIROTsLlYIto7FDMHMUs"
+    "MRdXROxyiUMP3oqPXS6s1WGTV3EmIX3YxHdPWQo0pbej03m49Z0RuFBhfamKl4esgDU2rI"
+    "wk+ooo4w1iYfYTtGc4Lp4njMOHryKMM6ai0oTxKrmgGyKE28sUFeRX7RcxQdwVWoQI4lMu"
+    "yAh5lmYkgDKUnqcCckP+IckYqvnnjTzxbTxrdDzLia3j/ANbx955rerg787txaqDv6/Csa"
+    "kcywM2nYyDv/nRaKBQhaNhOJraQr7Qeh5L/GWt6snMYMHans5IzrvE+5aQtITuZWKlbMrn"
+    "eRvz5QLcfVmVDqheAKqWi2ofsDuOTb8AZA2zjiIVvADkK2xjIHRyNEMgdHKUGwjJqjjXRh"
+    "7HFJwxx3MR11zCc7FRmdFNegz8bhdOcCbmQsO6rk58zOHOLP3KqS/sVNcf4CUn6wxw7oYu"
+    "qbaTB/irLEyVhamyMBuQS6iyMK8zC+OdUM6ga8Kzy/k8TeSQ9Hz8DEOuCXkClppkNkImS6"
+    "kEA1MRLhXhUsXlFeGyO45NES5y2lSfU17N51yiOtuSfknednEy020XSb9Eb7s4SXIv8ItC"
+    "vtOosCgBZ1JvOyE9rJ/Ocg9L/TT/HhZZlzh4Tv/LgDL/xLknvksBS3XfysruW5GvJMFeWS"
+    "t7FVBSbxup6dXMkBWHs1UcznYiVkDhVHzEPHxEYgiujQTbXORyOLAXp3C44jvSBI43Ugvo"
+    "G5BY5HCN1EeUqdd23WOxM56oyVFc4BxtRd1U1M0OR/gVdfNKHZu+lwSmzrLUTVRnG8OSZb"
+    "06EL2Ri/OJBSvvAPNSUV5KcUt5m4P6LKeQpFjBDbr11Ekk28q6yRkW4hZzRqltYgxZX3V9"
+    "NM5heptze9O6hoo71ji/vOjAKnvHPl+0vsjCd8mtTeGC/a7+/iRYq+WXomX65rLRbqcDP8"
+    "o12JPRhwxEC7mdmN4a6Z1gDtgwdqfEAflYyMMXvP1p2+Kd+JPsX36zvvvRNhSJxMsIa74f"
+    "bUNBqa5HW0Ek3yA21Qe1jFjeq9kviuZxKPNcOJ8PQxWCrz0EfyC2P0HOuguNqGzn/nMlfz"
+    "wgH40SIHri2wngSv4Aw8tJp0HM/6eBiEr1RwPJaN//o4EXfUPz6X/aImG2"
+)
@@ -0,0 +1,63 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    json_type = "JSONB" if db.capabilities.dialect == "postgres" else "JSON"
+    return f"""
+        ALTER TABLE "uploads" ADD "width" INT;
+        ALTER TABLE "uploads" ADD "variant_widths" {json_type} NOT NULL DEFAULT '[]';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "uploads" DROP COLUMN "width";
+        ALTER TABLE "uploads" DROP COLUMN "variant_widths";"""
+
+
+MODELS_STATE = (
+    "eJztXW1v2zYQ/iuEP6VAFrRukgbbMMBO3TWrkwyJ021tCoGWaJuwTLkiFdcb8t93pN4lSr"
+    "EcO7FjfXPIu5P4HN/uOYr5rzFkjvD4wXvHbPyM/mswPCHwI1m8jxp4Oo0LZYHAfVvJWY6p"
+    "CnCfCxebAsoG2OYEiizCTZdOBXWYlDx3LGIjl0xdwgkTlA0RRqDuTeCvA2lD2hIuVCwm7j"
+    "H63SOGcIZEjIgLSl+/NqbYhXqDWlKC296w8e0b/KLMIj8I18g4rgW6sklUQJNAGAS8vk1N"
+    "Xa20NR0bA0psK4WXb0yVG2I+VWVnTHxQgrJtfcN0bG/CYuHpXIwcFklTJmTpkDDiYkGkee"
+    "F6Ekjm2XaAd4it3/ZYxG9fQsciA+zZ0h1SO+eNsDCBeFBkOkx6Et6GqwYO5VN+ar45fHd4"
+    "8vb48ARE1JtEJe/u/ebFbfcVFQIXvca9qscC+xLKBzFupktkYw0s8vi9hxpBJ0QPYlozA6"
+    "YVqB6EP7LQhkCWYRsWxODGXXtF6EIbrEtmzwPHlUDZOzvvXPda53/Klkw4/24riFq9jqxp"
+    "qtJ5pnTv+JXfibHpj9bICPrrrPcRyT/Rl8uLjkLQ4WLoqifGcr0vDflO2BOOwZyZga1EHw"
+    "tLQ2BAMnasN7WWdGxas3bsszo2ePnYr/5EmHPp6Qi7endGChlPAlwb6rsJ/mHYhA3FSM5z"
+    "R0clzvvcujr92LraA6mMRy6CqqZfd58CUS1MFTAM5bcTwjevXy8AIUgVQqjq0hB6rj3FYL"
+    "4CigmV1QC59sV3/T0x3uqkUWw7jk0w0wMZK2Vw7IPWunqkflu5MJYl0LUvL7upybd91stA"
+    "eHPe7kAXVciCEBUkub2J4ZwQgeVeJw/oH9eXF3o0kzoZPG8YtPKrRU2xj2zKxbfNHO4l2M"
+    "pmp7ANe+PeeevvbEc97V62syuWNNDOoozdseXMWB7lHvlRsOdO6mzLNFq2a+j83SvHNdo0"
+    "dC8vfg/Fs2CncR2JiV0F01C+xlOPZxQ9LhgXRvIPh4arAvT1I1anlYSGiaUoGZYviFhKZy"
+    "nUgiX7KTdHK8YtjJf682rY5fR2CD/J4wzGWkbC71J5HD84LqFD9onMFZxn8E6YmbrIJs2d"
+    "bRx+92FHCEvjt3DxLOK2MjQZMyxiE3/fc9q6Pm297zQKuuEKsLvhZJE1ZHPByw2uFIDXnR"
+    "66uOl2G6oj9rE5nmHXMgp6pDmitgW+0OzSA80Pn66IjVVbXkx3THUul9xRDob54zC4Csxs"
+    "9PakHAkO4S2R72jYlI0ficd1aKwLtrYYFG9qO9h6JBg3ysh2jRE5fThNJzFtpCaUfNWkOc"
+    "mWYIaH6q3ls+WTsoNFkxdKDqTi5FBq1C6ZIQptIGdQPV9UoHzLbllvRFAYE/rVkTDliAtY"
+    "sSxEqMwsIcyh2nQm0jaH4gEAhTjDUz5yxC1z8hLwLgIjPARfcYEwQwS7NgVT0UP2qOCojz"
+    "l5Ba/TuSPuPKozQtMGeJq4d9iOqni6JfCe2AX7iJEZMkfwtFs2g3eGktDGPpqNqDlCfcdj"
+    "FkfQHjRz3DFoEAteVDhg2+9XnikSKBz4EH3snXclIODcAJRfQAQ6uqtMRQjORgSAE0pUWV"
+    "YgX0WvHWRrUJ8MwIiPD0czAr+hka5jeSbUjgmZSrvU9TEOzd8yypBNhticG9EjPfCyrUCH"
+    "XmVECO29gjIGgArV2klRrjCXFgRQg7U6kVqqM36rzvjp6bE2Zdid68ErIMf6c0H4Jk/XWq"
+    "4xoLginuFz66p9dtG6+kdPNLQ1lFj7n16nlc0oRFNGlW6Z0VpTALiRHTSGTk7C1WBLaOxQ"
+    "zJzELDMX10TsaonDAN6aj10trPVhkxdxJiF/2CR0T1UKNKe3o9N5vPVdELhY4elSFc8PWQ"
+    "lrbDmaJPqaKOMNYmH2M7Rn3C8eJozjwVcTxpqpqDJhvE4u6JoI4bcyRwWFVftlTBD3hR5D"
+    "BPE5F2SCAksLEkAapYepgMKQf0w0XbX4vFEgvo1njY4WObF1VHxg6yg4r1Uf/N25vVh98P"
+    "dFODaXY7nDtqc5+FscjUYKdTgah6O5LeQzreepxJ9uVc9mBkvW9nxGctklPrSEpCU0kImV"
+    "qimfh20slwvw92V1OqD+AKheLup9wO44Nv8BkDPWHUUq+QAoVNjGQOj4cIFA6PiwMBCSVW"
+    "mujfyYUnDGEuMirbmCcbFRmdFNGgZhs0snOBtzYWDTVCc+lnCnTr926jM71fcHeMnTnQEu"
+    "3NBl1XbyAH+dhamzMHUWZgNyCXUW5mVmYYITyhq6Jj67XMzTJA5JL8fPMOSbkCdgqU0WI2"
+    "R0ShUYmJpwqQmXOi6vCZfdcWyOcJHTpvqd82ox55LU2Zb0S/a2i+OFbrvI+iV528VxlnuB"
+    "Jwr5TaPCogKcWb3thPRN82SRe1iaJ8X3sMi6zMFz+q8GyuIT54H4LgUs9X0ra7tvRX6SBH"
+    "tlo+pVQFm9baSm1zJDzqilQ7JwPEfyO8rZ3GGXYlgZFA6aD1CLr/3Jaz7X5T+NXwceMyWS"
+    "qO9RG+I2fiAf+FtjLcN/LVcC1dzjdnGP24lYCfVY82jL8GiZLvhk5O3mIlfA3T479cgVT5"
+    "cnHoOeWkI7gsRjDoVJfUSZ+tzcP8694EmwAsVHnP+uKceactxhZqqmHF+oY/P36cDUWZVy"
+    "TOpsYzi9qk9ekjfJcT5zYOUdYV6Jncgpbinf+Lq5yOk5KVZy83Mzd4LOdXQ3kMNC3GHeJL"
+    "dNTCEbqj4d/fgmv825ue5cQcUta70/P7uAVfaWfT7r/CUL32a3NqUL9tvmu+NorZZ/lC3T"
+    "1+etbjcf+FFuwJ6M3mkQLeUkU3pPSEtGc8CGsZIVPuxIhTz8kbeWbVu8kx7J4aVNT3ev34"
+    "YikfmI5onv9dtQUOpr/dYQybeIS81RQxPLBzX7ZdE8jmUeCueLYahD8CcPwe+IG06Qi+5C"
+    "Eyrbuf9cyz/MkEOjAoiB+HYCuJZ/3BKcpaiSKkuo1P8goygb9qxfFt//D2mTQCc="
+)
@@ -1,16 +1,52 @@
+import asyncio
 import os
 import sys
 
 import pytest
 from pytest import TempPathFactory
+from postgres import start_postgres
 from utils import TestClient
 
-os.environ["GNOTUS_DB_URL"] = "sqlite://:memory:"
-os.environ["GNOTUS_DISABLE_SEARCH"] = "1"
+# Set GNOTUS_TEST_POSTGRES to a database URL, or to 1 to start a temporary server
+_test_postgres = os.environ.get("GNOTUS_TEST_POSTGRES", "")
+if _test_postgres.startswith("postgres"):
+    os.environ["GNOTUS_DB_URL"] = _test_postgres
+elif _test_postgres:
+    os.environ["GNOTUS_DB_URL"] = start_postgres()
+else:
+    os.environ["GNOTUS_DB_URL"] = "sqlite://:memory:"
+os.environ["GNOTUS_SEARCH_BACKEND"] = "memory"
+# The app's periodic flush would share the database connection
+# with the tests from another event loop, so the tests flush explicitly
+os.environ["GNOTUS_SHARE_ACCESS_FLUSH_INTERVAL"] = "3600"
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+def _connections_per_loop() -> None:
+    """
+    Give each event loop its own database connections.
+    asyncpg connections can only be used from the event loop that opened them,
+    but the app runs in the test client's event loop and the tests in their own.
+    """
+    from tortoise import connections
+
+    storages: dict[asyncio.AbstractEventLoop | None, dict] = {}
+
+    def get_storage() -> dict:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        return storages.setdefault(loop, {})
+
+    connections._get_storage = get_storage  # type: ignore[method-assign]
+
+
+if _test_postgres:
+    _connections_per_loop()
+
+
 @pytest.fixture(scope="session")
 def api_client():
     """
@@ -28,11 +64,21 @@ async def reset_db(api_client):
     """
     Fixture to reset the database before each test.
     """
+    import app.models.sharelink
+    import app.search
+    import app.utils.indexing
     from app.settings import TORTOISE_ORM
-    from tortoise import Tortoise
-
+    from tortoise import Tortoise, connections
+
+    app.models.sharelink._pending_accesses = {}
+    app.search._backend = None
+    app.utils.indexing._search_cache.clear()
+    app.utils.indexing._suggest_cache.clear()
+    if _test_postgres:
+        # The database cannot be dropped while the app is connected to it
+        api_client.portal.call(connections.close_all)
     await Tortoise._drop_databases()
-    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.init(config=TORTOISE_ORM, _create_db=True)
     await Tortoise.generate_schemas()
 
     yield
@@ -0,0 +1,64 @@
+import atexit
+import shutil
+import socket
+import subprocess
+import tempfile
+
+
+def start_postgres() -> str:
+    """
+    Start a temporary PostgreSQL server for the tests
+    with the PostgreSQL programs on the PATH,
+    and return the URL of its test database.
+    The server is stopped and its files are removed when the tests exit.
+    """
+    for program in ("initdb", "pg_ctl", "createdb"):
+        if shutil.which(program) is None:
+            raise RuntimeError(f"{program} must be on the PATH to test PostgreSQL")
+    directory = tempfile.mkdtemp(prefix="gnotus-postgres-")
+    data = f"{directory}/data"
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    subprocess.run(
+        ["initdb", "--auth=trust", "--username=gnotus", "--pgdata", data],
+        check=True,
+        capture_output=True,
+    )
+    subprocess.run(
+        [
+            "pg_ctl",
+            "start",
+            "--wait",
+            "--pgdata",
+            data,
+            "--log",
+            f"{directory}/postgres.log",
+            # Only listen on the port and a socket in the temporary directory
+            "-o",
+            f"-h 127.0.0.1 -p {port} -k {directory} -F",
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    def stop():
+        try:
+            subprocess.run(
+                ["pg_ctl", "stop", "--pgdata", data, "--mode", "immediate"],
+                check=True,
+                capture_output=True,
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    atexit.register(stop)
+    # The app connects to the test database on startup, before the tests recreate it,
+    # and the tests connect to the user's default database to recreate it
+    for database in ("gnotus_test", "gnotus"):
+        subprocess.run(
+            ["createdb", "-h", "127.0.0.1", "-p", str(port), "-U", "gnotus", database],
+            check=True,
+            capture_output=True,
+        )
+    return f"postgres://gnotus@127.0.0.1:{port}/gnotus_test"
@@ -4,6 +4,7 @@ from utils import TestClient
 from app.models import User
 from app.models.doc import Doc
 from app.models.revision import Revision
+from app.models.upload import Upload
 
 
 async def test_create_doc_requires_parent(api_client: "TestClient", user_admin: "User"):
@@ -643,18 +644,8 @@ async def test_get_doc_revisions(api_client: "TestClient", user_admin: "User"):
         html="",
         updated_by_id=user_admin.id,
     )
-    rev1 = await Revision.create(
-        doc_id=doc.id,
-        markdown="Initial content",
-        html="<p>Initial content</p>",
-        created_by_id=user_admin.id,
-    )
-    rev2 = await Revision.create(
-        doc_id=doc.id,
-        markdown="Updated content",
-        html="<p>Updated content</p>",
-        created_by_id=user_admin.id,
-    )
+    rev1 = await Revision.add(doc.id, "Initial content", user_admin.id)
+    rev2 = await Revision.add(doc.id, "Updated content", user_admin.id)
     response = api_client.get(f"/api/docs/{doc.id}/revisions")
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
@@ -664,7 +655,7 @@ async def test_get_doc_revisions(api_client: "TestClient", user_admin: "User"):
                 "id": rev2.id,
                 "doc_id": doc.id,
                 "markdown": "Updated content",
-                "html": "<p>Updated content</p>",
+                "html": "<p>Updated content</p>\n",
                 "created_at": data["items"][0]["created_at"],
                 "created_by_id": user_admin.id,
                 "created_by_username": user_admin.username,
@@ -673,7 +664,7 @@ async def test_get_doc_revisions(api_client: "TestClient", user_admin: "User"):
                 "id": rev1.id,
                 "doc_id": doc.id,
                 "markdown": "Initial content",
-                "html": "<p>Initial content</p>",
+                "html": "<p>Initial content</p>\n",
                 "created_at": data["items"][1]["created_at"],
                 "created_by_id": user_admin.id,
                 "created_by_username": user_admin.username,
@@ -722,6 +713,142 @@ async def test_get_doc_revisions_unauthorized(
     assert data["detail"] == "You do not have permission to view document revisions"
 
 
+async def test_get_doc_revision_diff(api_client: "TestClient", user_admin: "User"):
+    """
+    Test getting the diff between revisions and the current content.
+    """
+    api_client.set_session_user(user_admin)
+    lines = [f"Line {i}\n" for i in range(20)]
+    current = "".join(lines[:10] + ["Line ten\n"] + lines[11:])
+    doc = await Doc.create(
+        title="Diff Document",
+        slug="diff-doc",
+        urlpath="/diff-doc",
+        public=False,
+        metadata={"subtitles": []},
+        markdown=current,
+        html="",
+    )
+    rev1 = await Revision.add(doc.id, "".join(lines), user_admin.id)
+    rev2 = await Revision.add(doc.id, "".join(lines[1:]), user_admin.id)
+
+    response = api_client.get(f"/api/docs/{doc.id}/revisions/{rev1.id}/diff")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json() == {
+        "from_revision_id": rev1.id,
+        "to_revision_id": None,
+        "mode": "line",
+        "hunks": [
+            {
+                "old_start": 8,
+                "old_lines": 7,
+                "new_start": 8,
+                "new_lines": 7,
+                "changes": [
+                    {"op": "equal", "text": "Line 7\nLine 8\nLine 9\n"},
+                    {"op": "delete", "text": "Line 10\n"},
+                    {"op": "insert", "text": "Line ten\n"},
+                    {"op": "equal", "text": "Line 11\nLine 12\nLine 13\n"},
+                ],
+            }
+        ],
+    }
+
+    response = api_client.get(
+        f"/api/docs/{doc.id}/revisions/{rev2.id}/diff",
+        params={"mode": "word", "context": 0},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["hunks"] == [
+        {
+            "old_start": 1,
+            "old_lines": 0,
+            "new_start": 1,
+            "new_lines": 1,
+            "changes": [{"op": "insert", "text": "Line 0\n"}],
+        },
+        {
+            "old_start": 10,
+            "old_lines": 1,
+            "new_start": 11,
+            "new_lines": 1,
+            "changes": [
+                {"op": "equal", "text": "Line "},
+                {"op": "delete", "text": "10"},
+                {"op": "insert", "text": "ten"},
+                {"op": "equal", "text": "\n"},
+            ],
+        },
+    ]
+
+    response = api_client.get(
+        f"/api/docs/{doc.id}/revisions/{rev1.id}/diff", params={"to": rev1.id}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["hunks"] == []
+
+
+async def test_get_doc_revision_diff_not_found(
+    api_client: "TestClient", user_admin: "User"
+):
+    """
+    Test getting a diff with revisions that do not belong to the document.
+    """
+    api_client.set_session_user(user_admin)
+    doc = await Doc.create(
+        title="Diff Document",
+        slug="diff-doc",
+        urlpath="/diff-doc",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+    )
+    other = await Doc.create(
+        title="Other Document",
+        slug="other-doc",
+        urlpath="/other-doc",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+    )
+    revision = await Revision.add(doc.id, "Content", user_admin.id)
+    other_revision = await Revision.add(other.id, "Other", user_admin.id)
+    response = api_client.get(f"/api/docs/{doc.id}/revisions/{other_revision.id}/diff")
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+    assert response.json()["detail"] == "Revision not found"
+    response = api_client.get(
+        f"/api/docs/{doc.id}/revisions/{revision.id}/diff",
+        params={"to": other_revision.id},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+    response = api_client.get(f"/api/docs/9999/revisions/{revision.id}/diff")
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+    assert response.json()["detail"] == "Document not found"
+
+
+async def test_get_doc_revision_diff_unauthorized(
+    api_client: "TestClient", user_viewer: "User"
+):
+    """
+    Test getting a diff as a user without permission.
+    """
+    api_client.set_session_user(user_viewer)
+    doc = await Doc.create(
+        title="Diff Document",
+        slug="diff-doc",
+        urlpath="/diff-doc",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+    )
+    revision = await Revision.add(doc.id, "Content", user_viewer.id)
+    response = api_client.get(f"/api/docs/{doc.id}/revisions/{revision.id}/diff")
+    assert response.status_code == status.HTTP_403_FORBIDDEN, response.text
+
+
 async def test_update_doc(api_client: "TestClient", user_admin: "User"):
     """
     Test updating a document.
@@ -797,6 +924,66 @@ async def test_update_doc(api_client: "TestClient", user_admin: "User"):
     assert await doc.revisions.all().count() == 1
 
 
+async def test_update_doc_image_srcset(api_client: "TestClient", user_admin: "User"):
+    """
+    Test that images embedded from uploads get a srcset of their resized variants.
+    """
+    api_client.set_session_user(user_admin)
+    photo = await Upload.create(
+        filename="photo.png",
+        content_type="image/png",
+        size=100,
+        storage_path="photo.png",
+        width=800,
+        variant_widths=[160, 320, 640],
+    )
+    animation = await Upload.create(
+        filename="animation.gif",
+        content_type="image/gif",
+        size=100,
+        storage_path="animation.gif",
+        width=800,
+        variant_widths=[],
+    )
+    home = await Doc.create(
+        title="Home",
+        slug="",
+        urlpath="/",
+        public=True,
+        metadata={},
+        markdown="",
+        html="",
+    )
+    doc = await Doc.create(
+        parent_id=home.id,
+        title="Photos",
+        slug="photos",
+        urlpath="/photos",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+    )
+    response = api_client.put(
+        f"/api/docs/{doc.id}",
+        json={
+            "markdown": f"![photo](/api/uploads/{photo.id}/download?download=false)\n"
+            f"![animation](/api/uploads/{animation.id}/download)\n"
+            "![external](https://example.com/photo.png)",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    src = f"/api/uploads/{photo.id}/download?download=false"
+    srcset = ", ".join(
+        [f"{src}&amp;w={width} {width}w" for width in (160, 320, 640)] + [f"{src} 800w"]
+    )
+    assert response.json()["html"] == (
+        f'<p><img alt="photo" sizes="(max-width: 800px) 100vw, 800px" src="{src}" srcset="{srcset}"/>\n'
+        f'<img alt="animation" src="/api/uploads/{animation.id}/download"/>\n'
+        '<img alt="external" src="https://example.com/photo.png"/></p>\n'
+    )
+
+
 async def test_update_doc_with_invalid_id(api_client: "TestClient", user_admin: "User"):
     """
     Test updating a document with an invalid ID.
@@ -1010,6 +1197,51 @@ async def test_update_doc_with_circular_parent(
     assert data["detail"] == "Cannot set a document as a child of its own descendant"
 
 
+async def test_doc_tree_queries(user_admin: "User"):
+    """
+    Test getting the ancestors and descendants of a document.
+    """
+    docs: list[Doc] = []
+    parent_id = None
+    for depth in range(4):
+        docs.append(
+            await Doc.create(
+                parent_id=parent_id,
+                title=f"Level {depth}",
+                slug=f"level-{depth}",
+                urlpath=f"/level-{depth}",
+                public=False,
+                metadata={"subtitles": []},
+                markdown="",
+                html="",
+                updated_by_id=user_admin.id,
+            )
+        )
+        parent_id = docs[-1].id
+    sibling = await Doc.create(
+        parent_id=docs[1].id,
+        title="Sibling",
+        slug="sibling",
+        urlpath="/sibling",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+        updated_by_id=user_admin.id,
+    )
+    # Ancestors are ordered from the parent up
+    assert [parent.id async for parent in docs[3].parents()] == [
+        docs[2].id,
+        docs[1].id,
+        docs[0].id,
+    ]
+    assert [parent.id async for parent in docs[0].parents()] == []
+    assert sorted(await docs[1].descendant_ids()) == sorted(
+        [docs[2].id, docs[3].id, sibling.id]
+    )
+    assert await docs[3].descendant_ids() == []
+
+
 async def test_update_home_page_slug_forbidden(
     api_client: "TestClient", user_admin: "User"
 ):
@@ -1292,12 +1524,7 @@ async def test_restore_doc_revision(api_client: "TestClient", user_admin: "User"
         html="<p>Initial content</p>\n",
         updated_by_id=user_admin.id,
     )
-    rev = await Revision.create(
-        doc_id=doc.id,
-        markdown="First revision content",
-        html="<p>First revision content</p>\n",
-        created_by_id=user_admin.id,
-    )
+    rev = await Revision.add(doc.id, "First revision content", user_admin.id)
 
     response = api_client.post(
         f"/api/docs/{doc.id}/restore_revision", params={"revision_id": rev.id}
@@ -1365,12 +1592,7 @@ async def test_restore_doc_revision_unauthorized(
         markdown="",
         html="",
     )
-    rev = await Revision.create(
-        doc_id=doc.id,
-        markdown="Unauthorized revision content",
-        html="<p>Unauthorized revision content</p>\n",
-        created_by_id=user_viewer.id,
-    )
+    rev = await Revision.add(doc.id, "Unauthorized revision content", user_viewer.id)
     response = api_client.post(
         f"/api/docs/{doc.id}/restore_revision", params={"revision_id": rev.id}
     )
@@ -1552,8 +1774,6 @@ async def test_search_docs_with_short_query(
     """
     Test searching documents with a short query.
     """
-    from app.settings import settings
-
     api_client.set_session_user(user_admin)
     await Doc.create(
         title="Search Document 1",
@@ -1564,30 +1784,33 @@ async def test_search_docs_with_short_query(
         markdown="This is a test document.",
         html="<p>This is a test document.</p>",
     )
-    # This doesn't use the search endpoint since the query is too short
-    settings.disable_search = False
+    # This doesn't use the search backend since the query is too short
     response = api_client.post("/api/docs/search", json={"query": "aa"})
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
     assert data == {
         "results": [],
         "total": 0,
+        "has_more": False,
     }
-    settings.disable_search = True
 
 
-async def test_search_docs_disabled(api_client: "TestClient", user_admin: "User"):
+async def test_search_docs_disabled(
+    api_client: "TestClient", user_admin: "User", monkeypatch
+):
     """
     Test searching documents when search is disabled.
     """
     from app.settings import settings
 
     api_client.set_session_user(user_admin)
-    settings.disable_search = True
+    monkeypatch.setattr(settings, "disable_search", True)
     response = api_client.post("/api/docs/search", json={"query": "test"})
     assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, response.text
     data = response.json()
     assert data["detail"] == "Search functionality is disabled"
+    response = api_client.get("/api/docs/autocomplete?query=test")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE, response.text
 
 
 async def test_get_doc_markdown(api_client: "TestClient", user_admin: "User"):
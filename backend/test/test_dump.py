@@ -8,7 +8,16 @@ from app.models.setting import Setting
 from app.models.upload import Upload
 from app.models.user import User
 from app.settings import settings
-from app.utils.dump import dump_to_dir, dump_to_single_file, dump_to_zip
+from app.utils import dump
+from app.utils.dump import (
+    ManifestError,
+    dump_to_dir,
+    dump_to_single_file,
+    dump_to_zip,
+    load_manifest,
+)
+from app.utils.revisions import prune_revisions
+from pytest import MonkeyPatch, raises
 
 
 async def test_dump_docs(api_client, tmpdir: Path, user_admin: User):
@@ -89,17 +98,9 @@ async def test_dump_docs_with_revisions(api_client, tmpdir: Path, user_admin: Us
         html="",
         metadata={},
     )
-    rev1 = await Revision.create(
-        doc_id=doc1.id,
-        markdown="This is a test revision.",
-        html="",
-        created_by_id=user_admin.id,
-    )
-    rev2 = await Revision.create(
-        doc_id=doc1.id,
-        markdown="This is an another test revision.",
-        html="",
-        created_by_id=user_admin.id,
+    rev1 = await Revision.add(doc1.id, "This is a test revision.", user_admin.id)
+    rev2 = await Revision.add(
+        doc1.id, "This is an another test revision.", user_admin.id
     )
     rev2.created_at = rev1.created_at + datetime.timedelta(seconds=1)
     await rev2.save()
@@ -248,12 +249,7 @@ async def test_dump_docs_to_zip_with_revisions(
         html="",
         metadata={},
     )
-    rev1 = await Revision.create(
-        doc_id=doc1.id,
-        markdown="This is a test revision.",
-        html="",
-        created_by_id=user_admin.id,
-    )
+    rev1 = await Revision.add(doc1.id, "This is a test revision.", user_admin.id)
     zip_path = tmpdir / "dump.zip"
     await dump_to_zip(str(zip_path), include_revisions=True)
     assert zip_path.exists()
@@ -504,3 +500,367 @@ async def test_dump_to_single_file_public_only(
     assert "Public content." in content
     assert "Private Doc" not in content
     assert "Private content." not in content
+
+
+async def test_dump_docs_to_zip_compression(api_client, tmpdir: Path, user_admin: User):
+    """Test that compressed attachments are stored and others are deflated."""
+    doc1 = await Doc.create(
+        title="Test Doc",
+        slug="test-doc",
+        urlpath="test-doc",
+        public=True,
+        markdown="This is a test document.",
+        html="",
+        metadata={},
+    )
+    settings.uploads_dir.mkdir(parents=True, exist_ok=True)
+    for filename, storage_path in [
+        ("photo.JPG", "test_compression_photo"),
+        ("notes.txt", "test_compression_notes"),
+    ]:
+        (settings.uploads_dir / storage_path).write_bytes(b"content " * 100)
+        await Upload.create(
+            filename=filename,
+            content_type="application/octet-stream",
+            size=800,
+            public=True,
+            storage_path=storage_path,
+            doc=doc1,
+        )
+    zip_path = tmpdir / "dump.zip"
+    await dump_to_zip(str(zip_path), include_attachments=True)
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        photo = zf.getinfo("test-doc__attachments/photo.JPG")
+        assert photo.compress_type == zipfile.ZIP_STORED
+        notes = zf.getinfo("test-doc__attachments/notes.txt")
+        assert notes.compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("test-doc.md").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("test-doc__attachments/notes.txt") == b"content " * 100
+
+
+async def test_dump_docs_in_pages(
+    api_client, tmpdir: Path, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """Test that all docs are dumped when they span several pages."""
+    monkeypatch.setattr(dump, "DOC_PAGE_SIZE", 2)
+    for i in range(5):
+        await Doc.create(
+            title=f"Doc {i}",
+            slug=f"doc-{i}",
+            urlpath=f"doc-{i}",
+            public=i != 3,
+            markdown=f"Content {i}",
+            html="",
+            metadata={},
+        )
+    await dump_to_dir(str(tmpdir), public_only=True)
+    assert sorted(p.basename for p in tmpdir.listdir()) == [
+        "doc-0.md",
+        "doc-1.md",
+        "doc-2.md",
+        "doc-4.md",
+        "manifest.json",
+    ]
+
+
+async def test_dump_missing_attachment(api_client, tmpdir: Path, user_admin: User):
+    """Test that an error in the writer thread is raised by the dump."""
+    doc1 = await Doc.create(
+        title="Test Doc",
+        slug="test-doc",
+        urlpath="test-doc",
+        public=True,
+        markdown="This is a test document.",
+        html="",
+        metadata={},
+    )
+    await Upload.create(
+        filename="missing.png",
+        content_type="image/png",
+        size=10,
+        public=True,
+        storage_path="test_missing_attachment",
+        doc=doc1,
+    )
+    with raises(FileNotFoundError):
+        await dump_to_zip(str(tmpdir / "dump.zip"), include_attachments=True)
+
+
+async def test_dump_revisions_in_pages(
+    api_client, tmpdir: Path, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """Test that all revisions are dumped when they span several pages."""
+    monkeypatch.setattr(dump, "REVISION_PAGE_SIZE", 2)
+    doc1 = await Doc.create(
+        title="Test Doc",
+        slug="test-doc",
+        urlpath="test-doc",
+        public=True,
+        markdown="This is a test document.",
+        html="",
+        metadata={},
+    )
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    revisions = []
+    for i in range(5):
+        revision = await Revision.add(
+            doc1.id, f"Revision {i}", user_admin.id if i % 2 else None
+        )
+        revision.created_at = start + datetime.timedelta(seconds=i)
+        await revision.save()
+        revisions.append(revision)
+    await dump_to_dir(str(tmpdir), include_revisions=True)
+    assert len((tmpdir / "test-doc__revisions").listdir()) == 5
+    for i, revision in enumerate(revisions):
+        content = (
+            tmpdir
+            / f"test-doc__revisions/{revision.created_at.strftime('%Y%m%d%H%M%S')}.md"
+        ).read_text("utf-8")
+        assert f"id: {revision.id}\n" in content
+        if i % 2:
+            assert f'created_by_username: "{user_admin.username}"\n' in content
+        else:
+            assert "created_by_id: \n" in content
+            assert 'created_by_username: ""\n' in content
+        assert content.endswith(f"Revision {i}")
+
+
+async def test_dump_to_single_file_tree_order(
+    api_client, tmpdir: Path, user_admin: User
+):
+    """Test that the single-file dump is in depth-first tree order."""
+    b = await Doc.create(
+        title="B", slug="b", urlpath="b", markdown="", html="", metadata={}
+    )
+    a = await Doc.create(
+        title="A", slug="a", urlpath="a", markdown="", html="", metadata={}
+    )
+    await Doc.create(
+        parent_id=a.id,
+        title="A2",
+        slug="a2",
+        urlpath="a/a2",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    await Doc.create(
+        parent_id=a.id,
+        title="A1",
+        slug="a1",
+        urlpath="a/a1",
+        markdown="",
+        html="",
+        metadata={},
+        order=-1,
+    )
+    await Doc.create(
+        parent_id=b.id,
+        title="B1",
+        slug="b1",
+        urlpath="b/b1",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    file_path = tmpdir / "dump.md"
+    assert await dump_to_single_file(str(file_path)) == [str(file_path)]
+    content = file_path.read_text("utf-8")
+    paths = [line for line in content.splitlines() if line.startswith("<!-- path:")]
+    assert paths == [
+        "<!-- path: /a -->",
+        "<!-- path: /a/a1 -->",
+        "<!-- path: /a/a2 -->",
+        "<!-- path: /b -->",
+        "<!-- path: /b/b1 -->",
+    ]
+
+
+async def test_dump_to_single_file_sharded(api_client, tmpdir: Path, user_admin: User):
+    """Test splitting the single-file dump into files of a maximum size."""
+    for i in range(5):
+        await Doc.create(
+            title=f"Doc {i}",
+            slug=f"doc-{i}",
+            urlpath=f"doc-{i}",
+            markdown="x" * 100,
+            html="",
+            metadata={},
+        )
+    await Doc.create(
+        title="Doc 5",
+        slug="doc-5",
+        urlpath="doc-5",
+        markdown="x" * 1000,
+        html="",
+        metadata={},
+    )
+    paths = await dump_to_single_file(str(tmpdir / "dump.md"), max_size=500)
+    assert paths == [str(tmpdir / f"dump-{i}.md") for i in range(1, 5)]
+    sections = []
+    for path in paths:
+        content = Path(path).read_text("utf-8")
+        assert content.startswith("# Gnotus\n\n")
+        sections.append(content.count("<!-- path:"))
+        if "doc-5" not in content:
+            assert len(content.encode("utf-8")) <= 500
+    assert sections == [2, 2, 1, 1]
+
+
+async def test_dump_differential(
+    api_client, tmpdir: Path, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """Test a differential dump based on the manifest of a previous dump."""
+    # Revisions that can still be coalesced are covered below
+    monkeypatch.setattr(settings, "revision_coalesce_window", 0)
+    unchanged = await Doc.create(
+        title="Unchanged",
+        slug="unchanged",
+        urlpath="unchanged",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    changed = await Doc.create(
+        title="Changed",
+        slug="changed",
+        urlpath="changed",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    moved = await Doc.create(
+        title="Moved",
+        slug="moved",
+        urlpath="moved",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    deleted = await Doc.create(
+        title="Deleted",
+        slug="deleted",
+        urlpath="deleted",
+        markdown="",
+        html="",
+        metadata={},
+    )
+    old_revision = await Revision.add(changed.id, "Old", None)
+    settings.uploads_dir.mkdir(parents=True, exist_ok=True)
+    for name in ("unchanged", "moved"):
+        (settings.uploads_dir / f"test_differential_{name}").write_bytes(b"data")
+        await Upload.create(
+            filename=f"{name}.txt",
+            content_type="text/plain",
+            size=4,
+            public=True,
+            storage_path=f"test_differential_{name}",
+            doc=unchanged if name == "unchanged" else moved,
+        )
+    zip_path = tmpdir / "full.zip"
+    await dump_to_zip(str(zip_path), include_revisions=True, include_attachments=True)
+
+    changed.markdown = "New content"
+    await changed.save()
+    new_revision = await Revision.add(changed.id, "New", None)
+    new_revision.created_at = old_revision.created_at + datetime.timedelta(seconds=1)
+    await new_revision.save()
+    moved.urlpath = "elsewhere"
+    await moved.save()
+    await deleted.delete()
+
+    diff_dir = tmpdir / "diff"
+    await dump_to_dir(
+        str(diff_dir),
+        include_revisions=True,
+        include_attachments=True,
+        previous=load_manifest(str(zip_path)),
+    )
+    written = sorted(
+        str(Path(path).relative_to(diff_dir))
+        for path in diff_dir.visit()
+        if Path(path).is_file()
+    )
+    assert written == [
+        "changed.md",
+        f"changed__revisions/{new_revision.created_at.strftime('%Y%m%d%H%M%S')}.md",
+        "elsewhere.md",
+        "elsewhere__attachments/moved.txt",
+        "manifest.json",
+    ]
+    manifest = load_manifest(str(diff_dir / "manifest.json"))
+    assert manifest["differential"] is True
+    assert manifest["deleted"] == [
+        "deleted.md",
+        "deleted__attachments/",
+        "deleted__revisions/",
+        "moved.md",
+        "moved__attachments/",
+        "moved__attachments/moved.txt",
+        "moved__revisions/",
+    ]
+    assert sorted(manifest["docs"]) == sorted(
+        str(doc.id) for doc in (unchanged, changed, moved)
+    )
+    assert manifest["last_revision_id"] == new_revision.id
+
+    # A differential dump of a differential dump writes nothing new
+    diff2_dir = tmpdir / "diff2"
+    await dump_to_dir(
+        str(diff2_dir),
+        include_revisions=True,
+        include_attachments=True,
+        previous=manifest,
+    )
+    assert [path.basename for path in diff2_dir.listdir()] == ["manifest.json"]
+    assert load_manifest(str(diff2_dir / "manifest.json"))["deleted"] == []
+
+    with raises(ManifestError):
+        await dump_to_dir(str(tmpdir / "diff3"), previous=manifest)
+
+
+async def test_dump_differential_revisions(
+    api_client, tmpdir: Path, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """
+    Test that differential dumps write edits coalesced into an exported revision
+    and list the revisions pruned since the previous dump as deleted.
+    """
+    monkeypatch.setattr(settings, "revision_coalesce_window", 300)
+    now = datetime.datetime.now(datetime.UTC)
+    doc = await Doc.create(
+        title="A", slug="a", urlpath="a", markdown="", html="", metadata={}
+    )
+    old = []
+    for minute in range(2):
+        revision = await Revision.add(doc.id, f"Old {minute}", user_admin.id)
+        revision.created_at = now - datetime.timedelta(days=400, minutes=-minute)
+        await revision.save()
+        old.append(revision)
+    latest = await Revision.record(doc.id, "First", user_admin.id)
+
+    full_dir = tmpdir / "full"
+    await dump_to_dir(str(full_dir), include_revisions=True)
+    manifest = load_manifest(str(full_dir / "manifest.json"))
+    # The latest revision can still change
+    assert manifest["last_revision_id"] == old[-1].id
+
+    assert (await Revision.record(doc.id, "Second", user_admin.id)).id == latest.id
+    # The older of the two revisions of that day is pruned
+    assert await prune_revisions(now=now) == 1
+
+    diff_dir = tmpdir / "diff"
+    await dump_to_dir(str(diff_dir), include_revisions=True, previous=manifest)
+    name = latest.created_at.strftime("%Y%m%d%H%M%S")
+    assert sorted(path.basename for path in diff_dir.listdir()) == [
+        "a__revisions",
+        "manifest.json",
+    ]
+    assert [path.basename for path in (diff_dir / "a__revisions").listdir()] == [
+        f"{name}.md"
+    ]
+    assert "Second" in (diff_dir / "a__revisions" / f"{name}.md").read_text("utf-8")
+    manifest = load_manifest(str(diff_dir / "manifest.json"))
+    assert manifest["deleted"] == [
+        f"a__revisions/{old[0].created_at.strftime('%Y%m%d%H%M%S')}.md"
+    ]
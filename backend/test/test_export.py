@@ -0,0 +1,131 @@
+import io
+import tarfile
+import zipfile
+
+from app.models.doc import Doc
+from app.models.revision import Revision
+from app.models.upload import Upload
+from app.models.user import User
+from app.settings import settings
+from app.utils import dump
+from app.utils.dump import stream_export
+from fastapi import status
+from pytest import MonkeyPatch
+from utils import TestClient
+
+
+async def create_docs(user: User) -> tuple[Doc, Doc]:
+    """
+    Create a public and a private document.
+    """
+    public_doc = await Doc.create(
+        title="Public Doc",
+        slug="public-doc",
+        urlpath="public-doc",
+        public=True,
+        markdown="This is a public document.",
+        html="",
+        metadata={},
+    )
+    private_doc = await Doc.create(
+        title="Private Doc",
+        slug="private-doc",
+        urlpath="private-doc",
+        public=False,
+        markdown="This is a private document.",
+        html="",
+        metadata={},
+        updated_by_id=user.id,
+    )
+    return public_doc, private_doc
+
+
+async def test_export_zip(api_client: TestClient, user_admin: User):
+    """
+    Test streaming a zip export with revisions and attachments.
+    """
+    public_doc, _ = await create_docs(user_admin)
+    revision = await Revision.add(
+        public_doc.id, "This is a test revision.", user_admin.id
+    )
+    settings.uploads_dir.mkdir(parents=True, exist_ok=True)
+    (settings.uploads_dir / "test_export_attachment").write_bytes(b"fake image")
+    await Upload.create(
+        filename="image.png",
+        content_type="image/png",
+        size=10,
+        public=True,
+        storage_path="test_export_attachment",
+        doc=public_doc,
+    )
+    api_client.set_session_user(user_admin)
+    response = api_client.get(
+        "/api/export/", params={"revisions": True, "attachments": True}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["content-disposition"].startswith(
+        'attachment; filename="export-'
+    )
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        revision_path = (
+            f"public-doc__revisions/{revision.created_at.strftime('%Y%m%d%H%M%S')}.md"
+        )
+        assert sorted(zf.namelist()) == [
+            "manifest.json",
+            "private-doc.md",
+            "public-doc.md",
+            "public-doc__attachments/image.png",
+            revision_path,
+        ]
+        assert zf.read("public-doc.md").decode("utf-8") == dump._generate_doc_content(
+            await Doc.get(id=public_doc.id).prefetch_related("updated_by")
+        )
+        assert "This is a test revision." in zf.read(revision_path).decode("utf-8")
+        assert zf.read("public-doc__attachments/image.png") == b"fake image"
+
+
+async def test_export_tar_public_only(api_client: TestClient, user_admin: User):
+    """
+    Test streaming a tar export of only the public documents.
+    """
+    await create_docs(user_admin)
+    api_client.set_session_user(user_admin)
+    response = api_client.get(
+        "/api/export/", params={"format": "tar", "public_only": True}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-tar"
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as tf:
+        assert tf.getnames() == ["public-doc.md", "manifest.json"]
+        file = tf.extractfile("public-doc.md")
+        assert file is not None
+        assert "This is a public document." in file.read().decode("utf-8")
+
+
+async def test_export_unauthorized(
+    api_client: TestClient, user_user: User, user_viewer: User
+):
+    """
+    Test that only admins can export the documents.
+    """
+    response = api_client.get("/api/export/")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    for user in (user_user, user_viewer):
+        api_client.set_session_user(user)
+        response = api_client.get("/api/export/")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_export_stream_closed_early(
+    api_client: TestClient, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """
+    Test that the export stops when the client stops reading.
+    """
+    monkeypatch.setattr(dump, "STREAM_CHUNK_SIZE", 16)
+    monkeypatch.setattr(dump, "STREAM_QUEUE_SIZE", 1)
+    await create_docs(user_admin)
+    stream = stream_export()
+    assert await anext(stream)
+    await stream.aclose()
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+from app.models.doc import Doc
+from app.models.user import User
+from app.utils.dump import dump_to_dir, dump_to_zip
+from app.utils.importer import ImportFormatError, import_docs
+from pytest import raises
+
+
+async def create_tree() -> Doc:
+    """Create a home page with a few documents below it."""
+    home = await Doc.create(
+        title="Home",
+        slug="",
+        urlpath="/",
+        public=True,
+        markdown="Welcome",
+        html="",
+        metadata={},
+    )
+    guide = await Doc.create(
+        parent_id=home.id,
+        title='The "Guide"',
+        slug="guide",
+        urlpath="/guide",
+        public=True,
+        markdown="## Install\n\nRun it.",
+        html="",
+        metadata={},
+        order=1,
+    )
+    await Doc.create(
+        parent_id=guide.id,
+        title="Advanced",
+        slug="advanced",
+        urlpath="/guide/advanced",
+        public=False,
+        markdown="Advanced content",
+        html="",
+        metadata={},
+    )
+    await Doc.create(
+        parent_id=home.id,
+        title="About",
+        slug="about",
+        urlpath="/about",
+        public=True,
+        markdown="About content",
+        html="",
+        metadata={},
+    )
+    return home
+
+
+async def test_import_zip(api_client, tmpdir: Path, user_admin: User):
+    """Test importing a zip dump into a wiki with only a home page."""
+    await create_tree()
+    zip_path = tmpdir / "dump.zip"
+    await dump_to_zip(str(zip_path), include_revisions=True)
+    await Doc.filter(parent_id__not_isnull=True).delete()
+
+    imported, skipped = await import_docs(str(zip_path), workers=1)
+    assert (imported, skipped) == (3, 1)
+
+    home = await Doc.get(parent_id=None)
+    guide = await Doc.get(urlpath="/guide")
+    assert guide.parent_id == home.id
+    assert guide.title == 'The "Guide"'
+    assert guide.public
+    assert guide.order == 1
+    assert guide.markdown == "## Install\n\nRun it."
+    assert 'id="section-install"' in guide.html
+    assert guide.metadata == {
+        "subtitles": [{"title": "Install", "hash": "section-install"}]
+    }
+    advanced = await Doc.get(urlpath="/guide/advanced")
+    assert advanced.parent_id == guide.id
+    assert not advanced.public
+    assert advanced.html == "<p>Advanced content</p>\n"
+    about = await Doc.get(urlpath="/about")
+    assert about.parent_id == home.id
+
+    # Importing again skips everything
+    assert await import_docs(str(zip_path), workers=1) == (0, 4)
+    assert await Doc.all().count() == 4
+
+
+async def test_import_dir_without_home(api_client, tmpdir: Path, user_admin: User):
+    """Test importing a directory dump into an empty wiki."""
+    await create_tree()
+    await dump_to_dir(str(tmpdir), public_only=True)
+    await Doc.all().delete()
+
+    assert await import_docs(str(tmpdir), workers=1) == (3, 0)
+    home = await Doc.get(parent_id=None)
+    assert home.urlpath == "/"
+    assert home.markdown == "Welcome"
+    assert await Doc.filter(parent_id=home.id).count() == 2
+    assert not await Doc.exists(urlpath="/guide/advanced")
+
+
+async def test_import_invalid(api_client, tmpdir: Path, user_admin: User):
+    """Test importing files that were not written by the dump command."""
+    (tmpdir / "doc.md").write_text("# Not a dump\n", "utf-8")
+    with raises(ImportFormatError):
+        await import_docs(str(tmpdir), workers=1)
+    with raises(ImportFormatError):
+        await import_docs(str(tmpdir / "missing"), workers=1)
@@ -0,0 +1,105 @@
+import pytest
+from fastapi import status
+from prometheus_client import REGISTRY
+from utils import TestClient
+
+import app.search
+from app.models.user import User
+from app.settings import settings
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_metrics(api_client: TestClient, user_admin: User):
+    """
+    Test that the metrics endpoint reports requests and database queries.
+    """
+    requests = sample(
+        "gnotus_http_request_duration_seconds_count",
+        method="GET",
+        endpoint="get_doc",
+        status="404",
+    )
+    queries = sample("gnotus_db_query_duration_seconds_count")
+
+    response = api_client.get("/api/docs/12345")
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+    assert (
+        sample(
+            "gnotus_http_request_duration_seconds_count",
+            method="GET",
+            endpoint="get_doc",
+            status="404",
+        )
+        == requests + 1
+    )
+    assert sample("gnotus_db_query_duration_seconds_count") > queries
+
+    response = api_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert (
+        'gnotus_http_request_duration_seconds_count{endpoint="get_doc",'
+        'method="GET",status="404"}'
+    ) in response.text
+    assert 'gnotus_http_requests_in_progress{method="GET"} 1.0' in response.text
+
+
+async def test_upload_metrics(api_client: TestClient, user_admin: User):
+    """
+    Test that the bytes of uploaded files are counted both ways.
+    """
+    received = sample("gnotus_upload_bytes_total", direction="in")
+    sent = sample("gnotus_upload_bytes_total", direction="out")
+
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/",
+        data={"filename": "metrics.txt", "public": "true"},
+        files={"file": ("metrics.txt", b"counted content", "text/plain")},
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+    response = api_client.get(f"/api/uploads/{response.json()['id']}/download")
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    assert sample("gnotus_upload_bytes_total", direction="in") == received + 15
+    assert sample("gnotus_upload_bytes_total", direction="out") == sent + 15
+
+
+async def test_search_and_cache_metrics(
+    api_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    """
+    Test that search backend calls and search cache lookups are counted.
+    """
+    monkeypatch.setattr(settings, "disable_search", False)
+    monkeypatch.setattr(app.search, "_backend", None)
+    searches = sample(
+        "gnotus_search_backend_duration_seconds_count",
+        backend="memory",
+        operation="search",
+    )
+    hits = sample("gnotus_cache_requests_total", cache="search", result="hit")
+    misses = sample("gnotus_cache_requests_total", cache="search", result="miss")
+
+    for _ in range(2):
+        response = api_client.post("/api/docs/search", json={"query": "metrics"})
+        assert response.status_code == status.HTTP_200_OK, response.text
+
+    assert (
+        sample(
+            "gnotus_search_backend_duration_seconds_count",
+            backend="memory",
+            operation="search",
+        )
+        == searches + 1
+    )
+    assert sample("gnotus_cache_requests_total", cache="search", result="miss") == (
+        misses + 1
+    )
+    assert sample("gnotus_cache_requests_total", cache="search", result="hit") == (
+        hits + 1
+    )
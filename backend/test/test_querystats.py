@@ -0,0 +1,85 @@
+import logging
+import re
+
+import pytest
+from fastapi import status
+from utils import TestClient
+
+from app.models.doc import Doc
+from app.models.user import User
+from app.settings import settings
+
+
+async def test_server_timing(api_client: TestClient, user_admin: User):
+    """
+    Test that responses report the number of queries and their time.
+    """
+    home = await Doc.create(
+        title="Home",
+        slug="",
+        urlpath="/",
+        public=True,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+        updated_by_id=user_admin.id,
+    )
+    for i in range(3):
+        await Doc.create(
+            parent_id=home.id,
+            title=f"Doc {i}",
+            slug=f"doc-{i}",
+            urlpath=f"/doc-{i}",
+            public=True,
+            metadata={"subtitles": []},
+            markdown="",
+            html="",
+            updated_by_id=user_admin.id,
+        )
+    response = api_client.get("/api/docs/outline")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    match = re.fullmatch(
+        r'db;dur=\d+\.\d;desc="(\d+) queries"', response.headers["Server-Timing"]
+    )
+    assert match is not None, response.headers["Server-Timing"]
+    # The home page query, then one query for the children of each document
+    assert int(match[1]) == 5
+
+    response = api_client.get("/api/robots.txt")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["Server-Timing"].endswith('desc="0 queries"')
+
+
+async def test_server_timing_disabled(
+    api_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    """
+    Test that the Server-Timing header can be disabled.
+    """
+    monkeypatch.setattr(settings, "server_timing", False)
+    response = api_client.get("/api/docs/outline")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert "Server-Timing" not in response.headers
+
+
+async def test_slow_query_log(
+    api_client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+):
+    """
+    Test that queries slower than the threshold are logged with their SQL.
+    """
+    monkeypatch.setattr(settings, "slow_query_threshold", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.utils.querystats"):
+        response = api_client.get("/api/docs/outline")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    slow = [r for r in caplog.records if r.getMessage().startswith("Slow query")]
+    assert slow
+    assert 'FROM "docs"' in slow[0].sql  # type: ignore[attr-defined]
+
+    caplog.clear()
+    monkeypatch.setattr(settings, "slow_query_threshold", 0)
+    with caplog.at_level(logging.WARNING, logger="app.utils.querystats"):
+        api_client.get("/api/docs/outline")
+    assert not caplog.records
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from tortoise import connections
+from tortoise.backends.base.config_generator import expand_db_url
+from utils import TestClient
+
+from app.models.doc import Doc
+from app.models.user import User
+from app.settings import settings
+from app.utils.replica import REPLICA_CONNECTION
+
+
+@pytest.fixture
+async def sync_replica(tmp_path: Path, monkeypatch):
+    """
+    Fixture to configure a read replica in an SQLite file.
+    Returns a function copying the primary database to the replica.
+    """
+    if not settings.db_url.startswith("sqlite"):
+        pytest.skip("The replica is copied with SQLite")
+    path = tmp_path / "replica.db"
+    monkeypatch.setattr(settings, "db_replica_url", f"sqlite://{path}")
+    connections.db_config[REPLICA_CONNECTION] = expand_db_url(f"sqlite://{path}")
+
+    async def sync():
+        # The connection reopens on the next query
+        await connections.get(REPLICA_CONNECTION).close()
+        path.unlink(missing_ok=True)
+        await connections.get("default").execute_query(f"VACUUM INTO '{path}'")
+
+    yield sync
+
+    await connections.get(REPLICA_CONNECTION).close()
+    connections.discard(REPLICA_CONNECTION)
+    del connections.db_config[REPLICA_CONNECTION]
+
+
+async def test_read_replica(
+    api_client: TestClient, user_admin: User, sync_replica, monkeypatch
+):
+    """
+    Test that read-only endpoints read from the replica,
+    except right after the user writes.
+    """
+    doc = await Doc.create(
+        title="Original",
+        slug="replicated",
+        urlpath="/replicated",
+        public=True,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+        updated_by_id=user_admin.id,
+    )
+    await sync_replica()
+    await Doc.filter(id=doc.id).update(title="Changed")
+
+    # The replica has not caught up yet
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["title"] == "Original"
+    response = api_client.get("/api/docs/outline")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["title"] == "Original"
+
+    # Other endpoints read from the primary
+    # (over HTTPS, so that the client sends back the updated session cookie)
+    monkeypatch.setattr(api_client, "base_url", "https://testserver")
+    api_client.set_session_user(user_admin)
+    response = api_client.get("/api/docs/", params={"page": 1, "size": 10})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["items"][0]["title"] == "Changed"
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.json()["title"] == "Original"
+
+    # The user reads their own writes
+    response = api_client.put(f"/api/docs/{doc.id}", json={"title": "Updated"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.json()["title"] == "Updated"
+
+    # Until the replica is expected to have caught up
+    monkeypatch.setattr(settings, "db_replica_lag", 0)
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.json()["title"] == "Original"
+    await sync_replica()
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.json()["title"] == "Updated"
+
+
+async def test_read_replica_failed_and_read_only_requests(
+    api_client: TestClient, user_admin: User, sync_replica, monkeypatch
+):
+    """
+    Test that failed write requests and read-only requests with other methods
+    than GET do not make the user read from the primary.
+    """
+    doc = await Doc.create(
+        title="Original",
+        slug="replicated",
+        urlpath="/replicated",
+        public=True,
+        metadata={"subtitles": []},
+        markdown="",
+        html="",
+        updated_by_id=user_admin.id,
+    )
+    await sync_replica()
+    await Doc.filter(id=doc.id).update(title="Changed")
+    monkeypatch.setattr(api_client, "base_url", "https://testserver")
+
+    # Anonymous searches do not start a session
+    response = api_client.post("/api/docs/search", json={"query": "original"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert settings.session_cookie not in response.cookies
+
+    api_client.set_session_user(user_admin)
+    response = api_client.put("/api/docs/12345", json={"title": "Missing"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+    response = api_client.get(f"/api/docs/{doc.id}")
+    assert response.json()["title"] == "Original"
@@ -0,0 +1,196 @@
+from datetime import UTC, datetime, timedelta
+
+from app.models.doc import Doc
+from app.models.revision import Revision
+from app.models.user import User
+from app.settings import settings
+from app.utils.deltas import apply_delta, make_delta
+from app.utils.revisions import compact_revisions, prune_revisions, revisions_to_keep
+
+LINES = "".join(f"Line {i}\n" for i in range(50))
+
+
+async def create_doc() -> Doc:
+    return await Doc.create(
+        title="Doc",
+        slug="doc",
+        urlpath="/doc",
+        markdown="",
+        html="",
+        metadata={},
+    )
+
+
+def test_delta_round_trip():
+    base = "# Title\n\nFirst paragraph.\n\nSecond paragraph.\n"
+    for text in [
+        base,
+        "",
+        "# Title\n\nFirst paragraph.\n\nNew paragraph.\n\nSecond paragraph.\n",
+        "Second paragraph.\n# Title\n",
+        "# Title\n\nNo trailing newline",
+        "Ünïcode\r\nlines\r\n",
+    ]:
+        assert apply_delta(base, make_delta(base, text)) == text
+
+
+async def test_revision_chain(user_user: User, monkeypatch):
+    monkeypatch.setattr(settings, "revision_snapshot_interval", 3)
+    doc = await create_doc()
+    texts = [
+        "\n".join(f"Line {j}{' edited' if j == i else ''}" for j in range(50))
+        for i in range(7)
+    ]
+    revisions = [await Revision.add(doc.id, text, user_user.id) for text in texts]
+    # Snapshots every 3 revisions, deltas against the previous revision otherwise
+    assert [r.snapshot_id for r in revisions] == [
+        None,
+        revisions[0].id,
+        revisions[0].id,
+        None,
+        revisions[3].id,
+        revisions[3].id,
+        None,
+    ]
+    assert revisions[2].base_id == revisions[1].id
+    assert len(revisions[1].data) < len(revisions[0].data)
+    for revision, text in zip(revisions, texts):
+        fetched = await Revision.get(id=revision.id)
+        assert await fetched.get_markdown() == text
+    fetched = await Revision.filter(doc_id=doc.id).order_by("id")
+    assert await Revision.get_markdowns(fetched) == {
+        revision.id: text for revision, text in zip(revisions, texts)
+    }
+
+
+async def test_revision_small_text_is_snapshot(user_user: User):
+    doc = await create_doc()
+    await Revision.add(doc.id, "a", user_user.id)
+    revision = await Revision.add(doc.id, "b", user_user.id)
+    assert revision.snapshot_id is None
+    assert await revision.get_markdown() == "b"
+
+
+async def test_compact_revisions(user_user: User, monkeypatch):
+    monkeypatch.setattr(settings, "revision_snapshot_interval", 2)
+    doc = await create_doc()
+    texts = ["Legacy content\n" * 20 + f"Version {i}\n" for i in range(5)]
+    for text in texts:
+        await Revision.create(
+            doc_id=doc.id,
+            legacy_markdown=text,
+            legacy_html="<p>Legacy</p>",
+            created_by_id=user_user.id,
+        )
+    new = await Revision.add(doc.id, "After legacy\n" * 20, user_user.id)
+    # Legacy revisions are readable before compaction
+    legacy = await Revision.filter(doc_id=doc.id, data__isnull=True).order_by("id")
+    assert [await r.get_markdown() for r in legacy] == texts
+    assert new.snapshot_id is None
+
+    assert await compact_revisions(batch_size=2, vacuum=True) == 5
+    assert await compact_revisions() == 0
+    revisions = await Revision.filter(doc_id=doc.id).order_by("id")
+    assert all(r.data is not None and r.legacy_markdown == "" for r in revisions)
+    assert [r.snapshot_id is None for r in revisions] == [
+        True,
+        False,
+        True,
+        False,
+        True,
+        True,
+    ]
+    markdowns = await Revision.get_markdowns(revisions)
+    assert [markdowns[r.id] for r in revisions] == texts + ["After legacy\n" * 20]
+
+
+async def test_record_coalesces_edits(user_user: User, user_admin: User, monkeypatch):
+    monkeypatch.setattr(settings, "revision_coalesce_window", 300)
+    doc = await create_doc()
+    first = await Revision.record(doc.id, LINES + "one", user_user.id)
+    second = await Revision.record(doc.id, LINES + "two", user_user.id)
+    latest = await Revision.record(doc.id, LINES + "three", user_user.id)
+    assert first.id == second.id == latest.id
+    assert await Revision.filter(doc_id=doc.id).count() == 1
+    assert await (await Revision.get(id=first.id)).get_markdown() == (LINES + "three")
+
+    # Another user starts a new revision
+    other = await Revision.record(doc.id, LINES + "four", user_admin.id)
+    assert other.id != first.id
+    # Coalescing into a delta keeps it relative to its base
+    again = await Revision.record(doc.id, LINES + "five", user_admin.id)
+    assert again.id == other.id and again.base_id == first.id
+    assert await (await Revision.get(id=other.id)).get_markdown() == (LINES + "five")
+
+    # Edits after the window create a new revision
+    await Revision.filter(id=other.id).update(
+        created_at=datetime.now(UTC) - timedelta(seconds=301)
+    )
+    new = await Revision.record(doc.id, LINES + "six", user_admin.id)
+    assert new.id != other.id
+
+    monkeypatch.setattr(settings, "revision_coalesce_window", 0)
+    disabled = await Revision.record(doc.id, LINES + "seven", user_admin.id)
+    assert disabled.id != new.id
+
+
+def test_revisions_to_keep(monkeypatch):
+    monkeypatch.setattr(settings, "revision_keep_all_days", 30)
+    monkeypatch.setattr(settings, "revision_keep_daily_days", 365)
+    now = datetime(2025, 12, 31, 12, tzinfo=UTC)
+    revisions = [
+        # Two revisions in the same week (2024-W10), more than a year ago
+        (1, datetime(2024, 3, 4, 10, tzinfo=UTC)),
+        (2, datetime(2024, 3, 6, 10, tzinfo=UTC)),
+        # Two revisions on the same day within the year
+        (3, datetime(2025, 6, 1, 10, tzinfo=UTC)),
+        (4, datetime(2025, 6, 1, 11, tzinfo=UTC)),
+        (5, datetime(2025, 6, 2, 10, tzinfo=UTC)),
+        # Recent revisions are all kept
+        (6, datetime(2025, 12, 20, 10, tzinfo=UTC)),
+        (7, datetime(2025, 12, 20, 10, 1, tzinfo=UTC)),
+    ]
+    assert revisions_to_keep(revisions, now) == {2, 4, 5, 6, 7}
+    # The latest revision is kept even if it is old
+    assert revisions_to_keep(revisions[:2], now) == {2}
+
+
+async def test_prune_revisions(user_user: User, monkeypatch):
+    monkeypatch.setattr(settings, "revision_snapshot_interval", 4)
+    monkeypatch.setattr(settings, "revision_keep_all_days", 30)
+    monkeypatch.setattr(settings, "revision_keep_daily_days", 365)
+    doc = await create_doc()
+    now = datetime.now(UTC)
+    texts = [LINES + f"Version {i}\n" for i in range(10)]
+    days_ago = [100, 100, 100, 50, 50, 10, 10, 5, 2, 1]
+    revisions = []
+    for text, days in zip(texts, days_ago):
+        revision = await Revision.add(doc.id, text, user_user.id)
+        await Revision.filter(id=revision.id).update(
+            created_at=now - timedelta(days=days)
+        )
+        revisions.append(revision)
+    # Chains: [0 1 2 3] [4 5 6 7] [8 9]
+    assert [r.snapshot_id is None for r in revisions] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+        False,
+        False,
+        False,
+        True,
+        False,
+    ]
+
+    assert await prune_revisions(batch_size=1) == 3
+    kept = await Revision.filter(doc_id=doc.id).order_by("id")
+    assert [r.id for r in kept] == [revisions[i].id for i in (2, 4, 5, 6, 7, 8, 9)]
+    markdowns = await Revision.get_markdowns(kept)
+    assert [markdowns[r.id] for r in kept] == [texts[i] for i in (2, 4, 5, 6, 7, 8, 9)]
+    # The chains were relinked around the deleted revisions
+    assert kept[0].snapshot_id is None
+    assert kept[1].snapshot_id is None
+    assert kept[2].base_id == kept[1].id
+    assert await prune_revisions() == 0
@@ -0,0 +1,467 @@
+import pytest
+from fastapi import status
+from utils import TestClient
+
+import app.search
+from app.models.doc import Doc
+from app.models.user import User
+from app.schemas.doc import DocIndexSchema
+from app.search.fts5 import match_query
+from app.search.memory import MemoryBackend
+from app.settings import settings
+from app.utils.indexing import (
+    create_or_update_index,
+    delete_document_from_index,
+    index_all_documents,
+    index_document,
+    index_documents,
+    search_documents,
+    suggest_documents,
+)
+
+PRE = "<em class='search-highlight'>"
+
+
+@pytest.fixture
+async def fts5_search(monkeypatch):
+    """
+    Fixture to enable search with the FTS5 backend.
+    """
+    if not settings.db_url.startswith("sqlite"):
+        pytest.skip("FTS5 requires SQLite")
+    monkeypatch.setattr(settings, "disable_search", False)
+    monkeypatch.setattr(settings, "search_backend", "fts5")
+    # Some tests change the index through the triggers only
+    monkeypatch.setattr(settings, "search_cache_ttl", 0)
+    monkeypatch.setattr(app.search, "_backend", None)
+    await create_or_update_index()
+
+
+async def create_doc(
+    title: str, urlpath: str, markdown: str, public: bool = True, parent=None
+) -> Doc:
+    doc = Doc(
+        parent_id=parent.id if parent else None,
+        title=title,
+        slug=urlpath.rsplit("/", 1)[-1],
+        urlpath=urlpath,
+        public=public,
+        markdown=markdown,
+        metadata={},
+    )
+    await doc.update_content()
+    await doc.save()
+    return doc
+
+
+def test_match_query():
+    assert match_query("hello world") == '"hello" "world"*'
+    assert match_query('install "NEAR OR" -x') == '"install" "NEAR" "OR" "x"*'
+    assert match_query(" ?! ") == ""
+
+
+async def test_fts5_search(fts5_search):
+    install = await create_doc(
+        "Installation", "/install", "Download the package and run the installer."
+    )
+    await create_doc(
+        "Usage",
+        "/usage",
+        "After installation, open the app. " + "Filler words here. " * 30,
+    )
+    await create_doc("Secrets", "/secrets", "Installation keys.", public=False)
+    await index_all_documents()
+
+    results = await search_documents("installation", public_only=False)
+    assert [r.urlpath for r in results] == ["/install", "/secrets", "/usage"]
+    assert results[0].id == install.id
+    assert results[0].title == f"{PRE}Installation</em>"
+    assert results[2].text.startswith(f"After {PRE}installation</em>, open the app.")
+    assert results[2].text.endswith("...")
+
+    results = await search_documents("installation", public_only=True)
+    assert [r.urlpath for r in results] == ["/install", "/usage"]
+    # The last word is matched as a prefix
+    results = await search_documents("down", public_only=True)
+    assert [r.urlpath for r in results] == ["/install"]
+    assert results[0].text == f"{PRE}Download</em> the package and run the installer."
+    assert await search_documents("nonexistent", public_only=False) == []
+    assert await search_documents("?", public_only=False) == []
+
+
+async def test_fts5_follows_doc_changes(fts5_search):
+    parent = await create_doc("Parent", "/parent", "Topic alpha")
+    child = await create_doc("Child", "/parent/child", "Topic beta", parent=parent)
+    await index_all_documents()
+
+    # Title, path and visibility changes apply without reindexing
+    parent.title = "Renamed"
+    parent.public = False
+    await parent.save()
+    await Doc.filter(id=child.id).update(urlpath="/moved/child")
+    results = await search_documents("topic", public_only=False)
+    assert {(r.title, r.urlpath, r.public) for r in results} == {
+        ("Renamed", "/parent", False),
+        ("Child", "/moved/child", True),
+    }
+    assert [r.id for r in await search_documents("topic", True)] == [child.id]
+
+    # Content changes apply when the document is reindexed
+    child.markdown = "Topic gamma"
+    await child.update_content()
+    await child.save()
+    await index_document(child)
+    assert [r.id for r in await search_documents("gamma", True)] == [child.id]
+    assert await search_documents("beta", True) == []
+
+    # Deleting a document also removes its descendants from the index
+    await parent.delete()
+    assert await search_documents("topic", public_only=False) == []
+
+    other = await create_doc("Other", "/other", "Topic delta")
+    await index_document(other)
+    await delete_document_from_index(other.id)
+    assert await search_documents("topic", public_only=False) == []
+
+
+async def test_fts5_sections(fts5_search):
+    home = await create_doc("Home", "/", "")
+    guide = await create_doc(
+        "Guide",
+        "/guide",
+        "Introduction.\n\n## Setup steps\n\nRun the installer.\n\n"
+        "### Details\n\nOpen the installed app.",
+        parent=home,
+    )
+    await index_all_documents()
+
+    # Only the best matching section of each document is returned
+    results = await search_documents("install", public_only=False)
+    assert len(results) == 1
+    assert results[0].id == guide.id
+    assert results[0].anchor == "section-setup-steps"
+    assert results[0].section == "Setup steps"
+    assert results[0].breadcrumbs == ["Home"]
+    assert results[0].text == f"Run the {PRE}installer</em>."
+    results = await search_documents("details", public_only=False)
+    assert results[0].section == f"{PRE}Details</em>"
+    assert results[0].anchor == "section-details"
+    results = await search_documents("introduction", public_only=False)
+    assert (results[0].anchor, results[0].section) == ("", "")
+
+    # Reindexing a document removes its sections that no longer exist
+    guide.markdown = "Introduction only."
+    await guide.update_content()
+    await guide.save()
+    await index_document(guide)
+    assert await search_documents("install", public_only=False) == []
+    assert [r.id for r in await search_documents("introduction", False)] == [guide.id]
+
+
+async def test_fts5_suggest(fts5_search):
+    guide = await create_doc(
+        "Installation Guide", "/guide", "## Installation steps\n\nInstall it."
+    )
+    await create_doc("Secret Installation", "/secret", "", public=False)
+    await create_doc("Usage", "/usage", "After installation, open the app.")
+    await index_all_documents()
+
+    # Only titles are matched, once per document, without highlighting
+    results = await suggest_documents("instal", public_only=True)
+    assert [(r.id, r.title, r.urlpath) for r in results] == [
+        (guide.id, "Installation Guide", "/guide")
+    ]
+    results = await suggest_documents("installation", public_only=False, limit=5)
+    assert {r.urlpath for r in results} == {"/guide", "/secret"}
+    assert len(await suggest_documents("installation", False, limit=1)) == 1
+    assert await suggest_documents("guide usage", public_only=False) == []
+    assert await suggest_documents("!", public_only=False) == []
+
+
+async def test_search_docs_fts5(api_client: TestClient, user_admin: User, fts5_search):
+    """
+    Test searching documents through the API with the FTS5 backend.
+    """
+    home = await create_doc("Home", "/", "")
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/docs/",
+        json={"parent_id": home.id, "title": "Guide", "slug": "guide", "public": True},
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+    doc_id = response.json()["id"]
+    response = api_client.put(
+        f"/api/docs/{doc_id}", json={"markdown": "Configure the server."}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = api_client.post("/api/docs/search", json={"query": "configure"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json() == {
+        "total": 1,
+        "results": [
+            {
+                "id": doc_id,
+                "title": "Guide",
+                "urlpath": "/guide",
+                "text": f"{PRE}Configure</em> the server.",
+                "public": True,
+                "section": "",
+                "anchor": "",
+                "breadcrumbs": ["Home"],
+            }
+        ],
+        "has_more": False,
+    }
+
+    response = api_client.put(f"/api/docs/{doc_id}", json={"public": False})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    api_client.set_session_user(None)
+    response = api_client.post("/api/docs/search", json={"query": "configure"})
+    assert response.json() == {"total": 0, "results": [], "has_more": False}
+
+
+def record(
+    doc_id: int,
+    title: str,
+    text: str,
+    public: bool = True,
+    index: int = 0,
+    section: str = "",
+):
+    return DocIndexSchema(
+        id=f"{doc_id}_{index}",
+        doc_id=doc_id,
+        urlpath=f"/doc-{doc_id}",
+        urlpathbase="",
+        title=title,
+        section=section,
+        anchor=f"section-{index}" if index else "",
+        breadcrumbs=["Home"],
+        text=text,
+        public=public,
+    )
+
+
+async def test_memory_backend():
+    backend = MemoryBackend()
+    await backend.setup()
+    await backend.index(
+        [
+            record(1, "Installation", "Download the package and run the installer."),
+            record(2, "Usage", "After installation, open the app. " + "Filler. " * 60),
+            record(3, "Secrets", "Installation keys.", public=False),
+        ]
+    )
+    results = await backend.search("installation", public_only=False)
+    assert [r.id for r in results] == [1, 2, 3]
+    assert results[0].title == f"{PRE}Installation</em>"
+    assert results[1].text.startswith(f"After {PRE}installation</em>, open the app.")
+    assert results[1].text.endswith("...")
+    assert [r.id for r in await backend.search("installation", True)] == [1, 2]
+    assert [r.id for r in await backend.search("installation", True, 1, 1)] == [2]
+    # All words must match, and the last one is a prefix
+    results = await backend.search("run down", public_only=True)
+    assert [r.id for r in results] == [1]
+    assert results[0].text == (
+        f"{PRE}Download</em> the package and {PRE}run</em> the installer."
+    )
+    assert await backend.search("run usage", public_only=False) == []
+    assert await backend.search("?!", public_only=False) == []
+
+    # Reindexing replaces the previous record
+    await backend.index([record(1, "Setup", "Configure the server.")])
+    assert [r.id for r in await backend.search("installation", False)] == [2, 3]
+    assert [r.id for r in await backend.search("setup", False)] == [1]
+    await backend.delete([1, 99])
+    assert await backend.search("setup", public_only=False) == []
+    assert "setup" not in backend.postings
+
+    async def batches():
+        yield [record(4, "Rebuilt", "Only this one.")]
+
+    await backend.rebuild(batches())
+    assert await backend.search("installation", public_only=False) == []
+    assert [r.id for r in await backend.search("rebuilt", False)] == [4]
+
+
+async def test_memory_backend_sections():
+    backend = MemoryBackend()
+    await backend.index(
+        [
+            record(1, "Guide", "Introduction."),
+            record(1, "Guide", "Run the installer.", index=1, section="Install"),
+            record(1, "Guide", "Open the installed app.", index=2, section="Usage"),
+        ]
+    )
+    # Only the best matching section of each document is returned
+    results = await backend.search("install", public_only=False)
+    assert len(results) == 1
+    assert results[0].section == f"{PRE}Install</em>"
+    assert results[0].anchor == "section-1"
+    assert results[0].breadcrumbs == ["Home"]
+    assert results[0].text == f"Run the {PRE}installer</em>."
+    results = await backend.search("open", public_only=False)
+    assert (results[0].section, results[0].anchor) == ("Usage", "section-2")
+
+    # Reindexing a document removes its sections that no longer exist
+    await backend.index([record(1, "Guide", "Introduction.")])
+    assert await backend.search("install", public_only=False) == []
+    assert sorted(backend.records) == ["1_0"]
+
+
+async def test_memory_backend_suggest():
+    backend = MemoryBackend()
+    await backend.index(
+        [
+            record(1, "Installation Guide", "Install it."),
+            record(1, "Installation Guide", "Steps.", index=1, section="Installing"),
+            record(2, "Usage", "After installation, open the app."),
+            record(3, "Secret Installation", "", public=False),
+        ]
+    )
+    results = await backend.suggest("instal", public_only=True)
+    assert [(r.id, r.title) for r in results] == [(1, "Installation Guide")]
+    results = await backend.suggest("installation", public_only=False)
+    assert sorted(r.id for r in results) == [1, 3]
+    assert len(await backend.suggest("installation", False, limit=1)) == 1
+    assert [r.id for r in await backend.suggest("guide inst", False)] == [1]
+    assert await backend.suggest("usage guide", public_only=False) == []
+    assert await backend.suggest("?", public_only=False) == []
+
+
+async def test_search_cache():
+    """
+    Test that results are cached until the index is changed by this process.
+    """
+    doc = await create_doc("Cached", "/cached", "Content")
+    await index_document(doc)
+    backend = app.search.get_search_backend()
+    assert [r.title for r in await search_documents("content", False)] == ["Cached"]
+    assert [r.title for r in await suggest_documents("cache", False)] == ["Cached"]
+
+    # Changes that bypass indexing are not seen until the entries expire,
+    # and queries differing only in case and spaces share an entry
+    await backend.index([record(doc.id, "Changed", "Content")])
+    results = await search_documents(" Content ", public_only=False)
+    assert [r.title for r in results] == ["Cached"]
+    assert [r.title for r in await suggest_documents("CACHE", False)] == ["Cached"]
+    # Other pages and visibilities are cached separately
+    assert await search_documents("content", False, offset=1) == []
+
+    await delete_document_from_index(999)
+    assert [r.title for r in await search_documents("content", False)] == ["Changed"]
+    assert await suggest_documents("cache", public_only=False) == []
+
+
+async def test_search_docs(api_client: TestClient, user_admin: User):
+    """
+    Test that documents are indexed as they are created, changed and deleted.
+    """
+    home = await create_doc("Home", "/", "")
+    api_client.set_session_user(user_admin)
+    doc_ids = []
+    for slug in ["first", "second"]:
+        response = api_client.post(
+            "/api/docs/",
+            json={"parent_id": home.id, "title": slug.title(), "slug": slug},
+        )
+        assert response.status_code == status.HTTP_201_CREATED, response.text
+        doc_ids.append(response.json()["id"])
+    response = api_client.put(
+        f"/api/docs/{doc_ids[0]}", json={"markdown": "Shared words and more."}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    response = api_client.put(
+        f"/api/docs/{doc_ids[1]}",
+        json={"markdown": "Shared words.", "parent_id": doc_ids[0], "public": True},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = api_client.post("/api/docs/search", json={"query": "shared words"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    results = response.json()["results"]
+    assert {(r["id"], r["urlpath"]) for r in results} == {
+        (doc_ids[0], "/first"),
+        (doc_ids[1], "/first/second"),
+    }
+    # Anonymous users only find public documents
+    api_client.set_session_user(None)
+    response = api_client.post("/api/docs/search", json={"query": "shared words"})
+    assert [r["id"] for r in response.json()["results"]] == [doc_ids[1]]
+    assert response.json()["results"][0]["breadcrumbs"] == ["Home", "First"]
+
+    # Renaming a document updates the breadcrumbs of its descendants
+    api_client.set_session_user(user_admin)
+    response = api_client.put(f"/api/docs/{doc_ids[0]}", json={"title": "Renamed"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    api_client.set_session_user(None)
+    response = api_client.post("/api/docs/search", json={"query": "shared words"})
+    assert response.json()["results"][0]["breadcrumbs"] == ["Home", "Renamed"]
+
+    api_client.set_session_user(user_admin)
+    response = api_client.delete(f"/api/docs/{doc_ids[1]}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT, response.text
+    response = api_client.post("/api/docs/search", json={"query": "shared words"})
+    assert [r["id"] for r in response.json()["results"]] == [doc_ids[0]]
+
+
+async def test_index_all_documents():
+    """
+    Test rebuilding the index removes documents that no longer exist.
+    """
+    doc = await create_doc("Kept", "/kept", "Content")
+    backend = app.search.get_search_backend()
+    await backend.index([record(999, "Stale", "Content")])
+    await index_all_documents(batch_size=1)
+    results = await search_documents("content", public_only=False)
+    assert [r.id for r in results] == [doc.id]
+
+
+async def test_search_docs_pagination(api_client: TestClient, user_admin: User):
+    """
+    Test paginating search results and getting autocomplete suggestions.
+    """
+    docs = [
+        await create_doc(f"Page {i}", f"/page-{i}", "Paginated content")
+        for i in range(5)
+    ]
+    await index_documents(Doc.all())
+    api_client.set_session_user(user_admin)
+
+    response = api_client.post(
+        "/api/docs/search", json={"query": "paginated", "page": 1, "size": 2}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert (data["total"], data["has_more"]) == (2, True)
+    seen = [r["id"] for r in data["results"]]
+    response = api_client.post(
+        "/api/docs/search", json={"query": "paginated", "page": 3, "size": 2}
+    )
+    data = response.json()
+    assert (data["total"], data["has_more"]) == (1, False)
+    seen += [r["id"] for r in data["results"]]
+    response = api_client.post(
+        "/api/docs/search", json={"query": "paginated", "page": 2, "size": 2}
+    )
+    seen += [r["id"] for r in response.json()["results"]]
+    assert sorted(seen) == [doc.id for doc in docs]
+
+    response = api_client.post(
+        "/api/docs/search", json={"query": "paginated", "page": 11, "size": 100}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+    response = api_client.post(
+        "/api/docs/search", json={"query": "paginated", "size": 0}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    response = api_client.get("/api/docs/autocomplete?query=page&limit=3")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert len(response.json()) == 3
+    assert set(response.json()[0]) == {"id", "title", "urlpath", "public"}
+    response = api_client.get("/api/docs/autocomplete?query=p")
+    assert response.json() == []
+    response = api_client.get("/api/docs/autocomplete?query=page&limit=0")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
@@ -0,0 +1,222 @@
+from datetime import UTC, datetime, timedelta
+
+from app.models.doc import Doc
+from app.models.sharelink import ShareableLink
+from app.models.upload import Upload
+from app.models.user import User
+from app.settings import settings
+from fastapi import status
+from utils import TestClient
+
+
+async def create_shared_doc(user: User) -> tuple[Doc, ShareableLink]:
+    """
+    Create a private document with a share link.
+    """
+    home = await Doc.create(
+        title="Home",
+        slug="",
+        urlpath="/",
+        public=True,
+        metadata={},
+        markdown="",
+        html="",
+    )
+    doc = await Doc.create(
+        parent_id=home.id,
+        title="Shared Doc",
+        slug="shared-doc",
+        urlpath="/shared-doc",
+        public=False,
+        metadata={"subtitles": []},
+        markdown="Shared content",
+        html="<p>Shared content</p>",
+    )
+    link = await ShareableLink.create(
+        token=ShareableLink.generate_token(),
+        doc_id=doc.id,
+        created_by_id=user.id,
+    )
+    return doc, link
+
+
+async def test_access_shared_doc(api_client: TestClient, user_admin: User):
+    """
+    Test accessing a private document through a share link.
+    """
+    doc, link = await create_shared_doc(user_admin)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["id"] == doc.id
+    assert data["html"] == "<p>Shared content</p>"
+    assert data["markdown"] == ""
+
+    # The access is reported before being written to the database
+    api_client.set_session_user(user_admin)
+    response = api_client.get(f"/api/sharelinks/{link.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["access_count"] == 1
+    assert response.json()["last_accessed_at"] is not None
+    await link.refresh_from_db()
+    assert link.access_count == 0
+
+    await ShareableLink.flush_accesses()
+    await link.refresh_from_db()
+    assert link.access_count == 1
+    assert link.last_accessed_at is not None
+
+
+async def test_access_expired_shared_doc(api_client: TestClient, user_admin: User):
+    """
+    Test accessing a document through an expired share link.
+    """
+    _, link = await create_shared_doc(user_admin)
+    link.expires_at = datetime.now(UTC) - timedelta(days=1)
+    await link.save()
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_410_GONE
+
+
+async def test_download_shared_uploads_counts_once(
+    api_client: TestClient, user_admin: User
+):
+    """
+    Test that viewing a shared page with several images counts as one access.
+    """
+    from app.api.uploads import settings
+
+    doc, link = await create_shared_doc(user_admin)
+    settings.uploads_dir.mkdir(parents=True, exist_ok=True)
+    uploads = [
+        await Upload.create(
+            filename=f"image{i}.png",
+            content_type="image/png",
+            size=0,
+            public=False,
+            storage_path=f"shared-image{i}.png",
+            doc=doc,
+        )
+        for i in range(3)
+    ]
+    for upload in uploads:
+        (settings.uploads_dir / upload.storage_path).write_bytes(b"fake image")
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+    for upload in uploads:
+        response = api_client.get(
+            f"/api/uploads/{upload.id}/download",
+            headers={"Referer": f"http://localhost/_share/{link.token}"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+    await ShareableLink.flush_accesses()
+    await link.refresh_from_db()
+    assert link.access_count == 1
+
+
+async def test_download_upload_with_invalid_share_token(
+    api_client: TestClient, user_admin: User
+):
+    """
+    Test that an invalid or revoked share token does not grant access to uploads.
+    """
+    doc, link = await create_shared_doc(user_admin)
+    upload = await Upload.create(
+        filename="image.png",
+        content_type="image/png",
+        size=0,
+        public=False,
+        storage_path="shared-image.png",
+        doc=doc,
+    )
+    response = api_client.get(
+        f"/api/uploads/by-doc/{doc.id}", params={"share_token": link.token}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in response.json()] == [upload.id]
+
+    api_client.set_session_user(user_admin)
+    response = api_client.delete(f"/api/sharelinks/{link.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    api_client.set_session_user(None)
+
+    response = api_client.get(
+        f"/api/uploads/by-doc/{doc.id}", params={"share_token": link.token}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = api_client.get(
+        f"/api/uploads/{upload.id}/download", params={"share_token": "invalid"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_access_shared_doc_after_update(api_client: TestClient, user_admin: User):
+    """
+    Test that a cached shared document is refreshed when the document changes.
+    """
+    doc, link = await create_shared_doc(user_admin)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "Shared Doc"
+
+    api_client.set_session_user(user_admin)
+    response = api_client.put(
+        f"/api/docs/{doc.id}",
+        json={"title": "Updated Doc", "markdown": "Updated content"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    api_client.set_session_user(None)
+
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "Updated Doc"
+    assert response.json()["html"] == "<p>Updated content</p>\n"
+
+
+async def test_access_revoked_shared_doc(api_client: TestClient, user_admin: User):
+    """
+    Test that a cached share link stops working once it is deleted.
+    """
+    doc, link = await create_shared_doc(user_admin)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+
+    api_client.set_session_user(user_admin)
+    response = api_client.delete(f"/api/sharelinks/{link.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    api_client.set_session_user(None)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # Deleting the document also revokes its links
+    link = await ShareableLink.create(
+        token=ShareableLink.generate_token(), doc_id=doc.id
+    )
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+    api_client.set_session_user(user_admin)
+    response = api_client.delete(f"/api/docs/{doc.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    api_client.set_session_user(None)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_access_shared_doc_revoked_by_other_worker(
+    api_client: TestClient, user_admin: User, monkeypatch
+):
+    """
+    Test that a cached share link stops working once it is deleted elsewhere,
+    e.g. by another worker whose cache was cleared instead of this one's.
+    """
+    doc, link = await create_shared_doc(user_admin)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+
+    await ShareableLink.filter(id=link.id).delete()
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_200_OK
+
+    monkeypatch.setattr(settings, "share_link_revalidate_interval", 0)
+    response = api_client.get(f"/api/sharelinks/access/{link.token}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -75,3 +75,63 @@ async def test_sitemap(api_client: TestClient) -> None:
     response = api_client.head("/api/sitemap.xml")
     assert response.status_code == 200
     assert response.headers["Content-Type"] == "application/xml; charset=utf-8"
+
+
+async def test_llms_full_txt(api_client: TestClient) -> None:
+    """
+    Test the llms-full.txt endpoint.
+    """
+    parent = await Doc.create(
+        title="Parent",
+        slug="parent",
+        urlpath="parent",
+        html="",
+        public=True,
+        metadata={},
+        markdown="Parent content.",
+    )
+    await Doc.create(
+        parent_id=parent.id,
+        title="Child",
+        slug="child",
+        urlpath="parent/child",
+        html="",
+        public=True,
+        metadata={},
+        markdown="Child content.",
+    )
+    await Doc.create(
+        title="Private",
+        slug="private",
+        urlpath="private",
+        html="",
+        public=False,
+        metadata={},
+        markdown="Private content.",
+    )
+
+    response = api_client.get("/api/llms-full.txt")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+    assert response.text == (
+        "# Gnotus\n\n"
+        + "=" * 80
+        + "\n<!-- path: /parent -->\n\n# Parent\n\nParent content.\n\n"
+        + "=" * 80
+        + "\n<!-- path: /parent/child -->\n\n# Child\n\nChild content.\n\n"
+    )
+    etag = response.headers["ETag"]
+
+    response = api_client.get("/api/llms-full.txt", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    parent.markdown = "Updated content."
+    await parent.save()
+    response = api_client.get("/api/llms-full.txt", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Updated content." in response.text
+    assert response.headers["ETag"] != etag
+
+    response = api_client.head("/api/llms-full.txt")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
@@ -1,8 +1,10 @@
 from pathlib import Path
 
+from app.models.doc import Doc
 from app.models.upload import Upload
 from app.models.user import User
 from fastapi import status
+from pytest import MonkeyPatch
 from utils import TestClient
 
 
@@ -523,3 +525,258 @@ async def test_list_uploads(api_client: TestClient, user_admin: User):
         "page": 1,
         "total": 2,
     }
+
+
+async def test_chunked_upload(
+    api_client: TestClient, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """
+    Test uploading a file in chunks sent out of order.
+    """
+    from app.api.uploads import settings
+
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    content = b"0123456789"
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/sessions",
+        json={
+            "filename": "video.mp4",
+            "content_type": "video/mp4",
+            "size": len(content),
+            "public": False,
+        },
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    session = response.json()
+    assert session["chunk_size"] == 4
+    assert session["chunk_count"] == 3
+    assert session["received_chunks"] == []
+
+    for index in (2, 0):
+        response = api_client.put(
+            f"/api/uploads/sessions/{session['id']}/chunks/{index}",
+            content=content[index * 4 : index * 4 + 4],
+        )
+        assert response.status_code == status.HTTP_200_OK
+    assert response.json()["received_chunks"] == [0, 2]
+
+    response = api_client.post(f"/api/uploads/sessions/{session['id']}/complete")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Upload is incomplete: 1 chunk(s) missing"}
+
+    response = api_client.get(f"/api/uploads/sessions/{session['id']}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["received_chunks"] == [0, 2]
+
+    response = api_client.put(
+        f"/api/uploads/sessions/{session['id']}/chunks/1", content=content[4:8]
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = api_client.post(f"/api/uploads/sessions/{session['id']}/complete")
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["filename"] == "video.mp4"
+    assert data["size"] == len(content)
+    upload = await Upload.get(id=data["id"])
+    assert (settings.uploads_dir / upload.storage_path).read_bytes() == content
+
+    # The session is removed once finalized
+    response = api_client.get(f"/api/uploads/sessions/{session['id']}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_chunked_upload_wrong_chunk_size(
+    api_client: TestClient, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """
+    Test that chunks with the wrong number of bytes are rejected.
+    """
+    from app.api.uploads import settings
+
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/sessions",
+        json={
+            "filename": "doc.pdf",
+            "content_type": "application/pdf",
+            "size": 6,
+            "public": False,
+        },
+    )
+    session_id = response.json()["id"]
+    response = api_client.put(
+        f"/api/uploads/sessions/{session_id}/chunks/1", content=b"456"
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Chunk 1 must be 2 bytes"}
+    response = api_client.put(
+        f"/api/uploads/sessions/{session_id}/chunks/2", content=b"45"
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Chunk index must be between 0 and 1"}
+    response = api_client.get(f"/api/uploads/sessions/{session_id}")
+    assert response.json()["received_chunks"] == []
+
+
+async def test_chunked_upload_failed_resend(
+    api_client: TestClient, user_admin: User, monkeypatch: MonkeyPatch
+):
+    """
+    Test that a resent chunk that fails is no longer counted as received,
+    and that completing a session that was completed meanwhile is a 404.
+    """
+    from app.api.uploads import settings
+    from app.utils.upload_sessions import UploadSession
+
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/sessions",
+        json={
+            "filename": "doc.pdf",
+            "content_type": "application/pdf",
+            "size": 6,
+            "public": False,
+        },
+    )
+    session_id = response.json()["id"]
+    for index, content in ((0, b"0123"), (1, b"45")):
+        response = api_client.put(
+            f"/api/uploads/sessions/{session_id}/chunks/{index}", content=content
+        )
+        assert response.status_code == status.HTTP_200_OK
+    response = api_client.put(
+        f"/api/uploads/sessions/{session_id}/chunks/0", content=b"01"
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.get(f"/api/uploads/sessions/{session_id}")
+    assert response.json()["received_chunks"] == [1]
+    response = api_client.post(f"/api/uploads/sessions/{session_id}/complete")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = api_client.put(
+        f"/api/uploads/sessions/{session_id}/chunks/0", content=b"0123"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    # As if another request had just moved the data file to its storage path
+    session = await UploadSession.load(session_id)
+    assert session is not None
+    session.data_path.unlink()
+    response = api_client.post(f"/api/uploads/sessions/{session_id}/complete")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert await Upload.all().count() == 0
+
+
+async def test_chunked_upload_exceeds_max_size(
+    api_client: TestClient, user_admin: User
+):
+    """
+    Test starting a chunked upload larger than the chunked upload limit.
+    """
+    from app.api.uploads import settings
+
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/sessions",
+        json={
+            "filename": "video.mp4",
+            "content_type": "video/mp4",
+            "size": settings.max_chunked_upload_size + 1,
+            "public": False,
+        },
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"].startswith("File size exceeds the maximum limit")
+
+
+async def test_chunked_upload_other_user(
+    api_client: TestClient, user_admin: User, user_user: User
+):
+    """
+    Test that users cannot access upload sessions started by other users.
+    """
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/sessions",
+        json={
+            "filename": "video.mp4",
+            "content_type": "video/mp4",
+            "size": 10,
+            "public": False,
+        },
+    )
+    session_id = response.json()["id"]
+    api_client.set_session_user(user_user)
+    response = api_client.get(f"/api/uploads/sessions/{session_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = api_client.delete(f"/api/uploads/sessions/{session_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    api_client.set_session_user(user_admin)
+    response = api_client.delete(f"/api/uploads/sessions/{session_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = api_client.get(f"/api/uploads/sessions/{session_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_upload_image_variants(api_client: TestClient, user_admin: User):
+    """
+    Test that resized variants are generated for uploaded images and served by width.
+    """
+    from io import BytesIO
+
+    from app.api.uploads import settings
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (800, 400), "red").save(buffer, "PNG")
+    # Saved before the variants exist, and rendered again once they do
+    doc = await Doc.create(
+        public=True,
+        title="Photos",
+        slug="photos",
+        urlpath="/photos",
+        metadata={},
+        markdown="![photo](/api/uploads/1/download)",
+        html="",
+    )
+    api_client.set_session_user(user_admin)
+    response = api_client.post(
+        "/api/uploads/",
+        data={"filename": "photo.png", "public": "true", "doc_id": str(doc.id)},
+        files={"file": ("photo.png", buffer.getvalue(), "image/png")},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    upload = await Upload.get(id=response.json()["id"])
+    variants = sorted(settings.uploads_dir.glob(f"{upload.storage_path}.w*.webp"))
+    assert [path.name for path in variants] == [
+        f"{upload.storage_path}.w{width}.webp"
+        for width in sorted(settings.image_variant_widths, key=str)
+        if width < 800
+    ]
+    assert upload.width == 800
+    assert upload.variant_widths == [160, 320, 640]
+    updated_at = doc.updated_at
+    await doc.refresh_from_db()
+    assert doc.updated_at > updated_at
+    assert 'sizes="(max-width: 800px) 100vw, 800px"' in doc.html
+    assert (
+        "/api/uploads/1/download?w=640 640w, /api/uploads/1/download 800w" in doc.html
+    )
+
+    response = api_client.get(f"/api/uploads/{upload.id}/download?w=300")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/webp"
+    with Image.open(BytesIO(response.content)) as image:
+        assert image.size == (320, 160)
+
+    # Wider than the original: the original is served
+    response = api_client.get(f"/api/uploads/{upload.id}/download?w=1000")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/png"
+
+    response = api_client.delete(f"/api/uploads/{upload.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not list(settings.uploads_dir.glob(f"{upload.storage_path}*"))
@@ -1,10 +1,17 @@
+import os
 from typing import TYPE_CHECKING
 
+import pytest
 from fastapi.testclient import TestClient as FastAPIClient
 
 if TYPE_CHECKING:
     import app.models
 
+# For tests of SQLite features, skipped when testing with PostgreSQL
+requires_sqlite = pytest.mark.skipif(
+    bool(os.environ.get("GNOTUS_TEST_POSTGRES")), reason="requires SQLite"
+)
+
 
 class TestClient(FastAPIClient):
     def request(self, *args, **kwargs):
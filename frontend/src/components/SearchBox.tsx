@@ -11,6 +11,9 @@ export interface SearchResult {
   urlpath: string
   text: string
   public: boolean
+  section?: string
+  anchor?: string
+  breadcrumbs?: string[]
 }
 
 export default function SearchBox() {
@@ -146,13 +149,29 @@ export default function SearchBox() {
                   key={index}
                   className="hover:bg-base-200 border-base-300 my-1 rounded-lg border p-2"
                 >
-                  <Link to={result.urlpath} onClick={() => setShow(false)}>
+                  <Link
+                    to={result.anchor ? `${result.urlpath}#${result.anchor}` : result.urlpath}
+                    onClick={() => setShow(false)}
+                  >
+                    {result.breadcrumbs && result.breadcrumbs.length > 0 && (
+                      <div className="truncate text-xs text-gray-500">
+                        {result.breadcrumbs.join(' › ')}
+                      </div>
+                    )}
                     <div className="flex">
                       <strong
                         dangerouslySetInnerHTML={{
                           __html: DOMPurify.sanitize(result.title),
                         }}
                       ></strong>
+                      {result.section && (
+                        <span
+                          className="ml-1 text-gray-600"
+                          dangerouslySetInnerHTML={{
+                            __html: DOMPurify.sanitize(`› ${result.section}`),
+                          }}
+                        ></span>
+                      )}
                       {!result.public && user && (
                         <span className="badge badge-sm badge-secondary text-base-content ml-auto">
                           Private